@@ -0,0 +1,259 @@
+"""Benchmark of the authorizer and StorageFS hot paths.
+
+Records wall time per operation and database queries per operation,
+and compares them with a saved baseline. The command fails (exit status 1)
+if an operation makes more queries than the baseline, or is slower than
+the baseline by more than the tolerance.
+
+Usage::
+
+   $ python benchmarks/bench_hotpaths.py              # compare with baseline
+   $ python benchmarks/bench_hotpaths.py --save       # save new baseline
+   $ python benchmarks/bench_hotpaths.py --tolerance 0.3 --number 500
+
+Wall times depend on the machine, save a baseline on the machine
+which runs the comparison.
+"""
+import argparse
+import functools
+import json
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(BASE_DIR, 'benchmarks', 'baseline.json')
+
+USERNAME = 'bench'
+PASSWORD = 'password'
+# files in the directory of listdir benchmarks
+LISTDIR_FILES = 100
+
+benchmarks = []
+
+
+def benchmark(func):
+    """register benchmark, func(env) returns the operation to time.
+    """
+    benchmarks.append(func)
+    return func
+
+
+class Environment(object):
+    """Accounts and filesystems shared by benchmarks.
+    """
+
+    def __init__(self):
+        from django.contrib.auth import get_user_model
+        from django.core.files.storage import FileSystemStorage
+        from django_ftpserver import models
+        from django_ftpserver.authorizers import FTPAccountAuthorizer
+        from django_ftpserver.storages import InMemoryStorage
+
+        group = models.FTPUserGroup.objects.create(
+            name='bench', permission='elr', home_dir='/home/bench/')
+        for i in range(20):
+            models.FTPPathPermission.objects.create(
+                group=group, path='/dir{0}/sub'.format(i), permission='elrw')
+        user = get_user_model().objects.create_user(USERNAME, '', PASSWORD)
+        self.account = models.FTPUserAccount.objects.create(
+            user=user, group=group)
+        self.authorizer = FTPAccountAuthorizer()
+
+        self.tempdir = tempfile.mkdtemp()
+        names = ['file{0}.txt'.format(i) for i in range(LISTDIR_FILES)]
+        for name in names:
+            with open(os.path.join(self.tempdir, name), 'wb') as f:
+                f.write(b'x' * 100)
+        self.filesystem_fs = self.make_fs(
+            functools.partial(FileSystemStorage, location=self.tempdir))
+        memory_storage = InMemoryStorage(
+            dict((name, b'x' * 100) for name in names))
+        self.memory_fs = self.make_fs(lambda: memory_storage)
+
+    def make_fs(self, storage_class):
+        from django_ftpserver.filesystems import StorageFS
+
+        class BenchStorageFS(StorageFS):
+            pass
+        BenchStorageFS.storage_class = staticmethod(storage_class)
+        return BenchStorageFS('/', None)
+
+    def close(self):
+        shutil.rmtree(self.tempdir)
+
+
+@benchmark
+def login(env):
+    def op():
+        env.authorizer.validate_authentication(USERNAME, PASSWORD, None)
+    return op
+
+
+@benchmark
+def has_perm(env):
+    env.authorizer.validate_authentication(USERNAME, PASSWORD, None)
+    path = '/home/bench/dir10/sub/spam/file.txt'
+    return lambda: env.authorizer.has_perm(USERNAME, 'w', path)
+
+
+@benchmark
+def get_home_dir(env):
+    return lambda: env.authorizer.get_home_dir(USERNAME)
+
+
+def _listdir_stat(fs):
+    for name in fs.listdir('/'):
+        fs.stat(name)
+
+
+@benchmark
+def listdir_stat_filesystem(env):
+    return lambda: _listdir_stat(env.filesystem_fs)
+
+
+@benchmark
+def listdir_stat_memory(env):
+    return lambda: _listdir_stat(env.memory_fs)
+
+
+@benchmark
+def storage_fs_setup(env):
+    from django.core.files.storage import FileSystemStorage
+    from django_ftpserver.filesystems import StorageFS
+
+    class BenchStorageFS(StorageFS):
+        storage_class = FileSystemStorage
+    return lambda: BenchStorageFS('/', None)
+
+
+@benchmark
+def path_resolution(env):
+    fs = env.memory_fs
+
+    def op():
+        fs.fs2ftp(fs.ftp2fs('/spam/../ham/./eggs/file.txt'))
+        fs.validpath(fs.ftp2fs('eggs/file.txt'))
+    return op
+
+
+@benchmark
+def parse_ports(env):
+    from django_ftpserver.utils import parse_ports
+    return lambda: parse_ports('30000-30999,31000,31002-31010')
+
+
+def run(number=200, repeat=3, names=None):
+    """run benchmarks, return {name: {'seconds': .., 'queries': ..}}
+
+    seconds is the best time per operation of `repeat` runs.
+    """
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext, override_settings
+
+    results = {}
+    # measure the authorizer, not password hashing
+    with override_settings(PASSWORD_HASHERS=[
+            'django.contrib.auth.hashers.MD5PasswordHasher']):
+        env = Environment()
+        try:
+            for func in benchmarks:
+                name = func.__name__
+                if names and name not in names:
+                    continue
+                op = func(env)
+                op()  # warm up
+                with CaptureQueriesContext(connection) as queries:
+                    op()
+                seconds = min(timeit.repeat(
+                    op, number=number, repeat=repeat)) / number
+                results[name] = {
+                    'seconds': seconds,
+                    'queries': len(queries.captured_queries),
+                }
+        finally:
+            env.close()
+    return results
+
+
+def compare(results, baseline, tolerance=0.5, check_time=True):
+    """return list of regressions against baseline.
+    """
+    regressions = []
+    for name, result in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result['queries'] > base['queries']:
+            regressions.append(
+                '{0}: {1} queries (baseline: {2})'.format(
+                    name, result['queries'], base['queries']))
+        if check_time and \
+                result['seconds'] > base['seconds'] * (1 + tolerance):
+            regressions.append(
+                '{0}: {1:.2f} us (baseline: {2:.2f} us)'.format(
+                    name, result['seconds'] * 1e6, base['seconds'] * 1e6))
+    return regressions
+
+
+def load_baseline(path=BASELINE):
+    with open(path) as f:
+        return json.load(f)
+
+
+def setup_django():
+    sys.path.insert(0, BASE_DIR)
+    sys.path.insert(0, os.path.join(BASE_DIR, 'tests', 'django_project'))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
+    import django
+    django.setup()
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('names', nargs='*', help="benchmarks to run.")
+    parser.add_argument('--number', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument(
+        '--tolerance', type=float, default=0.5,
+        help="allowed slowdown ratio against the baseline (default: 0.5)")
+    parser.add_argument(
+        '--save', action='store_true', help="save results as baseline.")
+    args = parser.parse_args(argv)
+
+    setup_django()
+    results = run(args.number, args.repeat, args.names)
+    baseline = {}
+    if os.path.exists(args.baseline):
+        baseline = load_baseline(args.baseline)
+
+    for name, result in sorted(results.items()):
+        base = baseline.get(name)
+        print('{0:<28} {1:>10.2f} us {2:>3} queries{3}'.format(
+            name, result['seconds'] * 1e6, result['queries'],
+            '  (baseline: {0:.2f} us {1} queries)'.format(
+                base['seconds'] * 1e6, base['queries']) if base else ''))
+
+    if args.save:
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print('saved baseline to {0}'.format(args.baseline))
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print('REGRESSION ' + regression, file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""Benchmark of path permission lookup with thousands of rules.
+
+Usage::
+
+   $ python benchmarks/bench_permissions.py [number of rules]
+"""
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from django_ftpserver.permissions import PermissionTrie  # noqa: E402
+
+
+def make_rules(count, depth=4, seed=0):
+    rng = random.Random(seed)
+    rules = []
+    for i in range(count):
+        components = [
+            'dir{0}'.format(rng.randrange(20))
+            for _ in range(rng.randint(1, depth))]
+        rules.append(('/' + '/'.join(components), rng.choice(['elr', 'elw'])))
+    return rules
+
+
+def linear_get_perms(rules, default, path):
+    """reference implementation: scan all rules for the longest prefix,
+    the last rule wins for the same path.
+    """
+    perms, length = default, -1
+    for rule_path, permission in rules:
+        if (path == rule_path or path.startswith(rule_path + '/')) \
+                and len(rule_path) >= length:
+            perms, length = permission, len(rule_path)
+    return perms
+
+
+def main(count=5000, number=10000):
+    rules = make_rules(count)
+    root = '/home/user1'
+    paths = [root + path + '/file.csv' for path, _ in make_rules(100, seed=1)]
+
+    compile_time = timeit.timeit(
+        lambda: PermissionTrie('elradfmw', rules, root=root), number=10) / 10
+    trie = PermissionTrie('elradfmw', rules, root=root)
+    lookup_time = timeit.timeit(
+        lambda: [trie.has_perm('w', path) for path in paths],
+        number=number // 100) / (number // 100) / len(paths)
+    relative_paths = [path[len(root):] for path in paths]
+    linear_time = timeit.timeit(
+        lambda: [linear_get_perms(rules, 'elradfmw', path)
+                 for path in relative_paths],
+        number=1) / len(paths)
+
+    for path, relative_path in zip(paths, relative_paths):
+        assert trie.get_perms(path) == \
+            linear_get_perms(rules, 'elradfmw', relative_path), path
+
+    print('rules: {0}'.format(count))
+    print('compile: {0:.3f} ms'.format(compile_time * 1000))
+    print('trie lookup: {0:.2f} us'.format(lookup_time * 1000000))
+    print('linear scan: {0:.2f} us'.format(linear_time * 1000000))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,234 @@
+"""Benchmark of the memory of idle authenticated sessions.
+
+Opens idle sessions of FTPAccountHandler with StorageFS, which logged in
+and sent no other command, and records memory per session:
+
+* rss: growth of the resident set size of the process (Linux only)
+* traced: memory allocated by Python (tracemalloc)
+
+The command fails (exit status 1) if memory per session is larger than
+the saved baseline by more than the tolerance.
+
+Usage::
+
+   $ python benchmarks/bench_sessions.py              # compare with baseline
+   $ python benchmarks/bench_sessions.py --save       # save new baseline
+   $ python benchmarks/bench_sessions.py --sessions 1000
+
+Each session holds a socket, the soft limit of open files is raised
+if needed.
+"""
+import argparse
+import json
+import os
+import resource
+import socket
+import sys
+import tracemalloc
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(BASE_DIR, 'benchmarks', 'sessions_baseline.json')
+
+USERNAME = 'bench'
+PASSWORD = 'password'
+SESSIONS = 10000
+
+
+class DummyServer(object):
+    def __init__(self):
+        self.ip_map = []
+
+
+def get_rss():
+    """return resident set size of the process in bytes, None if unknown.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * resource.getpagesize()
+
+
+def raise_open_files_limit(count):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != resource.RLIM_INFINITY and soft < count:
+        if hard != resource.RLIM_INFINITY and hard < count:
+            raise RuntimeError(
+                '{0} open files are needed (hard limit: {1})'.format(
+                    count, hard))
+        resource.setrlimit(resource.RLIMIT_NOFILE, (count, hard))
+
+
+def make_handler_class():
+    from django_ftpserver import handlers
+    from django_ftpserver.filesystems import StorageFS
+    from django_ftpserver.limits import ConnectionCounter
+    from django_ftpserver.storages import InMemoryStorage
+
+    class BenchStorageFS(StorageFS):
+        storage_class = InMemoryStorage
+
+    class IdleHandler(handlers.FTPAccountHandler):
+        """Handler which discards responses, so that clients needn't read.
+        """
+        abstracted_fs = BenchStorageFS
+        connection_counter = ConnectionCounter()
+
+        def push(self, data):
+            pass
+
+    return IdleHandler
+
+
+def open_sessions(count, handler_class, authorizer, ioloop):
+    """return count handlers logged in as USERNAME.
+
+    Clients are disconnected after the connection is accepted, so each
+    session holds one socket.
+    """
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(16)
+    sessions = []
+    try:
+        for _ in range(count):
+            client = socket.create_connection(listener.getsockname())
+            sock, _ = listener.accept()
+            client.close()
+            handler = handler_class(sock, DummyServer(), ioloop=ioloop)
+            handler.authorizer = authorizer
+            handler.username = USERNAME
+            handler.handle_auth_success('/', PASSWORD, 'welcome.')
+            sessions.append(handler)
+    finally:
+        listener.close()
+    return sessions
+
+
+def close_sessions(sessions):
+    for handler in sessions:
+        handler.close()
+
+
+def run(sessions=SESSIONS):
+    """open idle sessions, return {'idle_session': {'rss': .., 'traced': ..}}
+
+    Values are bytes per session, rss is None if unknown.
+    """
+    from django.contrib.auth import get_user_model
+    from django.test.utils import override_settings
+    from pyftpdlib.ioloop import IOLoop
+    from django_ftpserver import models
+    from django_ftpserver.authorizers import FTPAccountAuthorizer
+
+    raise_open_files_limit(sessions + 64)
+    group = models.FTPUserGroup.objects.create(
+        name='bench-sessions', permission='elr', home_dir='/home/bench/')
+    user = get_user_model().objects.create_user(USERNAME, '', PASSWORD)
+    account = models.FTPUserAccount.objects.create(user=user, group=group)
+    authorizer = FTPAccountAuthorizer()
+    handler_class = make_handler_class()
+    ioloop = IOLoop()
+    # DEBUG keeps executed queries
+    debug = override_settings(DEBUG=False)
+    debug.enable()
+    try:
+        # warm up caches of modules and the authorizer
+        close_sessions(open_sessions(10, handler_class, authorizer, ioloop))
+
+        # without tracemalloc, which has its own overhead
+        rss = get_rss()
+        opened = open_sessions(sessions, handler_class, authorizer, ioloop)
+        if rss is not None:
+            rss = (get_rss() - rss) / sessions
+        close_sessions(opened)
+        del opened
+
+        tracemalloc.start()
+        try:
+            traced = tracemalloc.get_traced_memory()[0]
+            opened = open_sessions(
+                sessions, handler_class, authorizer, ioloop)
+            traced = (tracemalloc.get_traced_memory()[0] - traced) / sessions
+        finally:
+            tracemalloc.stop()
+        close_sessions(opened)
+    finally:
+        debug.disable()
+        ioloop.close()
+        account.delete()
+        user.delete()
+        group.delete()
+    return {'idle_session': {'rss': rss, 'traced': traced}}
+
+
+def compare(results, baseline, tolerance=0.2):
+    """return list of regressions against baseline.
+    """
+    regressions = []
+    for name, result in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for key in ('rss', 'traced'):
+            if result.get(key) is None or base.get(key) is None:
+                continue
+            if result[key] > base[key] * (1 + tolerance):
+                regressions.append(
+                    '{0}: {1} {2:.0f} bytes (baseline: {3:.0f} bytes)'.format(
+                        name, key, result[key], base[key]))
+    return regressions
+
+
+def load_baseline(path=BASELINE):
+    with open(path) as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sessions', type=int, default=SESSIONS)
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument(
+        '--tolerance', type=float, default=0.2,
+        help="allowed growth ratio against the baseline (default: 0.2)")
+    parser.add_argument(
+        '--save', action='store_true', help="save results as baseline.")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, BASE_DIR)
+    from benchmarks.bench_hotpaths import setup_django
+    setup_django()
+    results = run(args.sessions)
+    baseline = {}
+    if os.path.exists(args.baseline):
+        baseline = load_baseline(args.baseline)
+
+    for name, result in sorted(results.items()):
+        base = baseline.get(name, {})
+        print('{0:<16} {1:>8} sessions {2:>10} rss/session'
+              ' {3:>10.0f} traced/session{4}'.format(
+                  name, args.sessions,
+                  'n/a' if result['rss'] is None
+                  else '{0:.0f}'.format(result['rss']),
+                  result['traced'],
+                  '  (baseline: {0:.0f} rss {1:.0f} traced)'.format(
+                      base['rss'] or 0, base['traced']) if base else ''))
+
+    if args.save:
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print('saved baseline to {0}'.format(args.baseline))
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print('REGRESSION ' + regression, file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,6 +1,28 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.utils.translation import ugettext_lazy as _
 
 from . import models
+from .compat import get_username_field
+
+
+class FTPGroupPathPermissionInline(admin.TabularInline):
+    """Inline admin class for FTPPathPermission of FTPUserGroup
+    """
+    model = models.FTPPathPermission
+    fields = ('path', 'permission')
+    exclude = ('account',)
+    extra = 0
+
+
+class FTPAccountPathPermissionInline(admin.TabularInline):
+    """Inline admin class for FTPPathPermission of FTPUserAccount
+    """
+    model = models.FTPPathPermission
+    fields = ('path', 'permission')
+    exclude = ('group',)
+    extra = 0
 
 
 class FTPUserGroupAdmin(admin.ModelAdmin):
@@ -8,14 +30,94 @@ class FTPUserGroupAdmin(admin.ModelAdmin):
     """
     list_display = ('name', 'permission')
     search_fields = ('name', 'permission')
+    inlines = (FTPGroupPathPermissionInline,)
+
+
+class FTPUserAccountActionForm(ActionForm):
+    """Action form with the destination group of move_to_group action
+    """
+    group = forms.ModelChoiceField(
+        queryset=models.FTPUserGroup.objects.order_by('name'),
+        required=False, label=_("FTP user group"))
 
 
 class FTPUserAccountAdmin(admin.ModelAdmin):
     """Admin class for FTPUserAccountAdmin
     """
     list_display = ('user', 'group', 'last_login')
-    search_fields = ('user', 'group', 'last_login')
+    list_select_related = ('user', 'group')
+    # match the beginning (istartswith), not any part of the username and
+    # the name, which needs a scan of the whole table
+    search_fields = (
+        '^user__{}'.format(get_username_field()), '^group__name')
+    raw_id_fields = ('user',)
+    autocomplete_fields = ('group',)
+    # don't count all rows of a large table
+    show_full_result_count = False
+    action_form = FTPUserAccountActionForm
+    actions = ('move_to_group',)
+    inlines = (FTPAccountPathPermissionInline,)
+
+    def move_to_group(self, request, queryset):
+        """move selected accounts to the group of the action form.
+        """
+        group_id = request.POST.get('group')
+        group = group_id and models.FTPUserGroup.objects.filter(
+            pk=group_id).first()
+        if not group:
+            self.message_user(
+                request, _("Select a FTP user group to move the accounts to."),
+                messages.WARNING)
+            return
+        count = queryset.update(group=group)
+        self.message_user(
+            request, _("%(count)d accounts were moved to %(group)s.") % {
+                'count': count, 'group': group})
+    move_to_group.short_description = _(
+        "Move selected accounts to the FTP user group")
+
+
+class FTPFileChecksumAdmin(admin.ModelAdmin):
+    """Admin class for FTPFileChecksum
+    """
+    list_display = ('path', 'storage', 'size', 'updated_at')
+    list_filter = ('storage',)
+    search_fields = ('path',)
+    readonly_fields = (
+        'storage', 'path', 'size', 'crc32', 'md5', 'sha1', 'sha256',
+        'updated_at')
+
+
+class FTPQuotaUsageAdmin(admin.ModelAdmin):
+    """Admin class for FTPQuotaUsage
+    """
+    list_display = ('account', 'bytes', 'files', 'updated_at')
+    list_select_related = ('account__user',)
+    show_full_result_count = False
+    readonly_fields = ('account', 'bytes', 'files', 'updated_at')
+
+
+class FTPTransferLogAdmin(admin.ModelAdmin):
+    """Admin class for FTPTransferLog
+    """
+    list_display = (
+        'created_at', 'account', 'command', 'path', 'bytes', 'duration',
+        'result')
+    list_filter = ('created_at', 'command', 'result')
+    list_select_related = ('account__user',)
+    date_hierarchy = 'created_at'
+    show_full_result_count = False
+    search_fields = ('path',)
+    readonly_fields = (
+        'account', 'command', 'path', 'bytes', 'duration', 'result',
+        'created_at')
+
+    def has_add_permission(self, request):
+        return False
 
 
 admin.site.register(models.FTPUserGroup, FTPUserGroupAdmin)
 admin.site.register(models.FTPUserAccount, FTPUserAccountAdmin)
+admin.site.register(models.FTPFileChecksum, FTPFileChecksumAdmin)
+admin.site.register(models.FTPQuotaUsage, FTPQuotaUsageAdmin)
+admin.site.register(models.FTPTransferLog, FTPTransferLogAdmin)
@@ -1,10 +1,14 @@
 import os
+import time
+from collections import OrderedDict
 
 from django.contrib.auth import authenticate
 from pyftpdlib.authorizers import AuthenticationFailed
 
-from . import models
+from . import metrics, models
 from .compat import get_username_field
+from .ratelimit import LoginRateLimiter
+from .utils import get_settings_value
 
 
 def _get_personate_user_class():
@@ -23,9 +27,15 @@ class FTPAccountAuthorizer(object):
     """
     model = models.FTPUserAccount
     personate_user_class = None
+    login_rate_limiter_class = LoginRateLimiter
+    # maximum number of users whose compiled permission rules are kept,
+    # the least recently used rules are evicted
+    max_permission_rules = 1000
 
     def __init__(self, file_access_user=None):
         self.username_field = get_username_field()
+        self.login_rate_limiter = self.get_login_rate_limiter()
+        self._permission_rules = OrderedDict()
         if file_access_user:
             personate_user_class = (
                 self.personate_user_class or _get_personate_user_class())
@@ -33,8 +43,16 @@ class FTPAccountAuthorizer(object):
         else:
             self.personate_user = None
 
+    def get_login_rate_limiter(self):
+        """return login rate limiter configured by settings, or None.
+        """
+        options = get_settings_value('FTPSERVER_LOGIN_RATE_LIMIT')
+        if options is None:
+            return None
+        return self.login_rate_limiter_class(**options)
+
     def _filter_user_by(self, username):
-        return {"user__%s" % self.username_field: username}
+        return {"login_name": self.model.normalize_login_name(username)}
 
     def has_user(self, username):
         """return True if exists user.
@@ -47,7 +65,8 @@ class FTPAccountAuthorizer(object):
         """return user by username.
         """
         try:
-            account = self.model.objects.get(
+            account = self.model.objects.select_related(
+                'group', 'user').get(
                 **self._filter_user_by(username)
             )
         except self.model.DoesNotExist:
@@ -57,12 +76,35 @@ class FTPAccountAuthorizer(object):
     def validate_authentication(self, username, password, handler):
         """authenticate user with password
         """
+        # case variants of a case insensitive login share limits and rules
+        login_name = self.model.normalize_login_name(username)
+        limiter = self.login_rate_limiter
+        remote_ip = getattr(handler, 'remote_ip', None)
+        if limiter is not None and not limiter.allow(remote_ip, login_name):
+            if metrics.registry.enabled:
+                metrics.authentication_failures.inc(reason='rate_limited')
+            raise AuthenticationFailed("Too many login attempts.")
+        start = time.perf_counter()
+        account = self.get_account(username)
+        if account is not None:
+            # username of the user may differ from login in case
+            username = getattr(account.user, self.username_field)
         user = authenticate(
             **{self.username_field: username, 'password': password}
         )
-        account = self.get_account(username)
-        if not (user and account):
+        if metrics.registry.enabled:
+            metrics.authentication_duration.observe(
+                time.perf_counter() - start)
+        if not (user and account and user.pk == account.user_id):
+            if metrics.registry.enabled:
+                metrics.authentication_failures.inc(reason='invalid')
+            if limiter is not None:
+                limiter.failure(remote_ip, login_name)
             raise AuthenticationFailed("Authentication failed.")
+        if limiter is not None:
+            limiter.success(remote_ip, login_name)
+        self.cache_permission_rules(
+            login_name, self.compile_permission_rules(account))
 
     def get_home_dir(self, username):
         account = self.get_account(username)
@@ -76,23 +118,52 @@ class FTPAccountAuthorizer(object):
         account = self.get_account(username)
         if account:
             account.update_last_login()
-            account.save()
+            account.save(update_fields=['last_login'])
         return 'welcome.'
 
     def get_msg_quit(self, username):
         return 'good bye.'
 
+    def compile_permission_rules(self, account):
+        """return PermissionTrie of account, rooted at the home directory.
+        """
+        return account.get_permission_rules()
+
+    def cache_permission_rules(self, username, rules):
+        self._permission_rules[username] = rules
+        self._permission_rules.move_to_end(username)
+        while len(self._permission_rules) > self.max_permission_rules:
+            self._permission_rules.popitem(last=False)
+
+    def get_permission_rules(self, username):
+        """return compiled permission rules of user.
+
+        The rules are compiled at login and cached,
+        so checking permissions doesn't access the database.
+        """
+        login_name = self.model.normalize_login_name(username)
+        rules = self._permission_rules.get(login_name)
+        if rules is None:
+            account = self.get_account(username)
+            if not account:
+                return None
+            rules = self.compile_permission_rules(account)
+            self.cache_permission_rules(login_name, rules)
+        else:
+            self._permission_rules.move_to_end(login_name)
+        return rules
+
     def has_perm(self, username, perm, path=None):
         """check user permission
         """
-        account = self.get_account(username)
-        return account and account.has_perm(perm, path)
+        rules = self.get_permission_rules(username)
+        return rules is not None and rules.has_perm(perm, path)
 
     def get_perms(self, username):
         """return user permissions
         """
-        account = self.get_account(username)
-        return account and account.get_perms()
+        rules = self.get_permission_rules(username)
+        return rules and rules.get_perms()
 
     def impersonate_user(self, username, password):
         """delegate to personate_user method
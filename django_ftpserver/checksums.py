@@ -0,0 +1,214 @@
+"""Checksums of files computed while the data is transferred.
+
+Digests are stored in FTPFileChecksum by storage alias and path, so
+checksum commands (XCRC, XMD5, XSHA1, XSHA256, HASH) don't read the data
+again.
+"""
+import hashlib
+import logging
+import zlib
+
+logger = logging.getLogger(__name__)
+
+ALGORITHMS = ('crc32', 'md5', 'sha1', 'sha256')
+# names of algorithms in HASH command (draft-bryan-ftpext-hash)
+HASH_NAMES = {
+    'crc32': 'CRC32',
+    'md5': 'MD5',
+    'sha1': 'SHA-1',
+    'sha256': 'SHA-256',
+}
+READ_SIZE = 65536
+
+
+class CRC32(object):
+    """hashlib like interface of zlib.crc32
+    """
+
+    def __init__(self):
+        self.value = 0
+
+    def update(self, data):
+        self.value = zlib.crc32(data, self.value)
+
+    def hexdigest(self):
+        return '{0:08x}'.format(self.value & 0xffffffff)
+
+
+def new(algorithm):
+    if algorithm == 'crc32':
+        return CRC32()
+    return hashlib.new(algorithm)
+
+
+def get_algorithms(value):
+    """return tuple of algorithms from FTPSERVER_CHECKSUMS setting value.
+    """
+    if not value:
+        return ()
+    if value is True:
+        return ALGORITHMS
+    for algorithm in value:
+        if algorithm not in ALGORITHMS:
+            raise ValueError('Unknown checksum algorithm: {}'.format(
+                algorithm))
+    return tuple(value)
+
+
+class ChecksumFile(object):
+    """Proxy of file which updates digests while the data is transferred.
+
+    Written files are stored on close. Read files are stored on close
+    if they were read from the beginning to the end.
+    Files opened to append or resume make the stored digests invalid.
+    """
+
+    def __init__(self, file, path, mode, algorithms, storage=''):
+        self._file = file
+        self._path = path
+        self._storage = storage
+        self._writing = 'w' in mode
+        self._resuming = 'a' in mode or '+' in mode
+        self._hashers = dict(
+            (algorithm, new(algorithm)) for algorithm in algorithms)
+        self._size = 0
+        self._complete = False
+        self._partial = False
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def __iter__(self):
+        return iter(self._file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _update(self, data):
+        if data:
+            self._size += len(data)
+            for hasher in self._hashers.values():
+                hasher.update(data)
+
+    def read(self, *args):
+        data = self._file.read(*args)
+        if not data:
+            self._complete = True
+        self._update(data)
+        return data
+
+    def write(self, data):
+        self._update(data)
+        return self._file.write(data)
+
+    def seek(self, *args):
+        self._partial = True
+        return self._file.seek(*args)
+
+    def digests(self):
+        return dict(
+            (algorithm, hasher.hexdigest())
+            for algorithm, hasher in self._hashers.items())
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._file.close()
+        try:
+            if self._resuming:
+                delete(self._path, self._storage)
+            elif self._writing and not self._partial:
+                save(self._path, self._size, self.digests(),
+                     storage=self._storage)
+            elif self._complete and not self._partial:
+                save(self._path, self._size, self.digests(), replace=False,
+                     storage=self._storage)
+        except Exception:
+            logger.exception('Failed to store checksums of %s.', self._path)
+
+
+def save(path, size, digests, replace=True, storage=''):
+    """store digests of path in storage (alias of FTPSERVER_STORAGES,
+    empty is the default storage).
+    """
+    from .models import FTPFileChecksum
+    checksums = FTPFileChecksum.objects.filter(
+        storage=storage, path_hash=FTPFileChecksum.hash_path(path))
+    if not replace and checksums.filter(size=size).exists():
+        return
+    checksums.delete()
+    FTPFileChecksum.objects.create(
+        storage=storage, path=path, size=size, **digests)
+
+
+def delete(path, storage=''):
+    from .models import FTPFileChecksum
+    FTPFileChecksum.objects.filter(
+        storage=storage, path_hash=FTPFileChecksum.hash_path(path),
+    ).delete()
+
+
+def rename(src, dst, storage=''):
+    from .models import FTPFileChecksum
+    checksums = FTPFileChecksum.objects.filter(storage=storage)
+    dst_hash = FTPFileChecksum.hash_path(dst)
+    checksums.filter(path_hash=dst_hash).delete()
+    checksums.filter(path_hash=FTPFileChecksum.hash_path(src)).update(
+        path=dst, path_hash=dst_hash)
+
+
+def get_stored(path, algorithm, size, storage=''):
+    """return stored hex digest, or None.
+    """
+    from .models import FTPFileChecksum
+    digest = FTPFileChecksum.objects.filter(
+        storage=storage, path_hash=FTPFileChecksum.hash_path(path),
+        size=size,
+    ).values_list(algorithm, flat=True).first()
+    return digest or None
+
+
+def compute(fs, path, algorithms=ALGORITHMS):
+    """read file and return (size, {algorithm: hex digest})
+    """
+    hashers = dict((algorithm, new(algorithm)) for algorithm in algorithms)
+    size = 0
+    with fs.open(path, 'rb') as f:
+        while True:
+            data = f.read(READ_SIZE)
+            if not data:
+                break
+            size += len(data)
+            for hasher in hashers.values():
+                hasher.update(data)
+    return size, dict(
+        (algorithm, hasher.hexdigest())
+        for algorithm, hasher in hashers.items())
+
+
+def get_checksum(fs, path, algorithm):
+    """return hex digest of file.
+
+    The digest is looked up in the stored digests, the native checksum of
+    the storage (e.g. ETag of S3), and is computed by reading the file
+    at last (and stored).
+    """
+    storage = getattr(fs, 'storage_alias', '')
+    size = fs.getsize(path)
+    digest = get_stored(path, algorithm, size, storage)
+    if digest:
+        return digest
+    get_native_checksum = getattr(fs, 'get_native_checksum', None)
+    if get_native_checksum is not None:
+        digest = get_native_checksum(path, algorithm)
+        if digest:
+            return digest
+    algorithms = getattr(fs, 'checksum_algorithms', None) or ALGORITHMS
+    if algorithm not in algorithms:
+        algorithms = tuple(algorithms) + (algorithm,)
+    size, digests = compute(fs, path, algorithms)
+    save(path, size, digests, storage=storage)
+    return digests[algorithm]
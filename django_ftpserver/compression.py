@@ -0,0 +1,122 @@
+"""Deflate transfer mode (MODE Z) of the data channel.
+
+Data is compressed and decompressed by chunks, so memory of a transfer
+is bounded by the size of a chunk and the zlib window.
+"""
+import sys
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_LEVEL = 6
+# maximum bytes of decompressed data per zlib call
+CHUNK_SIZE = 65536
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor(threads):
+    """return thread pool shared by sessions, or None if threads is 0.
+    """
+    global _executor
+    if not threads:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            options = {}
+            if sys.version_info >= (3, 6):
+                options['thread_name_prefix'] = 'ftpserver-deflate'
+            _executor = ThreadPoolExecutor(max_workers=threads, **options)
+        return _executor
+
+
+def compress(data, level=DEFAULT_LEVEL):
+    """return deflate stream of data.
+    """
+    compressor = zlib.compressobj(level)
+    return compressor.compress(data) + compressor.flush()
+
+
+class DeflateProducer(object):
+    """Producer which compresses the data of another producer.
+
+    With executor, the next chunk is read and compressed in the thread pool
+    while the current chunk is sent, so the IOLoop only waits for
+    chunks which aren't ready.
+    """
+
+    def __init__(self, producer, level=DEFAULT_LEVEL, executor=None):
+        self.producer = producer
+        self._compressor = zlib.compressobj(level)
+        self._executor = executor
+        self._future = None
+        self._done = False
+
+    def __getattr__(self, name):
+        # FileProducer attributes, e.g. file
+        return getattr(self.producer, name)
+
+    def _next(self):
+        """return next compressed chunk, b'' at the end.
+        """
+        while not self._done:
+            data = self.producer.more()
+            if data:
+                chunk = self._compressor.compress(data)
+            else:
+                self._done = True
+                chunk = self._compressor.flush()
+            if chunk:
+                return chunk
+        return b''
+
+    def more(self):
+        if self._executor is None:
+            return self._next()
+        future = self._future or self._executor.submit(self._next)
+        chunk = future.result()
+        self._future = None
+        if chunk:
+            self._future = self._executor.submit(self._next)
+        return chunk
+
+
+class InflateFile(object):
+    """Proxy of file which decompresses written data.
+
+    data_wrapper (e.g. conversion of line endings of ASCII type) is applied
+    to decompressed data.
+    """
+
+    def __init__(self, file, data_wrapper=None, chunk_size=CHUNK_SIZE):
+        self._file = file
+        self._data_wrapper = data_wrapper
+        self._decompressor = zlib.decompressobj()
+        self._chunk_size = chunk_size
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def _write(self, data):
+        if data:
+            if self._data_wrapper is not None:
+                data = self._data_wrapper(data)
+            self._file.write(data)
+
+    def write(self, data):
+        decompressor = self._decompressor
+        try:
+            while data:
+                self._write(decompressor.decompress(data, self._chunk_size))
+                data = decompressor.unconsumed_tail
+        except zlib.error as e:
+            raise OSError('Invalid compressed data: {}'.format(e))
+
+    def close(self):
+        if self._file.closed:
+            return
+        try:
+            self._write(self._decompressor.flush())
+        finally:
+            self._file.close()
@@ -0,0 +1,274 @@
+"""Events of FTP sessions dispatched to handlers off the IOLoop.
+
+Events:
+
+* file_received: a file was uploaded (STOR, APPE, STOU)
+* file_sent: a file was downloaded (RETR)
+* file_deleted: a file was deleted (DELE)
+* login: a user logged in
+
+Handlers are called with a list of events (a batch) in worker threads
+of EventDispatcher, or synchronously by LocalDispatcher in tests.
+"""
+import logging
+import threading
+import time
+from collections import deque
+
+from django import db
+
+from . import metrics
+from .utils import import_class
+
+logger = logging.getLogger(__name__)
+
+EVENTS = ('file_received', 'file_sent', 'file_deleted', 'login')
+OVERFLOW_POLICIES = ('drop', 'drop_oldest', 'block')
+
+
+class Event(object):
+    """Event of a FTP session.
+    """
+    __slots__ = ('name', 'username', 'account_id', 'path', 'time')
+
+    def __init__(self, name, username=None, account_id=None, path=None,
+                 time=None):
+        self.name = name
+        self.username = username
+        self.account_id = account_id
+        self.path = path
+        self.time = time
+
+    def __repr__(self):
+        return '<Event {0} {1} {2}>'.format(
+            self.name, self.username, self.path or '')
+
+    def as_dict(self):
+        return dict((name, getattr(self, name)) for name in self.__slots__)
+
+
+class BaseDispatcher(object):
+    """Registry of event handlers.
+    """
+
+    def __init__(self, handlers=None):
+        # event name: list of handlers
+        self.handlers = dict((name, []) for name in EVENTS)
+        for name, funcs in (handlers or {}).items():
+            for func in funcs:
+                self.register(name, func)
+
+    def register(self, name, handler):
+        """register handler(events) of event name.
+
+        handler may be a dotted path of a function.
+        """
+        if name not in self.handlers:
+            raise ValueError('Unknown event: {}'.format(name))
+        if isinstance(handler, str):
+            handler = import_class(handler)
+        self.handlers[name].append(handler)
+        return handler
+
+    def has_handlers(self, name):
+        return bool(self.handlers.get(name))
+
+    def dispatch(self, name, **data):
+        raise NotImplementedError
+
+    def start(self):
+        pass
+
+    def stop(self, timeout=None):
+        pass
+
+
+class LocalDispatcher(BaseDispatcher):
+    """Dispatcher which calls handlers synchronously, for tests.
+
+    Dispatched events are recorded in `events`.
+    """
+
+    def __init__(self, handlers=None):
+        super(LocalDispatcher, self).__init__(handlers)
+        self.events = []
+
+    def dispatch(self, name, **data):
+        event = Event(name, time=time.time(), **data)
+        self.events.append(event)
+        for handler in self.handlers[name]:
+            handler([event])
+        return True
+
+
+class EventDispatcher(BaseDispatcher):
+    """Dispatcher with a bounded queue and a pool of worker threads.
+
+    * handlers: {event name: [handler or dotted path]}
+    * workers: number of worker threads
+    * max_queue: maximum number of queued events
+    * batch_size: maximum number of events passed to a handler at once
+    * batch_wait: seconds to wait for more events of a batch
+    * retries: number of retries of a failed handler
+    * backoff: seconds before the first retry, doubled on each retry
+    * max_backoff: maximum seconds between retries
+    * overflow: policy when the queue is full,
+      'drop' (drop new events), 'drop_oldest' or
+      'block' (wait up to block_timeout seconds, then drop)
+
+    Dropped events and failed handler calls are counted in `dropped`
+    and `failed`.
+    """
+
+    def __init__(self, handlers=None, workers=2, max_queue=10000,
+                 batch_size=1, batch_wait=0.0, retries=3, backoff=1.0,
+                 max_backoff=60.0, overflow='drop', block_timeout=1.0):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError('Unknown overflow policy: {}'.format(overflow))
+        super(EventDispatcher, self).__init__(handlers)
+        self.workers = workers
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.dropped = 0
+        self.failed = 0
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._stopped = threading.Event()
+        self._threads = []
+
+    def _count(self, name, result, count=1):
+        if metrics.registry.enabled:
+            metrics.events.inc(count, event=name, result=result)
+
+    def dispatch(self, name, **data):
+        """queue event, called on the IOLoop.
+
+        return False if the event was dropped.
+        """
+        if not self.handlers[name]:
+            return True
+        event = Event(name, time=time.time(), **data)
+        with self._lock:
+            if len(self._queue) >= self.max_queue:
+                if self.overflow == 'drop_oldest':
+                    dropped = self._queue.popleft()
+                    self.dropped += 1
+                    self._count(dropped.name, 'dropped')
+                elif self.overflow == 'block' and self._threads:
+                    self._not_full.wait_for(
+                        lambda: len(self._queue) < self.max_queue,
+                        self.block_timeout)
+                if len(self._queue) >= self.max_queue:
+                    self.dropped += 1
+                    self._count(name, 'dropped')
+                    return False
+            self._queue.append(event)
+            self._not_empty.notify()
+        self._count(name, 'queued')
+        return True
+
+    def __len__(self):
+        return len(self._queue)
+
+    def _take(self):
+        """return batch of queued events, empty list when stopped.
+        """
+        with self._lock:
+            self._not_empty.wait_for(
+                lambda: self._queue or self._stopped.is_set())
+            if not self._queue:
+                return []
+            if self.batch_wait and len(self._queue) < self.batch_size:
+                self._not_empty.wait_for(
+                    lambda: len(self._queue) >= self.batch_size
+                    or self._stopped.is_set(), self.batch_wait)
+            batch = [
+                self._queue.popleft()
+                for _ in range(min(self.batch_size, len(self._queue)))]
+            self._not_full.notify_all()
+            return batch
+
+    def call(self, handler, events):
+        """call handler with retries, return True if it succeeded.
+        """
+        delay = self.backoff
+        for attempt in range(self.retries + 1):
+            try:
+                handler(events)
+                return True
+            except Exception:
+                logger.exception(
+                    'Event handler %r failed (attempt %d/%d).',
+                    handler, attempt + 1, self.retries + 1)
+            if attempt < self.retries:
+                # stop() interrupts the backoff but not the retries
+                self._stopped.wait(min(delay, self.max_backoff))
+                delay *= 2
+        self.failed += 1
+        return False
+
+    def process(self, batch):
+        """call handlers with events of batch grouped by name.
+        """
+        by_name = {}
+        for event in batch:
+            by_name.setdefault(event.name, []).append(event)
+        db.close_old_connections()
+        for name, events in by_name.items():
+            for handler in self.handlers[name]:
+                result = 'delivered' if self.call(handler, events) \
+                    else 'failed'
+                self._count(name, result, len(events))
+
+    def run(self):
+        try:
+            while True:
+                batch = self._take()
+                if not batch:
+                    return
+                self.process(batch)
+        finally:
+            db.connection.close()
+
+    def start(self):
+        self._stopped.clear()
+        self._threads = [
+            threading.Thread(
+                target=self.run, name='ftpserver-events-{}'.format(i),
+                daemon=True)
+            for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout=None):
+        """stop workers after the queued events are processed.
+        """
+        with self._lock:
+            self._stopped.set()
+            self._not_empty.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+
+def make_dispatcher(options):
+    """return dispatcher from FTPSERVER_EVENTS setting value.
+
+    'dispatcher' is 'threads' (EventDispatcher, default) or 'local'
+    (LocalDispatcher), other keys are keyword arguments of the dispatcher.
+    """
+    options = dict(options)
+    kind = options.pop('dispatcher', 'threads')
+    if kind == 'local':
+        return LocalDispatcher(**options)
+    if kind != 'threads':
+        raise ValueError('Unknown dispatcher: {}'.format(kind))
+    return EventDispatcher(**options)
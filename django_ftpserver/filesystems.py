@@ -1,4 +1,8 @@
+import errno
+import itertools
 import logging
+import posixpath
+import shutil
 import time
 import os
 from collections import namedtuple
@@ -9,6 +13,9 @@ from django.core.files.storage import (
     get_storage_class as _get_storage_class
 )
 
+from . import checksums, metrics, prefetch, quotas, storages, tracing
+from .utils import get_settings_value
+
 logger = logging.getLogger(__name__)
 
 PseudoStat = namedtuple(
@@ -21,30 +28,51 @@ PseudoStat = namedtuple(
 
 class StoragePatch:
     """Base class for patches to StorageFS.
+
+    Methods of a patch override methods of StorageFS in a subclass,
+    which is created once per StorageFS class and patch
+    (see `patch_class`). The overridden methods are `_origin_<name>`.
     """
     patch_methods = ()
 
+    @classmethod
+    def patch_class(cls, fs_class):
+        """return subclass of fs_class with the patch methods.
+        """
+        if fs_class._patch is cls:
+            return fs_class
+        key = (fs_class, cls)
+        patched = _patched_classes.get(key)
+        if patched is None:
+            logger.debug(
+                'Patching %s with %s.', fs_class.__name__, cls.__name__)
+            attrs = {'_patch': cls, '__module__': fs_class.__module__}
+            for method_name in cls.patch_methods:
+                # if fs hasn't method, raise AttributeError.
+                attrs['_origin_' + method_name] = getattr(
+                    fs_class, method_name)
+                attrs[method_name] = getattr(cls, method_name)
+            patched = _patched_classes.setdefault(key, type(
+                '{0}With{1}'.format(fs_class.__name__, cls.__name__),
+                (fs_class,), attrs))
+        return patched
+
     @classmethod
     def apply(cls, fs):
-        """replace bound methods of fs.
+        """change class of fs to the patched class.
         """
-        logger.debug(
-            'Patching %s with %s.', fs.__class__.__name__, cls.__name__)
-        fs._patch = cls
-        for method_name in cls.patch_methods:
-            # if fs hasn't method, raise AttributeError.
-            origin = getattr(fs, method_name)
-            method = getattr(cls, method_name)
-            bound_method = method.__get__(fs, fs.__class__)
-            setattr(fs, method_name, bound_method)
-            setattr(fs, '_origin_' + method_name, origin)
+        fs.__class__ = cls.patch_class(fs.__class__)
+
+
+# (StorageFS class, StoragePatch): patched subclass
+_patched_classes = {}
 
 
 class FileSystemStoragePatch(StoragePatch):
     """StoragePatch for Django's FileSystemStorage.
     """
     patch_methods = (
-        'mkdir', 'rmdir', 'stat',
+        'mkdir', 'rmdir', 'stat', '_move',
     )
 
     def mkdir(self, path):
@@ -53,6 +81,9 @@ class FileSystemStoragePatch(StoragePatch):
     def rmdir(self, path):
         os.rmdir(self.storage.path(path))
 
+    def _move(self, src, dst):
+        os.rename(self.storage.path(src), self.storage.path(dst))
+
     def stat(self, path):
         return os.stat(self.storage.path(path))
 
@@ -61,7 +92,8 @@ class S3Boto3StoragePatch(StoragePatch):
     """StoragePatch for S3Boto3Storage(provided by django-storages).
     """
     patch_methods = (
-        '_exists', 'isdir', 'getmtime',
+        '_exists', 'isdir', 'getmtime', 'get_native_checksum',
+        'listdir_pages', '_move',
     )
 
     def _exists(self, path):
@@ -79,12 +111,68 @@ class S3Boto3StoragePatch(StoragePatch):
             return 0
         return self._origin_getmtime(path)
 
+    def get_native_checksum(self, path, algorithm):
+        """MD5 from ETag of the object (not of multipart uploads).
+        """
+        if algorithm != 'md5':
+            return None
+        storage = self.storage
+        name = storage._normalize_name(storage._clean_name(path))
+        etag = storage.bucket.Object(name).e_tag.strip('"')
+        if '-' in etag:
+            return None
+        return etag
+
+    def _move(self, src, dst):
+        """copy object src to dst in the bucket and delete src.
+
+        The object is copied by S3, it isn't downloaded and uploaded.
+        """
+        if self.isdir(src):
+            return self._origin__move(src, dst)
+        storage = self.storage
+        storage.bucket.copy(
+            {'Bucket': storage.bucket_name,
+             'Key': storage._normalize_name(storage._clean_name(src))},
+            storage._normalize_name(storage._clean_name(dst)))
+        storage.delete(src)
+
+    def listdir_pages(self, path):
+        """yield (directories, files) of each page of list_objects_v2.
+        """
+        if path == '/':
+            path = ''
+        storage = self.storage
+        prefix = storage._normalize_name(storage._clean_name(path))
+        if prefix and not prefix.endswith('/'):
+            prefix += '/'
+        client = storage.connection.meta.client
+        # requests of the client are recorded as calls of the storage
+        list_objects = self.wrap_storage_call(
+            'list_objects_v2',
+            lambda prefix, **kwargs: client.list_objects_v2(
+                Prefix=prefix, **kwargs))
+        kwargs = {'Bucket': storage.bucket_name, 'Delimiter': '/'}
+        while True:
+            page = list_objects(prefix, **kwargs)
+            directories = [
+                posixpath.relpath(entry['Prefix'], prefix)
+                for entry in page.get('CommonPrefixes', ())]
+            files = [
+                posixpath.relpath(entry['Key'], prefix)
+                for entry in page.get('Contents', ())
+                if entry['Key'] != prefix]
+            yield directories, files
+            if not page.get('IsTruncated'):
+                return
+            kwargs['ContinuationToken'] = page['NextContinuationToken']
+
 
 class DjangoGCloudStoragePatch(StoragePatch):
     """StoragePatch for DjangoGCloudStorage(provided by django-gcloud-storage).
     """
     patch_methods = (
-        '_exists', 'isdir', 'getmtime', 'listdir',
+        '_exists', 'isdir', 'getmtime', 'listdir', 'listdir_pages',
     )
 
     def _exists(self, path):
@@ -107,41 +195,128 @@ class DjangoGCloudStoragePatch(StoragePatch):
             path += '/'
         return self._origin_listdir(path)
 
+    def listdir_pages(self, path):
+        if not path.endswith('/'):
+            path += '/'
+        return self._origin_listdir_pages(path)
+
+
+class InMemoryStoragePatch(StoragePatch):
+    """StoragePatch for InMemoryStorage.
+    """
+    patch_methods = (
+        'mkdir', 'rmdir',
+    )
+
+    def mkdir(self, path):
+        self.storage.makedirs(path)
+
+    def rmdir(self, path):
+        self.storage.removedir(path)
+
 
 class StorageFS(AbstractedFS):
     """FileSystem for bridge to Django storage.
     """
     storage_class = None
+    # StoragePatch applied to the class
+    _patch = None
+    # {path: stat result or exception} prefetched for the current listing
+    _stat_cache = None
     patches = {
         'FileSystemStorage': FileSystemStoragePatch,
         'S3Boto3Storage': S3Boto3StoragePatch,
         'DjangoGCloudStorage': DjangoGCloudStoragePatch,
+        'InMemoryStorage': InMemoryStoragePatch,
+        # LatencyStorage has makedirs and removedir of InMemoryStorage
+        'LatencyStorage': InMemoryStoragePatch,
     }
 
     def apply_patch(self):
         """apply adjustment patch for storage
+
+        The patch is selected by the storage class, so the storage isn't
+        created unless storage_class is a factory function. Storages of
+        aliases are shared by sessions and are taken as they are.
         """
-        patch = self.patches.get(self.storage.__class__.__name__)
+        storage_class = self.get_storage_class()
+        if self.storage_alias or not isinstance(storage_class, type):
+            storage = self.get_storage()
+            storage_class = storage.__class__
+            self._storage = self.wrap_storage(storage)
+        patch = self.patches.get(storage_class.__name__)
         if patch:
             patch.apply(self)
 
     def __init__(self, root, cmd_channel):
         super(StorageFS, self).__init__(root, cmd_channel)
-        self.storage = self.get_storage()
+        self.checksum_algorithms = checksums.get_algorithms(
+            get_settings_value('FTPSERVER_CHECKSUMS'))
+        # usage of the account is maintained if it has a quota
+        self.account = getattr(cmd_channel, 'account', None)
+        self.quota = self.account.get_quota() if self.account else 0
+        # alias of FTPSERVER_STORAGES, the default storage if empty
+        self.storage_alias = \
+            self.account.get_storage_alias() if self.account else ''
+        # created on first use, idle sessions don't hold a storage
+        self._storage = None
         self.apply_patch()
 
+    @property
+    def storage(self):
+        if self._storage is None:
+            self._storage = self.wrap_storage(self.get_storage())
+        return self._storage
+
+    @storage.setter
+    def storage(self, storage):
+        self._storage = storage
+
+    def wrap_storage(self, storage):
+        """return storage wrapped for metrics and tracing (if enabled).
+        """
+        if metrics.registry.enabled:
+            storage = metrics.InstrumentedStorage(storage)
+        tracer = getattr(self.cmd_channel, 'storage_tracer', None)
+        if tracer is not None:
+            storage = tracing.TracedStorage(storage, tracer)
+        return storage
+
+    def wrap_storage_call(self, name, func):
+        """return func recorded as storage method name by the metrics and
+        tracing of the storage (e.g. requests of the storage's client).
+        """
+        wrap_call = getattr(self.storage, 'wrap_call', None)
+        if wrap_call is None:
+            return func
+        return wrap_call(name, func)
+
     def get_storage_class(self):
         if self.storage_class is None:
             return _get_storage_class()
         return self.storage_class
 
     def get_storage(self):
+        if self.storage_alias:
+            return storages.get_storage(self.storage_alias)
         storage_class = self.get_storage_class()
         return storage_class()
 
     def open(self, filename, mode):
         path = os.path.join(self._cwd, filename)
-        return self.storage.open(path, mode)
+        if self.quota and ('w' in mode or 'a' in mode or '+' in mode):
+            usage = quotas.get_usage(self.account.pk)
+            if usage >= self.quota:
+                raise quotas.quota_error()
+            size = self.getsize(path) if self.isfile(path) else None
+        f = self.storage.open(path, mode)
+        if self.checksum_algorithms:
+            f = checksums.ChecksumFile(
+                f, path, mode, self.checksum_algorithms, self.storage_alias)
+        if self.quota and ('w' in mode or 'a' in mode or '+' in mode):
+            f = quotas.QuotaFile(
+                f, self.account.pk, self.quota, usage, size, mode)
+        return f
 
     def mkstemp(self, suffix='', prefix='', dir=None, mode='wb'):
         raise NotImplementedError
@@ -161,17 +336,85 @@ class StorageFS(AbstractedFS):
         return ([name + '/' for name in directories if name]
                 + [name for name in files if name])
 
+    def listdir_pages(self, path):
+        """yield (directories, files) of directory path by page.
+
+        Storages which list by page (e.g. object stores) provide
+        `listdir_pages`, other storages list the directory as a page.
+        """
+        if path == '/':
+            path = ''
+        listdir_pages = getattr(self.storage, 'listdir_pages', None)
+        if listdir_pages is None:
+            yield self.storage.listdir(path)
+        else:
+            yield from listdir_pages(path)
+
+    def iter_listdir(self, path):
+        """yield names of listdir, fetched page by page.
+
+        Names are sorted within each page, so the listing is sorted if
+        the storage lists the directory as a page.
+        """
+        assert isinstance(path, str), path
+        for directories, files in self.listdir_pages(path):
+            yield from sorted(
+                [name + '/' for name in directories if name]
+                + [name for name in files if name])
+
     def rmdir(self, path):
         raise NotImplementedError
 
     def remove(self, path):
         assert isinstance(path, str), path
+        size = self.getsize(path) if self.quota else 0
         self.storage.delete(path)
+        if self.checksum_algorithms:
+            checksums.delete(path, self.storage_alias)
+        if self.quota:
+            quotas.add_usage(self.account.pk, -size, -1)
+
+    def _move(self, src, dst):
+        """copy file src to dst and delete src.
+
+        The data is copied through the server on the IOLoop, which
+        blocks other sessions while a large file is renamed; patches
+        override it with a copy by the storage where there is one.
+        """
+        if self.isdir(src):
+            raise OSError(
+                errno.EOPNOTSUPP,
+                'Renaming directories is not supported by the storage', src)
+        with self.storage.open(src, 'rb') as source, \
+                self.storage.open(dst, 'wb') as target:
+            shutil.copyfileobj(source, target)
+        self.storage.delete(src)
+
+    def rename(self, src, dst):
+        assert isinstance(src, str), src
+        assert isinstance(dst, str), dst
+        replaced = None
+        if self.quota and self.isfile(dst):
+            replaced = self.getsize(dst)
+        self._move(src, dst)
+        if self.checksum_algorithms:
+            checksums.rename(src, dst, self.storage_alias)
+        if replaced is not None:
+            quotas.add_usage(self.account.pk, -replaced, -1)
 
     def chmod(self, path, mode):
         raise NotImplementedError
 
     def stat(self, path):
+        cache = self._stat_cache
+        if cache is not None and path in cache:
+            result = cache.pop(path)
+            if isinstance(result, Exception):
+                raise result
+            return result
+        return self._stat(path)
+
+    def _stat(self, path):
         if self.isfile(path):
             st_mode = 0o0100770
         else:
@@ -190,6 +433,51 @@ class StorageFS(AbstractedFS):
 
     lstat = stat
 
+    def can_prefetch(self):
+        """return True if stat of entries is worth prefetching.
+
+        Patched stat (e.g. os.stat of FileSystemStorage) isn't prefetched.
+        """
+        return type(self).stat is StorageFS.stat
+
+    def prefetch_listing(self, basedir, listing, options):
+        """yield names of listing, after stat of each batch of names is
+        fetched concurrently into the cache of the listing.
+        """
+        executor = prefetch.get_executor(options['workers'])
+        stat = self._stat
+        tracer = getattr(self.cmd_channel, 'storage_tracer', None)
+        if tracer is not None:
+            # calls of the pool are charged to the listing command
+            stat = tracer.bind(stat)
+        listing = iter(listing)
+        try:
+            while True:
+                names = list(itertools.islice(listing, options['batch']))
+                if not names:
+                    return
+                paths = [os.path.join(basedir, name) for name in names]
+                self._stat_cache = prefetch.fetch(
+                    stat, paths, executor,
+                    time.monotonic() + options['deadline'])
+                yield from names
+        finally:
+            self._stat_cache = None
+
+    def format_list(self, basedir, listing, ignore_err=True):
+        options = prefetch.get_options()
+        if options is not None and self.can_prefetch():
+            listing = self.prefetch_listing(basedir, listing, options)
+        return super(StorageFS, self).format_list(
+            basedir, listing, ignore_err)
+
+    def format_mlsx(self, basedir, listing, perms, facts, ignore_err=True):
+        options = prefetch.get_options()
+        if options is not None and self.can_prefetch():
+            listing = self.prefetch_listing(basedir, listing, options)
+        return super(StorageFS, self).format_mlsx(
+            basedir, listing, perms, facts, ignore_err)
+
     def _exists(self, path):
         if path == '/':
             return self.storage.exists("")
@@ -222,6 +510,11 @@ class StorageFS(AbstractedFS):
     def lexists(self, path):
         return self._exists(path)
 
+    def get_native_checksum(self, path, algorithm):
+        """return hex digest provided by the storage, or None.
+        """
+        return None
+
     def get_user_by_uid(self, uid):
         return "owner"
 
@@ -0,0 +1,581 @@
+import itertools
+import logging
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from pyftpdlib.filesystems import FilesystemError
+from pyftpdlib.handlers import DTPHandler, FTPHandler, ThrottledDTPHandler
+
+try:
+    from pyftpdlib.handlers.ftp.producers import BufferedIteratorProducer
+    from pyftpdlib.utils import strerror
+except ImportError:
+    # pyftpdlib < 2.0
+    from pyftpdlib.handlers import BufferedIteratorProducer
+    from pyftpdlib.handlers import _strerror as strerror
+
+try:
+    from pyftpdlib.handlers import TLS_DTPHandler, TLS_FTPHandler
+except ImportError:
+    TLS_DTPHandler = TLS_FTPHandler = None
+
+from . import checksums, compression, metrics, quotas, storages, tls
+from .limits import ConnectionCounter
+from .utils import get_settings_value
+
+logger = logging.getLogger(__name__)
+
+checksum_proto_cmds = {
+    'HASH': dict(
+        perm='r', auth=True, arg=True,
+        help='Syntax: HASH <SP> file-name (get checksum of file).'),
+    'XCRC': dict(
+        perm='r', auth=True, arg=True,
+        help='Syntax: XCRC <SP> file-name (get CRC32 of file).'),
+    'XMD5': dict(
+        perm='r', auth=True, arg=True,
+        help='Syntax: XMD5 <SP> file-name (get MD5 of file).'),
+    'XSHA1': dict(
+        perm='r', auth=True, arg=True,
+        help='Syntax: XSHA1 <SP> file-name (get SHA-1 of file).'),
+    'XSHA256': dict(
+        perm='r', auth=True, arg=True,
+        help='Syntax: XSHA256 <SP> file-name (get SHA-256 of file).'),
+}
+
+
+class AccountThrottledDTPHandler(ThrottledDTPHandler):
+    """DTPHandler throttled by bandwidth limits of the authenticated account.
+    """
+
+    def __init__(self, sock, cmd_channel):
+        # limits must be set before ThrottledDTPHandler sizes the buffers.
+        self.read_limit, self.write_limit = getattr(
+            cmd_channel, 'bandwidth_limits', (0, 0))
+        super(AccountThrottledDTPHandler, self).__init__(sock, cmd_channel)
+
+    def use_sendfile(self):
+        if self.write_limit:
+            return False
+        if getattr(self.cmd_channel, 'transfer_mode', 'S') == 'Z':
+            return False
+        return DTPHandler.use_sendfile(self)
+
+    def enable_receiving(self, type, cmd):
+        super(AccountThrottledDTPHandler, self).enable_receiving(type, cmd)
+        if getattr(self.cmd_channel, 'transfer_mode', 'S') == 'Z':
+            # decompress before conversion of line endings
+            self.file_obj = compression.InflateFile(
+                self.file_obj, self._data_wrapper)
+            self._data_wrapper = None
+
+
+class FTPAccountHandler(FTPHandler):
+    """FTPHandler which applies settings of the authenticated FTP account.
+    """
+    dtp_handler = AccountThrottledDTPHandler
+    proto_cmds = dict(FTPHandler.proto_cmds, **checksum_proto_cmds)
+    connection_counter = ConnectionCounter()
+    max_connections_per_ip = 0
+    # tracing.StorageTracer, storage calls are not traced if None
+    storage_tracer = None
+    # profiling.CommandProfiler
+    profiler = None
+    # transferlog.TransferLogWriter, transfers are not logged if None
+    transfer_log = None
+    # events.EventDispatcher, events are not dispatched if None
+    event_dispatcher = None
+
+    account = None
+    bandwidth_limits = (0, 0)
+    # trace of the listing sent on the data channel, ended with the transfer
+    _listing_trace = None
+    _ip_connection_key = None
+    _account_connection_keys = ()
+    _session_counted = False
+    # algorithm of HASH command, selected by OPTS HASH
+    hash_algorithm = None
+    # 'S' (stream) or 'Z' (deflate), selected by MODE command
+    transfer_mode = 'S'
+    compression_level = compression.DEFAULT_LEVEL
+
+    def get_account(self, username):
+        """return FTP account from authorizer (if supported)
+        """
+        get_account = getattr(self.authorizer, 'get_account', None)
+        if get_account is None:
+            return None
+        return get_account(username)
+
+    def handle(self):
+        key = ('ip', self.remote_ip)
+        if not self.connection_counter.acquire(
+                key, self.max_connections_per_ip):
+            self.handle_max_cons_per_ip()
+            return
+        self._ip_connection_key = key
+        if metrics.registry.enabled:
+            metrics.active_sessions.inc()
+            self._session_counted = True
+        algorithms = self.get_checksum_algorithms()
+        if algorithms:
+            self._extra_feats.append('HASH ' + ';'.join(
+                checksums.HASH_NAMES[algorithm]
+                + ('*' if algorithm == self.get_hash_algorithm() else '')
+                for algorithm in algorithms))
+            self._extra_feats.extend(
+                cmd for cmd, algorithm in self.checksum_commands
+                if algorithm in algorithms)
+        self._extra_feats.append('MODE Z')
+        super(FTPAccountHandler, self).handle()
+
+    def handle_max_cons_per_account(self):
+        """Called when the account or its group has too many sessions.
+        """
+        msg = "421 Too many connections for this account."
+        self.respond_w_warning(msg)
+        self.close_when_done()
+
+    def acquire_account_connections(self, account):
+        """count a session for account and its group.
+
+        return False if a limit is reached.
+        """
+        user_key = ('user', account.pk)
+        if not self.connection_counter.acquire(
+                user_key, account.get_max_connections()):
+            return False
+        group_key = ('group', account.group_id)
+        if not self.connection_counter.acquire(
+                group_key, account.group.max_connections):
+            self.connection_counter.release(user_key)
+            return False
+        self._account_connection_keys = (user_key, group_key)
+        return True
+
+    def release_account_connections(self):
+        for key in self._account_connection_keys:
+            self.connection_counter.release(key)
+        self._account_connection_keys = ()
+
+    def handle_auth_success(self, home, password, msg_login):
+        account = self.get_account(self.username)
+        if account:
+            if not self.acquire_account_connections(account):
+                self.handle_max_cons_per_account()
+                return
+            if not self.check_account_storage(account):
+                self.handle_storage_error()
+                return
+            self.account = account
+            self.bandwidth_limits = account.get_bandwidth_limits()
+            self.compression_level = account.get_compression_level()
+        super(FTPAccountHandler, self).handle_auth_success(
+            home, password, msg_login)
+
+    def check_account_storage(self, account):
+        """return False if the storage alias of account can't be used.
+
+        The storage is created before the login is answered, e.g. an alias
+        removed from FTPSERVER_STORAGES, or OPTIONS which the storage
+        backend doesn't accept, fail here instead of after 230.
+        """
+        alias = account.get_storage_alias()
+        if not alias:
+            return True
+        try:
+            storages.get_storage(alias)
+        except (ImportError, ImproperlyConfigured, TypeError, ValueError):
+            logger.exception(
+                'Failed to create storage %r of %s.', alias, self.username)
+            return False
+        return True
+
+    def handle_storage_error(self):
+        """Called when the storage of the account is not available.
+        """
+        self.release_account_connections()
+        msg = "421 Storage of the account is not available."
+        self.respond_w_warning(msg)
+        self.close_when_done()
+
+    def flush_account(self):
+        super(FTPAccountHandler, self).flush_account()
+        self.reset_account()
+
+    def reset_account(self):
+        """release connections of the account and reset its settings.
+        """
+        self.release_account_connections()
+        self.account = None
+        self.bandwidth_limits = (0, 0)
+        self.transfer_mode = 'S'
+        self.compression_level = compression.DEFAULT_LEVEL
+
+    def release_connections(self):
+        """release connections counted for the session, once.
+        """
+        self.release_account_connections()
+        if self._ip_connection_key is not None:
+            self.connection_counter.release(self._ip_connection_key)
+            self._ip_connection_key = None
+        if self._session_counted:
+            metrics.active_sessions.dec()
+            self._session_counted = False
+
+    def close(self):
+        if not self._closed:
+            self.release_connections()
+            self.end_listing_trace()
+        super(FTPAccountHandler, self).close()
+
+    # checksum commands and their algorithms
+    checksum_commands = (
+        ('XCRC', 'crc32'), ('XMD5', 'md5'), ('XSHA1', 'sha1'),
+        ('XSHA256', 'sha256'))
+
+    def get_checksum_algorithms(self):
+        """return enabled checksum algorithms (FTPSERVER_CHECKSUMS).
+        """
+        return checksums.get_algorithms(
+            get_settings_value('FTPSERVER_CHECKSUMS'))
+
+    def get_hash_algorithm(self):
+        if self.hash_algorithm:
+            return self.hash_algorithm
+        algorithms = self.get_checksum_algorithms()
+        for algorithm in ('sha256', 'sha1', 'md5', 'crc32'):
+            if algorithm in algorithms:
+                return algorithm
+
+    def get_checksum(self, path, algorithm):
+        """return hex digest of file, or None after responding an error.
+        """
+        if algorithm not in self.get_checksum_algorithms():
+            self.respond('504 Checksum algorithm is not enabled.')
+            return None
+        line = self.fs.fs2ftp(path)
+        if not self.fs.isfile(self.fs.realpath(path)):
+            self.respond('550 {0} is not retrievable.'.format(line))
+            return None
+        try:
+            return self.run_as_current_user(
+                checksums.get_checksum, self.fs, path, algorithm)
+        except (OSError, FilesystemError) as err:
+            self.respond('550 {0}.'.format(strerror(err)))
+            return None
+
+    def _respond_checksum(self, path, algorithm):
+        digest = self.get_checksum(path, algorithm)
+        if digest is not None:
+            self.respond('250 {0}'.format(digest.upper()))
+
+    def ftp_XCRC(self, path):
+        self._respond_checksum(path, 'crc32')
+
+    def ftp_XMD5(self, path):
+        self._respond_checksum(path, 'md5')
+
+    def ftp_XSHA1(self, path):
+        self._respond_checksum(path, 'sha1')
+
+    def ftp_XSHA256(self, path):
+        self._respond_checksum(path, 'sha256')
+
+    def ftp_HASH(self, path):
+        algorithm = self.get_hash_algorithm()
+        if algorithm is None:
+            self.respond('504 Checksum algorithm is not enabled.')
+            return
+        digest = self.get_checksum(path, algorithm)
+        if digest is not None:
+            self.respond('213 {0} 0-{1} {2} {3}'.format(
+                checksums.HASH_NAMES[algorithm], self.fs.getsize(path),
+                digest, self.fs.fs2ftp(path)))
+
+    def ftp_OPTS(self, line):
+        cmd, _, arg = line.strip().partition(' ')
+        if cmd.upper() != 'HASH':
+            return super(FTPAccountHandler, self).ftp_OPTS(line)
+        algorithms = self.get_checksum_algorithms()
+        if arg:
+            names = dict(
+                (name, algorithm)
+                for algorithm, name in checksums.HASH_NAMES.items())
+            algorithm = names.get(arg.strip().upper())
+            if algorithm not in algorithms:
+                self.respond('501 Unknown algorithm.')
+                return
+            self.hash_algorithm = algorithm
+        algorithm = self.get_hash_algorithm()
+        if algorithm is None:
+            self.respond('501 Checksums are not enabled.')
+            return
+        self.respond('200 {0}'.format(checksums.HASH_NAMES[algorithm]))
+
+    def dispatch_event(self, name, path=None):
+        dispatcher = self.event_dispatcher
+        if dispatcher is None or not dispatcher.has_handlers(name):
+            return
+        dispatcher.dispatch(
+            name, username=self.username,
+            account_id=self.account and self.account.pk, path=path)
+
+    def on_login(self, username):
+        self.dispatch_event('login')
+
+    def on_file_received(self, file):
+        self.dispatch_event('file_received', file)
+
+    def on_file_sent(self, file):
+        self.dispatch_event('file_sent', file)
+
+    def ftp_DELE(self, path):
+        result = super(FTPAccountHandler, self).ftp_DELE(path)
+        if result is not None:
+            self.dispatch_event('file_deleted', result)
+        return result
+
+    def can_stream_listing(self, path):
+        """return True if listing of path is sent while it's fetched.
+        """
+        return hasattr(self.fs, 'iter_listdir') and self.fs.isdir(path)
+
+    def iter_listdir(self, path):
+        """return iterator of names in directory path (fs.iter_listdir),
+        or None after responding an error.
+
+        The first page is fetched here, so errors are responded before
+        the transfer starts.
+        """
+        try:
+            iterator = self.run_as_current_user(self.fs.iter_listdir, path)
+            first = self.run_as_current_user(next, iterator, None)
+        except (OSError, FilesystemError) as err:
+            self.respond('550 {0}.'.format(strerror(err)))
+            return None
+        if first is None:
+            return iter(())
+        return itertools.chain((first,), iterator)
+
+    def trace_listing(self, producer):
+        """return iterator of producer which runs in the trace of the
+        current command.
+
+        The trace ends when the data channel is closed instead of
+        after the command, so storage calls of formatting the listing
+        (e.g. stat of each entry) are charged to the command.
+        """
+        tracer = self.storage_tracer
+        trace = tracer and tracer.current
+        if trace is None:
+            return producer
+        self.end_listing_trace()
+        self._listing_trace = trace
+        return tracer.iterate(trace, producer)
+
+    def end_listing_trace(self):
+        trace = self._listing_trace
+        if trace is not None:
+            self._listing_trace = None
+            self.storage_tracer.end(trace)
+
+    def _on_dtp_close(self):
+        self.end_listing_trace()
+        super(FTPAccountHandler, self)._on_dtp_close()
+
+    def ftp_LIST(self, path):
+        if not self.can_stream_listing(path):
+            return super(FTPAccountHandler, self).ftp_LIST(path)
+        listing = self.iter_listdir(path)
+        if listing is None:
+            return None
+        producer = BufferedIteratorProducer(self.trace_listing(
+            self.fs.format_list(path, listing)))
+        self.push_dtp_data(producer, isproducer=True, cmd='LIST')
+        return path
+
+    def ftp_NLST(self, path):
+        if not self.can_stream_listing(path):
+            return super(FTPAccountHandler, self).ftp_NLST(path)
+        listing = self.iter_listdir(path)
+        if listing is None:
+            return None
+        producer = BufferedIteratorProducer(self.trace_listing(
+            (name + '\r\n').encode(self.encoding, self.unicode_errors)
+            for name in listing))
+        self.push_dtp_data(producer, isproducer=True, cmd='NLST')
+        return path
+
+    def ftp_MLSD(self, path):
+        if not self.can_stream_listing(path):
+            return super(FTPAccountHandler, self).ftp_MLSD(path)
+        listing = self.iter_listdir(path)
+        if listing is None:
+            return None
+        perms = self.authorizer.get_perms(self.username)
+        producer = BufferedIteratorProducer(self.trace_listing(
+            self.fs.format_mlsx(path, listing, perms, self._current_facts)))
+        self.push_dtp_data(producer, isproducer=True, cmd='MLSD')
+        return path
+
+    def ftp_MODE(self, line):
+        mode = line.upper()
+        if mode not in ('S', 'Z'):
+            return super(FTPAccountHandler, self).ftp_MODE(line)
+        self.transfer_mode = mode
+        self.respond('200 Transfer mode set to: {0}'.format(mode))
+
+    def ftp_ALLO(self, line):
+        quota = getattr(self.fs, 'quota', 0)
+        if not quota:
+            return super(FTPAccountHandler, self).ftp_ALLO(line)
+        try:
+            size = int(line.split()[0])
+        except (ValueError, IndexError):
+            self.respond('501 Invalid parameter.')
+            return
+        if quotas.get_usage(self.account.pk) + size > quota:
+            self.respond('552 Disk quota exceeded.')
+            return
+        self.respond('200 Storage is available.')
+
+    def get_compression_executor(self):
+        """return thread pool of compression (FTPSERVER_COMPRESSION_THREADS).
+
+        Compression runs on the IOLoop if None.
+        """
+        return compression.get_executor(
+            get_settings_value('FTPSERVER_COMPRESSION_THREADS'))
+
+    def push_dtp_data(self, data, isproducer=False, file=None, cmd=None):
+        if self.transfer_mode == 'Z':
+            if isproducer:
+                data = compression.DeflateProducer(
+                    data, self.compression_level,
+                    self.get_compression_executor())
+            else:
+                data = compression.compress(data, self.compression_level)
+        super(FTPAccountHandler, self).push_dtp_data(
+            data, isproducer, file, cmd)
+
+    @property
+    def session_label(self):
+        return '{0}:{1} {2}'.format(
+            self.remote_ip, self.remote_port, self.username or '')
+
+    def process_command(self, cmd, *args, **kwargs):
+        collect = metrics.registry.enabled
+        tracer = self.storage_tracer
+        trace = None
+        if tracer is not None:
+            trace = tracer.begin(
+                cmd, args[0] if args else '', self.session_label)
+        context = metrics.command_context
+        context.command = cmd
+        context.session = self
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.enter(cmd)
+        start = time.perf_counter()
+        try:
+            return self.execute_command(cmd, *args, **kwargs)
+        finally:
+            context.command = context.session = None
+            if profiler is not None:
+                profiler.exit()
+            if collect:
+                metrics.command_duration.observe(
+                    time.perf_counter() - start, command=cmd)
+            if trace is not None and trace is not self._listing_trace:
+                tracer.end(trace)
+
+    def execute_command(self, cmd, *args, **kwargs):
+        """process command, called by process_command in its metrics,
+        trace and profile.
+        """
+        return super(FTPAccountHandler, self).process_command(
+            cmd, *args, **kwargs)
+
+    def log_transfer(self, cmd, filename, receive, completed, elapsed,
+                     bytes):
+        super(FTPAccountHandler, self).log_transfer(
+            cmd, filename, receive, completed, elapsed, bytes)
+        if metrics.registry.enabled:
+            metrics.observe_transfer(receive, completed, elapsed, bytes)
+        if self.transfer_log is not None:
+            self.transfer_log.append(
+                self.account and self.account.pk, cmd, filename, bytes,
+                elapsed, completed)
+
+
+class TLSAccountHandlerMixin(object):
+    """Mixin of TLS versions of FTPAccountHandler, which precedes
+    TLS_FTPHandler in the bases.
+
+    TLS_FTPHandler calls process_command, flush_account and close of
+    FTPHandler directly, which skips FTPAccountHandler in the MRO;
+    the mixin chains them through both bases.
+    """
+
+    def process_command(self, cmd, *args, **kwargs):
+        return FTPAccountHandler.process_command(self, cmd, *args, **kwargs)
+
+    def execute_command(self, cmd, *args, **kwargs):
+        return super(TLSAccountHandlerMixin, self).process_command(
+            cmd, *args, **kwargs)
+
+    def flush_account(self):
+        super(TLSAccountHandlerMixin, self).flush_account()
+        self.reset_account()
+
+    def close(self):
+        # TLS shutdown may close the socket later, but FTPHandler.close
+        # marks the handler closed at once.
+        self.release_connections()
+        self.end_listing_trace()
+        super(TLSAccountHandlerMixin, self).close()
+
+
+if TLS_FTPHandler is not None:
+    class TLS_AccountThrottledDTPHandler(
+            TLS_DTPHandler, AccountThrottledDTPHandler):
+        """TLS version of AccountThrottledDTPHandler.
+        """
+
+        def handle_ssl_established(self):
+            tls.observe_handshake(self.socket, 'data')
+
+        def handle_failed_ssl_handshake(self):
+            if metrics.registry.enabled:
+                metrics.tls_handshake_failures.inc(channel='data')
+            super(TLS_AccountThrottledDTPHandler,
+                  self).handle_failed_ssl_handshake()
+
+    class TLS_FTPAccountHandler(
+            TLSAccountHandlerMixin, TLS_FTPHandler, FTPAccountHandler):
+        """TLS version of FTPAccountHandler.
+        """
+        dtp_handler = TLS_AccountThrottledDTPHandler
+        proto_cmds = dict(TLS_FTPHandler.proto_cmds, **checksum_proto_cmds)
+
+        @classmethod
+        def get_ssl_context(cls):
+            """return SSL context shared by all connections, with session
+            resumption (FTPSERVER_TLS).
+            """
+            if cls.ssl_context is None:
+                if cls.certfile is None:
+                    raise ValueError("at least certfile must be specified")
+                cls.ssl_context = tls.make_ssl_context(
+                    cls.certfile, cls.keyfile, cls.ssl_protocol,
+                    cls.ssl_options, **tls.get_options())
+            return cls.ssl_context
+
+        def handle_ssl_established(self):
+            tls.observe_handshake(self.socket, 'control')
+
+        def handle_failed_ssl_handshake(self):
+            if metrics.registry.enabled:
+                metrics.tls_handshake_failures.inc(channel='control')
+            super(TLS_FTPAccountHandler, self).handle_failed_ssl_handshake()
@@ -0,0 +1,37 @@
+class ConnectionCounter(object):
+    """In-memory counter of concurrent connections.
+
+    Keys are arbitrary hashable values, e.g. ('ip', '10.0.0.1').
+    """
+
+    def __init__(self):
+        self._counts = {}
+
+    def count(self, key):
+        """return current number of connections for key.
+        """
+        return self._counts.get(key, 0)
+
+    def acquire(self, key, limit=0):
+        """add a connection for key.
+
+        return False (and count nothing) if limit is already reached.
+        limit 0 is unlimited.
+        """
+        count = self._counts.get(key, 0)
+        if limit and count >= limit:
+            return False
+        self._counts[key] = count + 1
+        return True
+
+    def release(self, key):
+        """remove a connection for key.
+        """
+        count = self._counts.get(key, 0) - 1
+        if count > 0:
+            self._counts[key] = count
+        else:
+            self._counts.pop(key, None)
+
+    def clear(self):
+        self._counts.clear()
@@ -0,0 +1,322 @@
+"""Load generator of simulated FTP clients, used by the ftpbench command.
+"""
+import ftplib
+import io
+import math
+import os
+import random
+import ssl
+import threading
+import time
+
+OPERATIONS = ('login', 'list', 'retr', 'stor', 'rest', 'idle')
+DEFAULT_MIX = 'login=1,list=4,retr=4,stor=2,rest=1,idle=1'
+SEED_FILENAME = 'ftpbench-seed.bin'
+
+
+def parse_mix(text):
+    """parse operation mix, e.g. 'list=4,retr=1' -> {'list': 4, 'retr': 1}
+    """
+    mix = {}
+    for item in text.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, weight = item.partition('=')
+        name = name.strip().lower()
+        if name not in OPERATIONS:
+            raise ValueError('Unknown operation: {}'.format(name))
+        weight = float(weight) if weight else 1.0
+        if weight < 0:
+            raise ValueError('Invalid weight: {}'.format(item))
+        mix[name] = weight
+    if not any(mix.values()):
+        raise ValueError('Empty operation mix: {}'.format(text))
+    return mix
+
+
+def percentile(values, percent):
+    """nearest-rank percentile of sorted values.
+    """
+    if not values:
+        return None
+    index = max(0, math.ceil(percent / 100.0 * len(values)) - 1)
+    return values[min(index, len(values) - 1)]
+
+
+class LoadConfig(object):
+    """Settings of simulated clients.
+    """
+
+    def __init__(self, host, port, username, password, tls=False,
+                 mix=DEFAULT_MIX, file_size=65536, directory='',
+                 idle=1.0, timeout=30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.tls = tls
+        self.mix = parse_mix(mix) if isinstance(mix, str) else mix
+        self.file_size = file_size
+        self.directory = directory
+        self.idle = idle
+        self.timeout = timeout
+
+    def path(self, filename):
+        if not self.directory:
+            return filename
+        return self.directory.rstrip('/') + '/' + filename
+
+
+class LoadResult(object):
+    """Latencies, errors and transferred bytes by operation.
+    """
+
+    def __init__(self):
+        self.latencies = dict((name, []) for name in OPERATIONS)
+        self.errors = dict((name, 0) for name in OPERATIONS)
+        self.bytes = dict((name, 0) for name in OPERATIONS)
+        self.last_errors = {}
+        self._lock = threading.Lock()
+
+    def record(self, operation, seconds, size=0):
+        with self._lock:
+            self.latencies[operation].append(seconds)
+            self.bytes[operation] += size
+
+    def error(self, operation, exc):
+        with self._lock:
+            self.errors[operation] += 1
+            self.last_errors[operation] = '{0}: {1}'.format(
+                exc.__class__.__name__, exc)
+
+    def summary(self, elapsed):
+        """return {operation: statistics} of operations which ran.
+        """
+        summary = {}
+        for name in OPERATIONS:
+            latencies = sorted(self.latencies[name])
+            errors = self.errors[name]
+            if not latencies and not errors:
+                continue
+            total = len(latencies) + errors
+            summary[name] = {
+                'count': len(latencies),
+                'errors': errors,
+                'error_rate': errors / total,
+                'ops_per_second': len(latencies) / elapsed,
+                'bytes_per_second': self.bytes[name] / elapsed,
+                'p50': percentile(latencies, 50),
+                'p90': percentile(latencies, 90),
+                'p99': percentile(latencies, 99),
+                'max': latencies[-1] if latencies else None,
+            }
+        return summary
+
+
+class LoadClient(threading.Thread):
+    """Simulated FTP client which runs operations until the deadline.
+    """
+
+    def __init__(self, number, config, result, deadline, seed=None):
+        super(LoadClient, self).__init__(name='ftpbench-{}'.format(number))
+        self.daemon = True
+        self.number = number
+        self.config = config
+        self.result = result
+        self.deadline = deadline
+        self.random = random.Random(seed)
+        self.ftp = None
+        self.filename = config.path('ftpbench-{}.bin'.format(number))
+        self.payload = os.urandom(config.file_size)
+        names = [name for name, weight in config.mix.items() if weight]
+        self.operations = names
+        self.weights = [config.mix[name] for name in names]
+
+    def connect(self):
+        config = self.config
+        if config.tls:
+            context = ssl.create_default_context()
+            # benchmark targets are local servers with test certificates.
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+            ftp = ftplib.FTP_TLS(context=context)
+        else:
+            ftp = ftplib.FTP()
+        ftp.connect(config.host, config.port, timeout=config.timeout)
+        ftp.login(config.username, config.password)
+        if config.tls:
+            ftp.prot_p()
+        return ftp
+
+    def disconnect(self):
+        if self.ftp is not None:
+            try:
+                self.ftp.quit()
+            except ftplib.all_errors:
+                self.ftp.close()
+            self.ftp = None
+
+    def run(self):
+        try:
+            while time.monotonic() < self.deadline:
+                operation = self.random.choices(
+                    self.operations, self.weights)[0]
+                if self.ftp is None and operation != 'login':
+                    try:
+                        self.ftp = self.connect()
+                    except ftplib.all_errors as e:
+                        self.result.error('login', e)
+                        time.sleep(0.1)
+                        continue
+                start = time.perf_counter()
+                try:
+                    size = getattr(self, 'op_' + operation)()
+                except ftplib.all_errors as e:
+                    self.result.error(operation, e)
+                    if self.ftp is not None:
+                        self.ftp.close()
+                        self.ftp = None
+                    continue
+                if operation == 'idle':
+                    start += self.config.idle
+                self.result.record(
+                    operation, time.perf_counter() - start, size or 0)
+        finally:
+            self.disconnect()
+
+    def op_login(self):
+        ftp = self.connect()
+        ftp.quit()
+
+    def op_list(self):
+        lines = []
+        command = 'LIST'
+        if self.config.directory:
+            command += ' ' + self.config.directory
+        self.ftp.retrlines(command, lines.append)
+        return 0
+
+    def _retrieve(self, rest=None):
+        received = [0]
+
+        def callback(data):
+            received[0] += len(data)
+        self.ftp.retrbinary(
+            'RETR ' + self.config.path(SEED_FILENAME), callback, rest=rest)
+        return received[0]
+
+    def op_retr(self):
+        return self._retrieve()
+
+    def op_rest(self):
+        return self._retrieve(rest=self.config.file_size // 2)
+
+    def op_stor(self):
+        self.ftp.storbinary(
+            'STOR ' + self.filename, io.BytesIO(self.payload))
+        return len(self.payload)
+
+    def op_idle(self):
+        time.sleep(self.config.idle)
+        self.ftp.voidcmd('NOOP')
+
+
+def prepare(config):
+    """upload the file retrieved by RETR and REST operations.
+    """
+    client = LoadClient(0, config, LoadResult(), 0)
+    ftp = client.connect()
+    try:
+        ftp.storbinary(
+            'STOR ' + config.path(SEED_FILENAME), io.BytesIO(client.payload))
+    finally:
+        ftp.quit()
+
+
+def cleanup(config, clients):
+    """delete files uploaded by the load generator.
+    """
+    client = LoadClient(0, config, LoadResult(), 0)
+    ftp = client.connect()
+    try:
+        for filename in [config.path(SEED_FILENAME)] + [
+                client.filename for client in clients]:
+            try:
+                ftp.delete(filename)
+            except ftplib.error_perm:
+                pass
+    finally:
+        ftp.quit()
+
+
+def run(config, clients=10, duration=10.0, on_tick=None):
+    """run simulated clients for duration seconds, return (result, elapsed).
+
+    on_tick is called about every second while clients are running.
+    """
+    prepare(config)
+    result = LoadResult()
+    start = time.monotonic()
+    deadline = start + duration
+    threads = [
+        LoadClient(number, config, result, deadline, seed=number)
+        for number in range(1, clients + 1)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        while thread.is_alive():
+            thread.join(1.0)
+            if on_tick is not None:
+                on_tick()
+    elapsed = time.monotonic() - start
+    cleanup(config, threads)
+    return result, elapsed
+
+
+class ProcessUsage(object):
+    """RSS and CPU time of a process from /proc (Linux only).
+    """
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.max_rss = 0
+        self._start_cpu = None
+        self._start_time = None
+
+    @classmethod
+    def supported(cls, pid):
+        return os.path.exists('/proc/{}/stat'.format(pid))
+
+    def rss(self):
+        with open('/proc/{}/status'.format(self.pid)) as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+        return 0
+
+    def cpu_seconds(self):
+        with open('/proc/{}/stat'.format(self.pid)) as f:
+            # the command name may contain spaces
+            fields = f.read().rsplit(')', 1)[1].split()
+        # utime and stime are the 14th and 15th fields
+        return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+    def start(self):
+        self._start_cpu = self.cpu_seconds()
+        self._start_time = time.monotonic()
+        self.sample()
+
+    def sample(self):
+        self.max_rss = max(self.max_rss, self.rss())
+
+    def summary(self):
+        self.sample()
+        elapsed = time.monotonic() - self._start_time
+        cpu = self.cpu_seconds() - self._start_cpu
+        return {
+            'rss': self.rss(),
+            'max_rss': self.max_rss,
+            'cpu_seconds': cpu,
+            'cpu_percent': 100.0 * cpu / elapsed if elapsed else 0.0,
+        }
@@ -21,7 +21,8 @@ class Command(BaseCommand):
         home_dir = options.get('home_dir')
 
         if models.FTPUserAccount.objects.filter(
-                user__username=username).exists():
+                login_name=models.FTPUserAccount.normalize_login_name(
+                    username)).exists():
             raise CommandError(
                 'FTP user account "{username}" is already exists.'.format(
                     username=username))
@@ -1,24 +1,38 @@
 import sys
 
 from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 
-from django_ftpserver import models
+from django_ftpserver import models, utils
 
 
 class Command(BaseCommand):
     help = "Create FTP user group"
 
     def add_arguments(self, parser):
-        parser.add_argument('name')
+        parser.add_argument('name', nargs='?')
         parser.add_argument('home_dir', nargs='?')
 
         parser.add_argument(
             '--permission', action='store', dest='permission',
             help="permission for home directory.")
+        parser.add_argument(
+            '--file', action='store', dest='file',
+            help="create groups from CSV or JSON lines file with name, "
+                 "home_dir and permission columns.")
+        parser.add_argument(
+            '--format', action='store', dest='format',
+            choices=('csv', 'jsonl'),
+            help="format of --file (default: guessed from the extension).")
 
     def handle(self, *args, **options):
+        if options['file']:
+            return self.handle_file(options['file'], options)
+
         name = options.get('name')
         home_dir = options.get('home_dir')
+        if not name:
+            raise CommandError("Group name or --file is required.")
 
         if models.FTPUserGroup.objects.filter(name=name).exists():
             raise CommandError(
@@ -32,3 +46,40 @@ class Command(BaseCommand):
         sys.stdout.write(
             "FTP user group pk={pk}, {name} was created.\n".format(
                 pk=group.pk, name=name))
+
+    def handle_file(self, path, options):
+        try:
+            records = list(utils.read_records(path, options['format']))
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        names = [(record.get('name') or '').strip() for _, record in records]
+        existing = set(models.FTPUserGroup.objects.filter(
+            name__in=names).values_list('name', flat=True))
+        groups = []
+        errors = 0
+        for (line_num, record), name in zip(records, names):
+            if not name:
+                message = "name is required."
+            elif name in existing:
+                message = "FTP user group {name} is already exists.".format(
+                    name=name)
+            else:
+                existing.add(name)
+                group = models.FTPUserGroup(
+                    name=name, home_dir=record.get('home_dir') or None)
+                permission = record.get('permission') or options['permission']
+                if permission:
+                    group.permission = permission
+                groups.append(group)
+                continue
+            errors += 1
+            self.stderr.write('line {line}: {message}'.format(
+                line=line_num, message=message))
+
+        with transaction.atomic():
+            models.FTPUserGroup.objects.bulk_create(groups)
+
+        sys.stdout.write(
+            "{created} FTP user groups were created, {errors} errors.\n"
+            .format(created=len(groups), errors=errors))
@@ -0,0 +1,182 @@
+import json
+import os
+import shlex
+import socket
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from django_ftpserver import loadgen
+
+
+def _free_port(host):
+    sock = socket.socket()
+    try:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+    finally:
+        sock.close()
+
+
+def _format_seconds(value):
+    if value is None:
+        return '-'
+    return '{0:.1f}ms'.format(value * 1000)
+
+
+class Command(BaseCommand):
+    help = "Run simulated FTP clients against a FTP server"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'host_port', nargs='?',
+            help="target server. eg. 127.0.0.1:10021 "
+                 "(default: start a local ftpserver)")
+
+        parser.add_argument(
+            '--username', action='store', dest='username', required=True,
+            help="username of FTP user account.")
+        parser.add_argument(
+            '--password', action='store', dest='password', required=True,
+            help="password of FTP user account.")
+        parser.add_argument(
+            '--clients', action='store', dest='clients', type=int,
+            default=10, help="number of concurrent clients.")
+        parser.add_argument(
+            '--duration', action='store', dest='duration', type=float,
+            default=10.0, help="seconds to run clients.")
+        parser.add_argument(
+            '--mix', action='store', dest='mix', default=loadgen.DEFAULT_MIX,
+            help="weights of operations ({0}). eg. {1}".format(
+                ', '.join(loadgen.OPERATIONS), loadgen.DEFAULT_MIX))
+        parser.add_argument(
+            '--file-size', action='store', dest='file-size', type=int,
+            default=65536, help="bytes of files for RETR, REST and STOR.")
+        parser.add_argument(
+            '--idle', action='store', dest='idle', type=float, default=1.0,
+            help="seconds of idle operation.")
+        parser.add_argument(
+            '--directory', action='store', dest='directory', default='',
+            help="directory for files of the benchmark.")
+        parser.add_argument(
+            '--tls', action='store_true', dest='tls',
+            help="use explicit FTP over TLS.")
+        parser.add_argument(
+            '--server-pid', action='store', dest='server-pid', type=int,
+            help="process id of target server to report RSS and CPU.")
+        parser.add_argument(
+            '--server-args', action='store', dest='server-args', default='',
+            help="arguments of the local ftpserver command. "
+                 "eg. '--certfile=cert.pem --sendfile'")
+        parser.add_argument(
+            '--json', action='store_true', dest='json',
+            help="write results as JSON.")
+
+    def start_server(self, host, port, server_args):
+        """start local ftpserver command in a subprocess.
+        """
+        command = [
+            sys.executable, '-m', 'django', 'ftpserver',
+            '{0}:{1}'.format(host, port),
+            '--settings', settings.SETTINGS_MODULE,
+        ] + shlex.split(server_args)
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(sys.path)
+        process = subprocess.Popen(
+            command, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(
+                    "ftpserver exited with status {}.".format(
+                        process.returncode))
+            try:
+                socket.create_connection((host, port), timeout=1).close()
+                return process
+            except OSError:
+                time.sleep(0.1)
+        process.terminate()
+        raise CommandError("ftpserver didn't start in 30 seconds.")
+
+    def handle(self, *args, **options):
+        if options['clients'] < 1:
+            raise CommandError(
+                "Invalid number of clients: {}".format(options['clients']))
+        process = None
+        host_port = options.get('host_port')
+        if host_port:
+            host, _port = host_port.split(':', 1)
+            port = int(_port)
+        else:
+            host = '127.0.0.1'
+            port = _free_port(host)
+            process = self.start_server(host, port, options['server-args'])
+
+        try:
+            config = loadgen.LoadConfig(
+                host, port, options['username'], options['password'],
+                tls=options['tls'], mix=options['mix'],
+                file_size=options['file-size'],
+                directory=options['directory'], idle=options['idle'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        server_pid = options['server-pid'] or (process and process.pid)
+        usage = None
+        if server_pid and loadgen.ProcessUsage.supported(server_pid):
+            usage = loadgen.ProcessUsage(server_pid)
+            usage.start()
+
+        try:
+            result, elapsed = loadgen.run(
+                config, options['clients'], options['duration'],
+                on_tick=usage and usage.sample)
+        except loadgen.ftplib.all_errors as e:
+            raise CommandError("Can't prepare the benchmark: {}".format(e))
+        finally:
+            server_usage = usage and usage.summary()
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+        summary = result.summary(elapsed)
+        if options['json']:
+            self.stdout.write(json.dumps({
+                'clients': options['clients'],
+                'elapsed': elapsed,
+                'tls': options['tls'],
+                'operations': summary,
+                'server': server_usage,
+            }, indent=2, sort_keys=True))
+            return
+        self.write_report(
+            options['clients'], elapsed, summary, server_usage,
+            result.last_errors)
+
+    def write_report(self, clients, elapsed, summary, server_usage,
+                     last_errors):
+        write = self.stdout.write
+        write("{0} clients, {1:.1f} seconds".format(clients, elapsed))
+        write("{0:<6} {1:>8} {2:>7} {3:>9} {4:>10} {5:>9} {6:>9} {7:>9}"
+              .format('op', 'count', 'errors', 'ops/s', 'MB/s',
+                      'p50', 'p90', 'p99'))
+        for name, stats in summary.items():
+            write("{0:<6} {1:>8} {2:>7} {3:>9.1f} {4:>10.2f} {5:>9} {6:>9} "
+                  "{7:>9}".format(
+                      name, stats['count'], stats['errors'],
+                      stats['ops_per_second'],
+                      stats['bytes_per_second'] / 1e6,
+                      _format_seconds(stats['p50']),
+                      _format_seconds(stats['p90']),
+                      _format_seconds(stats['p99'])))
+        for name, message in sorted(last_errors.items()):
+            write("last {0} error: {1}".format(name, message))
+        if server_usage:
+            write("server: RSS {0:.1f}MB (max {1:.1f}MB), CPU {2:.1f}%"
+                  .format(server_usage['rss'] / 1e6,
+                          server_usage['max_rss'] / 1e6,
+                          server_usage['cpu_percent']))
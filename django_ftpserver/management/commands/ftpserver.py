@@ -2,7 +2,6 @@ import sys
 import os
 
 import pyftpdlib
-from pyftpdlib import handlers
 from pyftpdlib.servers import FTPServer
 
 from django import get_version
@@ -11,6 +10,13 @@ from django.core.management.base import BaseCommand, CommandError
 
 from django_ftpserver.authorizers import FTPAccountAuthorizer
 from django_ftpserver.daemonize import become_daemon
+from django_ftpserver import events
+from django_ftpserver import handlers
+from django_ftpserver import metrics
+from django_ftpserver import profiling
+from django_ftpserver import tracing
+from django_ftpserver import transferlog
+from django_ftpserver.watchdog import LoopWatchdog
 from django_ftpserver import utils
 
 
@@ -53,6 +59,35 @@ class Command(BaseCommand):
             '--sendfile', action='store_true',
             dest='sendfile',
             help="Use sendfile.")
+        parser.add_argument(
+            '--metrics-port', action='store', dest='metrics-port', type=int,
+            help="port to serve metrics in Prometheus text format.")
+        parser.add_argument(
+            '--trace-storage', action='store', dest='trace-storage',
+            help="trace storage calls per FTP command to JSON lines file, "
+                 "or to log with '-'.")
+        parser.add_argument(
+            '--trace-sample-rate', action='store', dest='trace-sample-rate',
+            type=float,
+            help="ratio of FTP commands to trace storage calls. eg. 0.01")
+        parser.add_argument(
+            '--watchdog-threshold', action='store',
+            dest='watchdog-threshold', type=float,
+            help="log the stack of IOLoop iterations longer than "
+                 "this seconds.")
+        parser.add_argument(
+            '--profile', action='store', dest='profile',
+            help="profile per FTP command and write profiles to "
+                 "this directory.")
+        parser.add_argument(
+            '--profile-mode', action='store', dest='profile-mode',
+            choices=profiling.CommandProfiler.modes,
+            help="cprofile (pstats files, default) or sample "
+                 "(collapsed stacks).")
+        parser.add_argument(
+            '--profile-duration', action='store', dest='profile-duration',
+            type=float,
+            help="seconds to profile (default: until SIGUSR2 or exit).")
 
     def make_server(
             self, server_class, handler_class, authorizer_class,
@@ -62,6 +97,72 @@ class Command(BaseCommand):
             server_class, handler_class, authorizer_class, filesystem_class,
             host_port, file_access_user=file_access_user, **handler_options)
 
+    def make_storage_tracer(self, output=None, sample_rate=None):
+        """return StorageTracer if storage tracing is enabled, or None.
+
+        FTPSERVER_STORAGE_TRACE setting is keyword arguments of StorageTracer.
+        """
+        tracer_options = dict(
+            utils.get_settings_value('FTPSERVER_STORAGE_TRACE') or {})
+        if output:
+            tracer_options['output'] = None if output == '-' else output
+        elif not tracer_options:
+            return None
+        if sample_rate is not None:
+            tracer_options['sample_rate'] = sample_rate
+        rate = tracer_options.get('sample_rate', 1.0)
+        if not 0 <= rate <= 1:
+            raise CommandError("Invalid sample rate: {}".format(rate))
+        return tracing.StorageTracer(**tracer_options)
+
+    def make_transfer_log(self):
+        """return TransferLogWriter if FTPSERVER_TRANSFER_LOG is set, or None.
+
+        FTPSERVER_TRANSFER_LOG setting is True or keyword arguments of
+        TransferLogWriter.
+        """
+        options = utils.get_settings_value('FTPSERVER_TRANSFER_LOG')
+        if not options:
+            return None
+        if options is True:
+            options = {}
+        try:
+            return transferlog.TransferLogWriter(**options)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+    def make_event_dispatcher(self):
+        """return dispatcher of session events if FTPSERVER_EVENTS is set,
+        or None.
+        """
+        options = utils.get_settings_value('FTPSERVER_EVENTS')
+        if not options:
+            return None
+        try:
+            return events.make_dispatcher(options)
+        except (ValueError, ImportError, AttributeError) as e:
+            raise CommandError("Invalid FTPSERVER_EVENTS: {}".format(e))
+
+    def make_profiler(self, output=None, mode=None, duration=None):
+        """return CommandProfiler if profiling is configured, or None.
+
+        FTPSERVER_PROFILE setting is keyword arguments of CommandProfiler.
+        """
+        profiler_options = dict(
+            utils.get_settings_value('FTPSERVER_PROFILE') or {})
+        if output:
+            profiler_options['output'] = output
+        elif not profiler_options:
+            return None
+        if mode:
+            profiler_options['mode'] = mode
+        if duration:
+            profiler_options['duration'] = duration
+        try:
+            return profiling.CommandProfiler(**profiler_options)
+        except (TypeError, ValueError) as e:
+            raise CommandError("Invalid profile options: {}".format(e))
+
     def handle(self, *args, **options):
         # bind host and port
         host_port = options.get('host_port')
@@ -107,6 +208,38 @@ class Command(BaseCommand):
         sendfile = options['sendfile'] \
             or utils.get_settings_value('FTPSERVER_SENDFILE')
 
+        # max connections per ip
+        max_connections_per_ip = utils.get_settings_value(
+            'FTPSERVER_MAX_CONNECTIONS_PER_IP') or 0
+
+        # metrics
+        metrics_port = options['metrics-port'] \
+            or utils.get_settings_value('FTPSERVER_METRICS_PORT')
+        metrics_host = utils.get_settings_value('FTPSERVER_METRICS_HOST') \
+            or host
+
+        # storage tracing
+        storage_tracer = self.make_storage_tracer(
+            options['trace-storage'], options['trace-sample-rate'])
+
+        # IOLoop watchdog
+        watchdog_threshold = options['watchdog-threshold'] \
+            or utils.get_settings_value('FTPSERVER_WATCHDOG_THRESHOLD')
+        if watchdog_threshold is not None and watchdog_threshold <= 0:
+            raise CommandError("Invalid watchdog threshold: {}".format(
+                watchdog_threshold))
+
+        # profiling
+        profiler = self.make_profiler(
+            options['profile'], options['profile-mode'],
+            options['profile-duration'])
+
+        # transfer log
+        transfer_log = self.make_transfer_log()
+
+        # session events
+        event_dispatcher = self.make_event_dispatcher()
+
         # daemonize
         daemonize = options['daemonize'] \
             or utils.get_settings_value('FTPSERVER_DAEMONIZE')
@@ -124,10 +257,10 @@ class Command(BaseCommand):
 
         # select handler class
         if certfile or keyfile:
-            if hasattr(handlers, 'TLS_FTPHandler'):
+            if hasattr(handlers, 'TLS_FTPAccountHandler'):
                 handler_class = (
                     utils.get_settings_value('FTPSERVER_TLSHANDLER')
-                ) or handlers.TLS_FTPHandler
+                ) or handlers.TLS_FTPAccountHandler
             else:
                 # unsupported
                 raise CommandError(
@@ -135,7 +268,7 @@ class Command(BaseCommand):
         else:
             handler_class = (
                 utils.get_settings_value('FTPSERVER_HANDLER')
-            ) or handlers.FTPHandler
+            ) or handlers.FTPAccountHandler
 
         authorizer_class = utils.get_settings_value('FTPSERVER_AUTHORIZER') \
             or FTPAccountAuthorizer
@@ -156,7 +289,28 @@ class Command(BaseCommand):
             masquerade_address=masquerade_address,
             certfile=certfile,
             keyfile=keyfile,
-            sendfile=sendfile)
+            sendfile=sendfile,
+            max_connections_per_ip=max_connections_per_ip,
+            storage_tracer=storage_tracer,
+            profiler=profiler,
+            transfer_log=transfer_log,
+            event_dispatcher=event_dispatcher)
+
+        # start metrics server
+        if metrics_port:
+            metrics.registry.enabled = True
+            metrics.install_db_query_counter()
+            metrics.start_http_server(metrics_port, metrics_host)
+
+        # start watchdog
+        if watchdog_threshold:
+            LoopWatchdog(watchdog_threshold).start(server.ioloop)
+
+        # start profiler, started by --profile or toggled with SIGUSR2
+        if profiler is not None:
+            profiling.install_signal_handler(profiler, server.ioloop)
+            if options['profile']:
+                profiler.start(server.ioloop)
 
         # start server
         quit_command = 'CTRL-BREAK' if sys.platform == 'win32' else 'CONTROL-C'
@@ -168,4 +322,16 @@ class Command(BaseCommand):
             version_ftp=pyftpdlib.__ver__,
             settings=settings.SETTINGS_MODULE,
             quit_command=quit_command))
-        server.serve_forever()
+        if transfer_log is not None:
+            transfer_log.start()
+        if event_dispatcher is not None:
+            event_dispatcher.start()
+        try:
+            server.serve_forever()
+        finally:
+            if profiler is not None:
+                profiler.stop()
+            if event_dispatcher is not None:
+                event_dispatcher.stop()
+            if transfer_log is not None:
+                transfer_log.stop()
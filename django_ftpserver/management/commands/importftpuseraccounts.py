@@ -0,0 +1,211 @@
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import DatabaseError, transaction
+
+from django_ftpserver import models, utils
+from django_ftpserver.compat import get_username_field
+
+
+def chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class Command(BaseCommand):
+    help = "Import FTP user accounts from CSV or JSON lines file"
+    # multiprocessing context of the password hashing pool (default if None)
+    mp_context = None
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'file',
+            help="CSV or JSON lines file with username, password, group "
+                 "and home_dir columns.")
+
+        parser.add_argument(
+            '--format', action='store', dest='format',
+            choices=('csv', 'jsonl'),
+            help="file format (default: guessed from the extension).")
+        parser.add_argument(
+            '--batch-size', action='store', dest='batch_size', type=int,
+            default=1000,
+            help="number of accounts inserted in one transaction.")
+        parser.add_argument(
+            '--jobs', action='store', dest='jobs', type=int,
+            help="number of processes for password hashing "
+                 "(default: number of CPUs).")
+
+    def handle(self, *args, **options):
+        self.errors = []
+        self.username_field = get_username_field()
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError("Invalid batch size: {}".format(batch_size))
+
+        try:
+            records = list(utils.read_records(
+                options['file'], options['format']))
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        rows = self.validate_rows(self.parse_records(records), batch_size)
+        new_rows = [row for row in rows if row['user'] is None]
+        passwords = self.hash_passwords(
+            [row['password'] for row in new_rows], options['jobs'])
+        for row, password in zip(new_rows, passwords):
+            row['password'] = password
+
+        created = 0
+        for batch in chunks(rows, batch_size):
+            created += self.insert_batch(batch)
+
+        for line_num, message in sorted(self.errors):
+            self.stderr.write('line {line}: {message}'.format(
+                line=line_num, message=message))
+        sys.stdout.write(
+            '{created} FTP user accounts were created, '
+            '{errors} errors.\n'.format(
+                created=created, errors=len(self.errors)))
+
+    def parse_records(self, records):
+        rows = []
+        seen = set()
+        for line_num, record in records:
+            username = (record.get('username') or '').strip()
+            group_name = (record.get('group') or '').strip()
+            if not username or not group_name:
+                self.errors.append(
+                    (line_num, 'username and group are required.'))
+                continue
+            if username in seen:
+                self.errors.append((
+                    line_num,
+                    'User "{}" is duplicated in the file.'.format(username)))
+                continue
+            seen.add(username)
+            rows.append({
+                'line': line_num,
+                'username': username,
+                'password': record.get('password') or None,
+                'group': group_name,
+                'home_dir': record.get('home_dir') or None,
+                'user': None,
+            })
+        return rows
+
+    def validate_rows(self, rows, batch_size):
+        """resolve groups and existing users, drop invalid rows.
+        """
+        User = get_user_model()
+        group_names = set(row['group'] for row in rows)
+        groups = models.FTPUserGroup.objects.in_bulk(
+            list(group_names), field_name='name')
+
+        users = {}
+        login_names = set()
+        for batch in chunks(rows, batch_size):
+            usernames = [row['username'] for row in batch]
+            users.update(User.objects.in_bulk(
+                usernames, field_name=self.username_field))
+            login_names.update(
+                models.FTPUserAccount.objects.filter(login_name__in=[
+                    models.FTPUserAccount.normalize_login_name(username)
+                    for username in usernames
+                ]).values_list('login_name', flat=True))
+
+        valid_rows = []
+        for row in rows:
+            group = groups.get(row['group'])
+            login_name = models.FTPUserAccount.normalize_login_name(
+                row['username'])
+            if group is None:
+                self.errors.append((
+                    row['line'],
+                    'FTP user group "{}" is not exists.'.format(row['group'])))
+            elif login_name in login_names:
+                self.errors.append((
+                    row['line'],
+                    'FTP user account "{}" is already exists.'.format(
+                        row['username'])))
+            else:
+                row['group'] = group
+                row['user'] = users.get(row['username'])
+                valid_rows.append(row)
+        return valid_rows
+
+    def hash_passwords(self, passwords, jobs=None):
+        """hash passwords in a process pool.
+        """
+        if jobs == 1 or len(passwords) < 2:
+            return [make_password(password) for password in passwords]
+        workers = jobs or os.cpu_count() or 1
+        executor_options = {}
+        map_options = {}
+        if sys.version_info >= (3, 7):
+            executor_options = dict(
+                mp_context=self.mp_context, initializer=utils.setup_django,
+                initargs=(settings.SETTINGS_MODULE,))
+        elif os.name == 'nt' or self.mp_context is not None:
+            # processes can't set up Django without initializer, only
+            # forked processes inherit it
+            return [make_password(password) for password in passwords]
+        if sys.version_info >= (3, 5):
+            map_options['chunksize'] = max(
+                1, len(passwords) // (workers * 4))
+        with ProcessPoolExecutor(
+                max_workers=workers, **executor_options) as executor:
+            return list(executor.map(
+                make_password, passwords, **map_options))
+
+    def insert_batch(self, rows):
+        """insert rows in one transaction, return number of accounts.
+
+        If the batch fails, insert rows one by one to report errors per row.
+        """
+        try:
+            with transaction.atomic():
+                self.insert_rows(rows)
+            return len(rows)
+        except DatabaseError as e:
+            if len(rows) == 1:
+                self.errors.append((rows[0]['line'], str(e)))
+                return 0
+        created = 0
+        for row in rows:
+            try:
+                with transaction.atomic():
+                    self.insert_rows([row])
+            except DatabaseError as e:
+                self.errors.append((row['line'], str(e)))
+            else:
+                created += 1
+        return created
+
+    def insert_rows(self, rows):
+        User = get_user_model()
+        new_users = [
+            User(**{
+                self.username_field: row['username'],
+                'password': row['password'],
+            })
+            for row in rows if row['user'] is None]
+        users = {}
+        if new_users:
+            User.objects.bulk_create(new_users)
+            users = User.objects.in_bulk(
+                [getattr(user, self.username_field) for user in new_users],
+                field_name=self.username_field)
+        models.FTPUserAccount.objects.bulk_create([
+            models.FTPUserAccount(
+                user=row['user'] or users[row['username']],
+                group=row['group'],
+                home_dir=row['home_dir'],
+                login_name=models.FTPUserAccount.normalize_login_name(
+                    row['username']))
+            for row in rows])
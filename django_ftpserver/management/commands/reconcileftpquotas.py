@@ -0,0 +1,52 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from pyftpdlib.filesystems import AbstractedFS
+
+from django_ftpserver import models, quotas, utils
+
+
+class Command(BaseCommand):
+    help = "Recompute storage usage of FTP user accounts"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*',
+            help="login names of accounts (default: all accounts).")
+        parser.add_argument(
+            '--group', action='store', dest='group',
+            help="recompute accounts of the FTP user group.")
+
+    def handle(self, *args, **options):
+        accounts = models.FTPUserAccount.objects.select_related(
+            'user', 'group').order_by('pk')
+        login_names = set(
+            models.FTPUserAccount.normalize_login_name(username)
+            for username in options.get('usernames') or ())
+        if login_names:
+            accounts = accounts.filter(login_name__in=login_names)
+        if options['group']:
+            accounts = accounts.filter(group__name=options['group'])
+        accounts = list(accounts)
+        missing = login_names - set(account.login_name for account in accounts)
+        if missing:
+            raise CommandError("FTP user accounts are not exists: {}".format(
+                ', '.join(sorted(missing))))
+
+        filesystem_class = utils.get_settings_value('FTPSERVER_FILESYSTEM') \
+            or AbstractedFS
+        if isinstance(filesystem_class, str):
+            filesystem_class = utils.import_class(filesystem_class)
+        try:
+            usages = quotas.reconcile(accounts, filesystem_class)
+        except (OSError, NotImplementedError) as e:
+            raise CommandError("Can't compute usage: {}".format(e))
+
+        for usage in usages:
+            sys.stdout.write(
+                "{username}: {bytes} bytes, {files} files\n".format(
+                    username=usage.account.get_username(),
+                    bytes=usage.bytes, files=usage.files))
+        sys.stdout.write(
+            "Usage of {count} FTP user accounts was recomputed.\n".format(
+                count=len(usages)))
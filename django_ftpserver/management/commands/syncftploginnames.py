@@ -0,0 +1,51 @@
+import sys
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from django_ftpserver import models
+from django_ftpserver.compat import get_username_field
+
+
+class Command(BaseCommand):
+    help = "Copy login names of FTP user accounts from their users again"
+
+    def handle(self, *args, **options):
+        username_field = get_username_field()
+        accounts = models.FTPUserAccount.objects.select_related(
+            'user').order_by('pk')
+        by_login_name = defaultdict(list)
+        for account in accounts.iterator():
+            login_name = models.FTPUserAccount.normalize_login_name(
+                getattr(account.user, username_field))
+            by_login_name[login_name].append(account)
+
+        changes = {}
+        for login_name, same_accounts in sorted(by_login_name.items()):
+            if len(same_accounts) > 1:
+                # e.g. "Bob" and "bob" with FTPSERVER_CASE_INSENSITIVE_LOGIN
+                sys.stderr.write(
+                    "Login of {usernames} is disabled, they have the same "
+                    "login name \"{login_name}\".\n".format(
+                        usernames=', '.join(
+                            account.get_username()
+                            for account in same_accounts),
+                        login_name=login_name))
+                login_name = None
+            for account in same_accounts:
+                if account.login_name != login_name:
+                    changes[account.pk] = login_name
+
+        with transaction.atomic():
+            # clear first, a new login name may be the old one of another
+            models.FTPUserAccount.objects.filter(
+                pk__in=list(changes)).update(login_name=None)
+            for pk, login_name in changes.items():
+                if login_name is not None:
+                    models.FTPUserAccount.objects.filter(pk=pk).update(
+                        login_name=login_name)
+
+        sys.stdout.write(
+            "Login names of {count} FTP user accounts were updated.\n".format(
+                count=len(changes)))
@@ -0,0 +1,319 @@
+"""Metrics of the FTP server in Prometheus text format.
+
+Metrics are collected while ``registry.enabled`` is True,
+which the ftpserver command sets when the metrics port is configured.
+"""
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+DEFAULT_BUCKETS = (
+    .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(
+        '{0}="{1}"'.format(
+            name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+        for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return repr(int(value))
+    return repr(value)
+
+
+class Metric(object):
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(labels.get(name, '') for name in self.labelnames)
+
+    def get(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def samples(self):
+        """yield (suffix, label values, extra labels, value)
+        """
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in sorted(items):
+            yield '', key, (), value
+
+    def render(self):
+        lines = [
+            '# HELP {0} {1}'.format(self.name, self.documentation),
+            '# TYPE {0} {1}'.format(self.name, self.type),
+        ]
+        for suffix, key, extra, value in self.samples():
+            lines.append('{0}{1}{2} {3}'.format(
+                self.name, suffix, _format_labels(self.labelnames, key, extra),
+                _format_value(value)))
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Counter):
+    type = 'gauge'
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=DEFAULT_BUCKETS):
+        super(Histogram, self).__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [bucket counts..., +Inf count, sum]
+                state = self._values[key] = [0] * (len(self.buckets) + 2)
+            state[index] += 1
+            state[-1] += value
+
+    def get(self, **labels):
+        """return (count, sum) of observations.
+        """
+        state = self._values.get(self._key(labels))
+        if state is None:
+            return 0, 0
+        return sum(state[:-1]), state[-1]
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(state)) for key, state in self._values.items()]
+        bounds = self.buckets + (float('inf'),)
+        for key, state in sorted(items):
+            cumulative = 0
+            for bound, count in zip(bounds, state):
+                cumulative += count
+                yield '_bucket', key, (('le', _format_value(bound)),), \
+                    cumulative
+            yield '_count', key, (), cumulative
+            yield '_sum', key, (), state[-1]
+
+
+class Registry(object):
+    """Collection of metrics.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), **kwargs):
+        return self.register(
+            Histogram(name, documentation, labelnames, **kwargs))
+
+    def clear(self):
+        for metric in self._metrics:
+            metric.clear()
+
+    def render(self):
+        """return metrics in Prometheus text exposition format.
+        """
+        return ''.join(metric.render() + '\n' for metric in self._metrics)
+
+
+class CommandContext(object):
+    """The FTP command and session being processed on the IOLoop.
+    """
+    command = None
+    session = None
+
+
+registry = Registry()
+command_context = CommandContext()
+
+command_duration = registry.histogram(
+    'ftpserver_command_duration_seconds',
+    'Time to process FTP commands.', ('command',))
+active_sessions = registry.gauge(
+    'ftpserver_active_sessions', 'Number of connected FTP sessions.')
+transfer_bytes = registry.counter(
+    'ftpserver_transfer_bytes_total',
+    'Bytes transferred on data channels.', ('direction',))
+transfer_duration = registry.histogram(
+    'ftpserver_transfer_duration_seconds',
+    'Duration of file transfers.', ('direction',))
+transfer_throughput = registry.histogram(
+    'ftpserver_transfer_throughput_bytes_per_second',
+    'Throughput of file transfers.', ('direction',),
+    buckets=(1e3, 1e4, 1e5, 1e6, 1e7, 1e8, 1e9))
+transfers = registry.counter(
+    'ftpserver_transfers_total',
+    'Number of file transfers.', ('direction', 'result'))
+authentication_duration = registry.histogram(
+    'ftpserver_authentication_duration_seconds',
+    'Time to validate authentication.')
+authentication_failures = registry.counter(
+    'ftpserver_authentication_failures_total',
+    'Number of failed authentications.', ('reason',))
+db_queries = registry.counter(
+    'ftpserver_db_queries_total',
+    'Number of database queries.', ('command',))
+storage_calls = registry.counter(
+    'ftpserver_storage_calls_total',
+    'Number of storage backend calls.', ('method',))
+storage_call_duration = registry.histogram(
+    'ftpserver_storage_call_duration_seconds',
+    'Duration of storage backend calls.', ('method',))
+ioloop_lag = registry.histogram(
+    'ftpserver_ioloop_lag_seconds',
+    'Delay of scheduled calls on the IOLoop.')
+ioloop_blocked = registry.counter(
+    'ftpserver_ioloop_blocked_total',
+    'Number of IOLoop iterations longer than the watchdog threshold.')
+transfer_log_dropped = registry.counter(
+    'ftpserver_transfer_log_dropped_total',
+    'Number of transfer log entries dropped by overflow or errors.')
+events = registry.counter(
+    'ftpserver_events_total',
+    'Number of session events by result '
+    '(queued, dropped, delivered, failed).', ('event', 'result'))
+tls_handshakes = registry.counter(
+    'ftpserver_tls_handshakes_total',
+    'Number of completed TLS handshakes.', ('channel', 'resumed'))
+tls_handshake_failures = registry.counter(
+    'ftpserver_tls_handshake_failures_total',
+    'Number of failed TLS handshakes.', ('channel',))
+
+
+def observe_transfer(receive, completed, elapsed, size):
+    direction = 'received' if receive else 'sent'
+    transfer_bytes.inc(size, direction=direction)
+    transfer_duration.observe(elapsed, direction=direction)
+    if elapsed > 0:
+        transfer_throughput.observe(size / elapsed, direction=direction)
+    transfers.inc(
+        direction=direction,
+        result='completed' if completed else 'incomplete')
+
+
+def count_db_queries(execute, sql, params, many, context):
+    """database execute wrapper counting queries.
+    """
+    db_queries.inc(command=command_context.command or '')
+    return execute(sql, params, many, context)
+
+
+def install_db_query_counter():
+    """count queries of all database connections of current thread.
+    """
+    from django.db import connections
+    for connection in connections.all():
+        if count_db_queries not in connection.execute_wrappers:
+            connection.execute_wrappers.append(count_db_queries)
+
+
+class InstrumentedStorage(object):
+    """Proxy of storage which records call counts and durations by method.
+    """
+    __slots__ = ('_storage',)
+
+    def __init__(self, storage):
+        object.__setattr__(self, '_storage', storage)
+
+    def __getattr__(self, name):
+        attr = getattr(self._storage, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+        return self._wrap(name, attr)
+
+    def _wrap(self, name, func):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                storage_calls.inc(method=name)
+                storage_call_duration.observe(
+                    time.perf_counter() - start, method=name)
+        return wrapper
+
+    def wrap_call(self, name, func):
+        """return func recorded as storage method name, e.g. a request
+        of the client of the storage.
+        """
+        inner = getattr(self._storage, 'wrap_call', None)
+        if inner is not None:
+            func = inner(name, func)
+        return self._wrap(name, func)
+
+    def __setattr__(self, name, value):
+        setattr(self._storage, name, value)
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    registry = registry
+
+    def do_GET(self):
+        body = self.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header(
+            'Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port, host=''):
+    """serve metrics on a daemon thread, return the HTTP server.
+    """
+    server = HTTPServer((host, port), MetricsRequestHandler)
+    thread = threading.Thread(
+        target=server.serve_forever, name='ftpserver-metrics')
+    thread.daemon = True
+    thread.start()
+    return server
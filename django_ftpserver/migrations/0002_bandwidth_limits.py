@@ -0,0 +1,34 @@
+# flake8: noqa
+# Generated by Django 3.2.25 on 2026-10-19 01:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ftpserver', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ftpuseraccount',
+            name='read_limit',
+            field=models.PositiveIntegerField(blank=True, help_text='Overrides the read limit of the group.', null=True, verbose_name='Read limit'),
+        ),
+        migrations.AddField(
+            model_name='ftpuseraccount',
+            name='write_limit',
+            field=models.PositiveIntegerField(blank=True, help_text='Overrides the write limit of the group.', null=True, verbose_name='Write limit'),
+        ),
+        migrations.AddField(
+            model_name='ftpusergroup',
+            name='read_limit',
+            field=models.PositiveIntegerField(default=0, help_text='Maximum upload speed in bytes/sec (0 is unlimited).', verbose_name='Read limit'),
+        ),
+        migrations.AddField(
+            model_name='ftpusergroup',
+            name='write_limit',
+            field=models.PositiveIntegerField(default=0, help_text='Maximum download speed in bytes/sec (0 is unlimited).', verbose_name='Write limit'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# flake8: noqa
+# Generated by Django 3.2.25 on 2026-10-19 01:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ftpserver', '0002_bandwidth_limits'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ftpuseraccount',
+            name='max_connections',
+            field=models.PositiveIntegerField(blank=True, help_text='Overrides the max connections per user of the group.', null=True, verbose_name='Max connections'),
+        ),
+        migrations.AddField(
+            model_name='ftpusergroup',
+            name='max_connections',
+            field=models.PositiveIntegerField(default=0, help_text='Maximum concurrent sessions of all accounts in the group (0 is unlimited).', verbose_name='Max connections'),
+        ),
+        migrations.AddField(
+            model_name='ftpusergroup',
+            name='max_connections_per_user',
+            field=models.PositiveIntegerField(default=0, help_text='Maximum concurrent sessions of each account (0 is unlimited).', verbose_name='Max connections per user'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# flake8: noqa
+# Generated by Django 3.2.25 on 2026-10-19 01:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ftpserver', '0003_connection_limits'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FTPPathPermission',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(help_text='Path relative to the home directory, e.g. /incoming', max_length=1024, verbose_name='Path')),
+                ('permission', models.CharField(blank=True, help_text='Permission for the path and its subdirectories.', max_length=8, verbose_name='Permission')),
+                ('account', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='path_permissions', to='django_ftpserver.ftpuseraccount', verbose_name='FTP user account')),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='path_permissions', to='django_ftpserver.ftpusergroup', verbose_name='FTP user group')),
+            ],
+            options={
+                'verbose_name': 'FTP path permission',
+                'verbose_name_plural': 'FTP path permissions',
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# flake8: noqa
+# Generated by Django 3.2.25 on 2026-10-19 01:38
+
+from django.db import migrations, models
+
+
+def fill_login_name(apps, schema_editor):
+    from django_ftpserver.compat import get_username_field
+    from django_ftpserver.utils import get_settings_value
+    case_insensitive = get_settings_value('FTPSERVER_CASE_INSENSITIVE_LOGIN')
+    FTPUserAccount = apps.get_model('django_ftpserver', 'FTPUserAccount')
+    username_field = get_username_field()
+    accounts = FTPUserAccount.objects.using(
+        schema_editor.connection.alias).select_related('user')
+    for account in accounts.iterator():
+        login_name = getattr(account.user, username_field)
+        if case_insensitive:
+            login_name = login_name.lower()
+        account.login_name = login_name
+        account.save(update_fields=['login_name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ftpserver', '0004_path_permissions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ftpuseraccount',
+            name='login_name',
+            field=models.CharField(editable=False, max_length=255, null=True, unique=True, verbose_name='Login name'),
+        ),
+        migrations.RunPython(fill_login_name, migrations.RunPython.noop),
+    ]
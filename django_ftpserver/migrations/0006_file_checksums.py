@@ -0,0 +1,31 @@
+# flake8: noqa
+# Generated by Django 3.2.25 on 2026-10-19 01:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ftpserver', '0005_login_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FTPFileChecksum',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(db_index=True, max_length=1024, verbose_name='Path')),
+                ('size', models.BigIntegerField(verbose_name='Size')),
+                ('crc32', models.CharField(blank=True, max_length=8, verbose_name='CRC32')),
+                ('md5', models.CharField(blank=True, max_length=32, verbose_name='MD5')),
+                ('sha1', models.CharField(blank=True, max_length=40, verbose_name='SHA-1')),
+                ('sha256', models.CharField(blank=True, max_length=64, verbose_name='SHA-256')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated at')),
+            ],
+            options={
+                'verbose_name': 'FTP file checksum',
+                'verbose_name_plural': 'FTP file checksums',
+            },
+        ),
+    ]
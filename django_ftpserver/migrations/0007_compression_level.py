@@ -0,0 +1,20 @@
+# flake8: noqa
+# Generated by Django 3.2.25 on 2026-10-19 01:56
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ftpserver', '0006_file_checksums'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ftpusergroup',
+            name='compression_level',
+            field=models.PositiveSmallIntegerField(default=6, help_text='zlib compression level of MODE Z transfers (0 is no compression, 9 is the best).', validators=[django.core.validators.MaxValueValidator(9)], verbose_name='Compression level'),
+        ),
+    ]
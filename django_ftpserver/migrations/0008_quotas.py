@@ -0,0 +1,40 @@
+# flake8: noqa
+# Generated by Django 3.2.25 on 2026-10-19 01:59
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ftpserver', '0007_compression_level'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ftpuseraccount',
+            name='quota',
+            field=models.BigIntegerField(blank=True, help_text='Overrides the quota of the group.', null=True, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Quota'),
+        ),
+        migrations.AddField(
+            model_name='ftpusergroup',
+            name='quota',
+            field=models.BigIntegerField(default=0, help_text='Maximum bytes stored by each account (0 is unlimited).', validators=[django.core.validators.MinValueValidator(0)], verbose_name='Quota'),
+        ),
+        migrations.CreateModel(
+            name='FTPQuotaUsage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bytes', models.BigIntegerField(default=0, verbose_name='Bytes')),
+                ('files', models.BigIntegerField(default=0, verbose_name='Files')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated at')),
+                ('account', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='quota_usage', to='django_ftpserver.ftpuseraccount', verbose_name='FTP user account')),
+            ],
+            options={
+                'verbose_name': 'FTP quota usage',
+                'verbose_name_plural': 'FTP quota usages',
+            },
+        ),
+    ]
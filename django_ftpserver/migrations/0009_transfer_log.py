@@ -0,0 +1,33 @@
+# flake8: noqa
+# Generated by Django 3.2.25 on 2026-10-19 02:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ftpserver', '0008_quotas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FTPTransferLog',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('command', models.CharField(max_length=8, verbose_name='Command')),
+                ('path', models.CharField(max_length=1024, verbose_name='Path')),
+                ('bytes', models.BigIntegerField(default=0, verbose_name='Bytes')),
+                ('duration', models.FloatField(default=0, verbose_name='Duration')),
+                ('result', models.CharField(choices=[('completed', 'Completed'), ('incomplete', 'Incomplete')], max_length=16, verbose_name='Result')),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Created at')),
+                ('account', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transfer_logs', to='django_ftpserver.ftpuseraccount', verbose_name='FTP user account')),
+            ],
+            options={
+                'verbose_name': 'FTP transfer log',
+                'verbose_name_plural': 'FTP transfer logs',
+            },
+        ),
+    ]
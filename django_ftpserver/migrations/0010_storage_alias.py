@@ -0,0 +1,25 @@
+# flake8: noqa
+# Generated by Django 3.2.25 on 2026-10-19 02:17
+
+from django.db import migrations, models
+import django_ftpserver.storages
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ftpserver', '0009_transfer_log'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ftpuseraccount',
+            name='storage',
+            field=models.CharField(blank=True, default='', help_text='Overrides the storage of the group.', max_length=64, validators=[django_ftpserver.storages.validate_storage_alias], verbose_name='Storage'),
+        ),
+        migrations.AddField(
+            model_name='ftpusergroup',
+            name='storage',
+            field=models.CharField(blank=True, default='', help_text='Alias of FTPSERVER_STORAGES (empty is the default storage).', max_length=64, validators=[django_ftpserver.storages.validate_storage_alias], verbose_name='Storage'),
+        ),
+    ]
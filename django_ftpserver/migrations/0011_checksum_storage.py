@@ -0,0 +1,45 @@
+# flake8: noqa
+# Generated by Django 3.2.25 on 2026-10-19 02:51
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def fill_path_hash(apps, schema_editor):
+    FTPFileChecksum = apps.get_model('django_ftpserver', 'FTPFileChecksum')
+    checksums = FTPFileChecksum.objects.using(schema_editor.connection.alias)
+    for checksum in checksums.iterator():
+        checksum.path_hash = hashlib.sha256(
+            checksum.path.encode('utf-8')).hexdigest()
+        checksum.save(update_fields=['path_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_ftpserver', '0010_storage_alias'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ftpfilechecksum',
+            name='path_hash',
+            field=models.CharField(default='', editable=False, max_length=64, verbose_name='Path hash'),
+        ),
+        migrations.AddField(
+            model_name='ftpfilechecksum',
+            name='storage',
+            field=models.CharField(blank=True, default='', help_text='Alias of FTPSERVER_STORAGES (empty is the default storage).', max_length=64, verbose_name='Storage'),
+        ),
+        migrations.AlterField(
+            model_name='ftpfilechecksum',
+            name='path',
+            field=models.CharField(max_length=1024, verbose_name='Path'),
+        ),
+        migrations.RunPython(fill_path_hash, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='ftpfilechecksum',
+            unique_together={('storage', 'path_hash')},
+        ),
+    ]
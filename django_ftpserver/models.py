@@ -1,11 +1,23 @@
+import hashlib
+import logging
 import os
 
 from django.db import models
 from django.conf import settings
-from django.core.exceptions import ObjectDoesNotExist
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db.models.signals import post_save
+from django.dispatch import receiver
 from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 
+from .compat import get_username_field
+from .permissions import PermissionTrie
+from .storages import validate_storage_alias
+from .utils import get_settings_value
+
+logger = logging.getLogger(__name__)
+
 
 class FTPUserGroup(models.Model):
     name = models.CharField(
@@ -15,6 +27,34 @@ class FTPUserGroup(models.Model):
         default='elradfmw')
     home_dir = models.CharField(
         _("Home directory"), max_length=1024, null=True, blank=True)
+    read_limit = models.PositiveIntegerField(
+        _("Read limit"), null=False, blank=False, default=0,
+        help_text=_("Maximum upload speed in bytes/sec (0 is unlimited)."))
+    write_limit = models.PositiveIntegerField(
+        _("Write limit"), null=False, blank=False, default=0,
+        help_text=_("Maximum download speed in bytes/sec (0 is unlimited)."))
+    max_connections = models.PositiveIntegerField(
+        _("Max connections"), null=False, blank=False, default=0,
+        help_text=_("Maximum concurrent sessions of all accounts in the "
+                    "group (0 is unlimited)."))
+    max_connections_per_user = models.PositiveIntegerField(
+        _("Max connections per user"), null=False, blank=False, default=0,
+        help_text=_("Maximum concurrent sessions of each account "
+                    "(0 is unlimited)."))
+    compression_level = models.PositiveSmallIntegerField(
+        _("Compression level"), null=False, blank=False, default=6,
+        validators=[MaxValueValidator(9)],
+        help_text=_("zlib compression level of MODE Z transfers "
+                    "(0 is no compression, 9 is the best)."))
+    quota = models.BigIntegerField(
+        _("Quota"), null=False, blank=False, default=0,
+        validators=[MinValueValidator(0)],
+        help_text=_("Maximum bytes stored by each account (0 is unlimited)."))
+    storage = models.CharField(
+        _("Storage"), max_length=64, null=False, blank=True, default='',
+        validators=[validate_storage_alias],
+        help_text=_("Alias of FTPSERVER_STORAGES (empty is the default "
+                    "storage)."))
 
     def __str__(self):
         return u"{0}".format(self.name)
@@ -31,10 +71,30 @@ class FTPUserAccount(models.Model):
     group = models.ForeignKey(
         FTPUserGroup, verbose_name=_("FTP user group"), null=False,
         blank=False, on_delete=models.CASCADE)
+    login_name = models.CharField(
+        _("Login name"), max_length=255, null=True, unique=True,
+        editable=False)
     last_login = models.DateTimeField(
         _("Last login"), editable=False, null=True)
     home_dir = models.CharField(
         _("Home directory"), max_length=1024, null=True, blank=True)
+    read_limit = models.PositiveIntegerField(
+        _("Read limit"), null=True, blank=True,
+        help_text=_("Overrides the read limit of the group."))
+    write_limit = models.PositiveIntegerField(
+        _("Write limit"), null=True, blank=True,
+        help_text=_("Overrides the write limit of the group."))
+    max_connections = models.PositiveIntegerField(
+        _("Max connections"), null=True, blank=True,
+        help_text=_("Overrides the max connections per user of the group."))
+    quota = models.BigIntegerField(
+        _("Quota"), null=True, blank=True,
+        validators=[MinValueValidator(0)],
+        help_text=_("Overrides the quota of the group."))
+    storage = models.CharField(
+        _("Storage"), max_length=64, null=False, blank=True, default='',
+        validators=[validate_storage_alias],
+        help_text=_("Overrides the storage of the group."))
 
     def __str__(self):
         try:
@@ -50,6 +110,50 @@ class FTPUserAccount(models.Model):
             user = None
         return user and user.username or ""
 
+    @staticmethod
+    def normalize_login_name(value):
+        """return value for login_name.
+
+        It is lowercased when FTPSERVER_CASE_INSENSITIVE_LOGIN is True.
+        """
+        if value is not None and get_settings_value(
+                'FTPSERVER_CASE_INSENSITIVE_LOGIN'):
+            return value.lower()
+        return value
+
+    def sync_login_name(self):
+        """copy login_name from the username field of user.
+        """
+        self.login_name = self.normalize_login_name(
+            getattr(self.user, get_username_field()))
+
+    def clean(self):
+        super(FTPUserAccount, self).clean()
+        if self.user_id is None:
+            return
+        login_name = self.normalize_login_name(
+            getattr(self.user, get_username_field()))
+        others = FTPUserAccount.objects.filter(login_name=login_name)
+        if self.pk is not None:
+            others = others.exclude(pk=self.pk)
+        if others.exists():
+            # e.g. "Bob" and "bob" with FTPSERVER_CASE_INSENSITIVE_LOGIN
+            raise ValidationError({'user': _(
+                "An FTP user account with the same login name "
+                "already exists.")})
+
+    def save(self, *args, **kwargs):
+        if self.user_id is not None:
+            # login_name may be stale, e.g. after changing
+            # FTPSERVER_CASE_INSENSITIVE_LOGIN
+            self.sync_login_name()
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None \
+                    and 'login_name' not in update_fields:
+                kwargs['update_fields'] = list(update_fields) + [
+                    'login_name']
+        super(FTPUserAccount, self).save(*args, **kwargs)
+
     def update_last_login(self, value=None):
         self.last_login = value or timezone.now()
 
@@ -64,11 +168,197 @@ class FTPUserAccount(models.Model):
         return directory.format(username=self.get_username())
 
     def has_perm(self, perm, path):
-        return perm in self.get_perms()
+        """check permission of path, with the rules compiled once per
+        instance.
+        """
+        rules = getattr(self, '_permission_rules', None)
+        if rules is None:
+            rules = self._permission_rules = self.get_permission_rules()
+        return rules.has_perm(perm, path)
 
     def get_perms(self):
         return self.group.permission
 
+    def get_permission_rules(self, root=None):
+        """return PermissionTrie compiled from path permissions of
+        the group and the account, rooted at the home directory
+        (if root is None).
+
+        Account rules take precedence over group rules for the same path.
+        """
+        if root is None:
+            root = self.get_home_dir()
+        condition = models.Q(group_id=self.group_id)
+        if self.pk is not None:
+            condition |= models.Q(account_id=self.pk)
+        rules = FTPPathPermission.objects.filter(condition).order_by(
+            models.F('account_id').asc(nulls_first=True)
+        ).values_list('path', 'permission')
+        return PermissionTrie(self.get_perms(), rules, root=root)
+
+    def get_bandwidth_limits(self):
+        """return (read_limit, write_limit) in bytes/sec, 0 is unlimited.
+        """
+        read_limit = self.read_limit
+        if read_limit is None:
+            read_limit = self.group.read_limit
+        write_limit = self.write_limit
+        if write_limit is None:
+            write_limit = self.group.write_limit
+        return read_limit, write_limit
+
+    def get_max_connections(self):
+        """return maximum concurrent sessions of the account, 0 is unlimited.
+        """
+        if self.max_connections is not None:
+            return self.max_connections
+        return self.group.max_connections_per_user
+
+    def get_quota(self):
+        """return maximum bytes stored by the account, 0 is unlimited.
+        """
+        if self.quota is not None:
+            return self.quota
+        return self.group.quota
+
+    def get_compression_level(self):
+        """return zlib compression level of MODE Z transfers.
+        """
+        return self.group.compression_level
+
+    def get_storage_alias(self):
+        """return alias of FTPSERVER_STORAGES, empty for the default storage.
+        """
+        return self.storage or self.group.storage
+
     class Meta:
         verbose_name = _("FTP user account")
         verbose_name_plural = _("FTP user accounts")
+
+
+class FTPQuotaUsage(models.Model):
+    account = models.OneToOneField(
+        FTPUserAccount, verbose_name=_("FTP user account"),
+        related_name='quota_usage', on_delete=models.CASCADE)
+    bytes = models.BigIntegerField(_("Bytes"), default=0)
+    files = models.BigIntegerField(_("Files"), default=0)
+    updated_at = models.DateTimeField(_("Updated at"), auto_now=True)
+
+    def __str__(self):
+        return u"{0} {1}".format(self.account, self.bytes)
+
+    class Meta:
+        verbose_name = _("FTP quota usage")
+        verbose_name_plural = _("FTP quota usages")
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def sync_account_login_name(sender, instance, raw=False, **kwargs):
+    """keep FTPUserAccount.login_name in sync with the user.
+    """
+    if raw:
+        return
+    login_name = FTPUserAccount.normalize_login_name(
+        getattr(instance, get_username_field()))
+    accounts = FTPUserAccount.objects.filter(user=instance).exclude(
+        login_name=login_name)
+    if not accounts.exists():
+        return
+    if FTPUserAccount.objects.filter(login_name=login_name).exists():
+        # another user has the same login name (e.g. "Bob" and "bob" with
+        # FTPSERVER_CASE_INSENSITIVE_LOGIN), the account can't log in
+        # until one of them is renamed
+        logger.warning(
+            'FTP user account of %s has the same login name as another '
+            'account, its login is disabled.', login_name)
+        login_name = None
+    accounts.update(login_name=login_name)
+
+
+class FTPPathPermission(models.Model):
+    group = models.ForeignKey(
+        FTPUserGroup, verbose_name=_("FTP user group"), null=True,
+        blank=True, related_name='path_permissions',
+        on_delete=models.CASCADE)
+    account = models.ForeignKey(
+        FTPUserAccount, verbose_name=_("FTP user account"), null=True,
+        blank=True, related_name='path_permissions',
+        on_delete=models.CASCADE)
+    path = models.CharField(
+        _("Path"), max_length=1024, null=False, blank=False,
+        help_text=_("Path relative to the home directory, e.g. /incoming"))
+    permission = models.CharField(
+        _("Permission"), max_length=8, null=False, blank=True,
+        help_text=_("Permission for the path and its subdirectories."))
+
+    def __str__(self):
+        return u"{0} {1}".format(self.path, self.permission)
+
+    class Meta:
+        verbose_name = _("FTP path permission")
+        verbose_name_plural = _("FTP path permissions")
+
+
+class FTPFileChecksum(models.Model):
+    storage = models.CharField(
+        _("Storage"), max_length=64, blank=True, default='',
+        help_text=_("Alias of FTPSERVER_STORAGES (empty is the default "
+                    "storage)."))
+    path = models.CharField(
+        _("Path"), max_length=1024, null=False, blank=False)
+    # unique with storage instead of path, the key of storage and path
+    # would exceed the index size limit of MySQL
+    path_hash = models.CharField(
+        _("Path hash"), max_length=64, default='', editable=False)
+    size = models.BigIntegerField(_("Size"))
+    crc32 = models.CharField(_("CRC32"), max_length=8, blank=True)
+    md5 = models.CharField(_("MD5"), max_length=32, blank=True)
+    sha1 = models.CharField(_("SHA-1"), max_length=40, blank=True)
+    sha256 = models.CharField(_("SHA-256"), max_length=64, blank=True)
+    updated_at = models.DateTimeField(_("Updated at"), auto_now=True)
+
+    def __str__(self):
+        return self.path
+
+    @staticmethod
+    def hash_path(path):
+        """return SHA-256 hex digest of path.
+        """
+        return hashlib.sha256(path.encode('utf-8')).hexdigest()
+
+    def save(self, *args, **kwargs):
+        self.path_hash = self.hash_path(self.path)
+        super(FTPFileChecksum, self).save(*args, **kwargs)
+
+    class Meta:
+        verbose_name = _("FTP file checksum")
+        verbose_name_plural = _("FTP file checksums")
+        unique_together = (('storage', 'path_hash'),)
+
+
+class FTPTransferLog(models.Model):
+    RESULT_COMPLETED = 'completed'
+    RESULT_INCOMPLETE = 'incomplete'
+    RESULT_CHOICES = (
+        (RESULT_COMPLETED, _("Completed")),
+        (RESULT_INCOMPLETE, _("Incomplete")),
+    )
+
+    account = models.ForeignKey(
+        FTPUserAccount, verbose_name=_("FTP user account"), null=True,
+        blank=True, related_name='transfer_logs', on_delete=models.SET_NULL)
+    command = models.CharField(_("Command"), max_length=8)
+    path = models.CharField(_("Path"), max_length=1024)
+    bytes = models.BigIntegerField(_("Bytes"), default=0)
+    duration = models.FloatField(_("Duration"), default=0)
+    result = models.CharField(
+        _("Result"), max_length=16, choices=RESULT_CHOICES)
+    created_at = models.DateTimeField(
+        _("Created at"), default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return u"{0} {1}".format(self.command, self.path)
+
+    class Meta:
+        verbose_name = _("FTP transfer log")
+        verbose_name_plural = _("FTP transfer logs")
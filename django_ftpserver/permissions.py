@@ -0,0 +1,65 @@
+import posixpath
+
+
+def split_path(path):
+    """split path to components, e.g. '/spam/ham/' -> ['spam', 'ham']
+    """
+    if not path:
+        return []
+    return [name for name in posixpath.normpath(path).split('/')
+            if name and name != '.']
+
+
+class PermissionTrie(object):
+    """Prefix trie of path permission rules.
+
+    The permission of a path is the permission of the longest rule
+    which is a prefix of the path (component wise),
+    or `default` if no rule matches.
+    Paths are relative to `root` (the home directory of the account).
+    """
+    __slots__ = ('default', 'root', '_root_components', '_node')
+
+    def __init__(self, default, rules=(), root='/'):
+        self.default = default
+        self.root = root
+        self._root_components = split_path(root)
+        # node: [permission or None, {name: node}]
+        self._node = [None, {}]
+        for path, permission in rules:
+            self.add(path, permission)
+
+    def add(self, path, permission):
+        """add rule, overwrite the rule for the same path.
+        """
+        node = self._node
+        for name in split_path(path):
+            node = node[1].setdefault(name, [None, {}])
+        node[0] = permission
+
+    def relative_components(self, path):
+        """return components of path relative to root.
+        """
+        components = split_path(path)
+        root = self._root_components
+        if root and components[:len(root)] == root:
+            return components[len(root):]
+        return components
+
+    def get_perms(self, path=None):
+        """return permission string for path.
+        """
+        node = self._node
+        perms = self.default if node[0] is None else node[0]
+        if not path:
+            return perms
+        for name in self.relative_components(path):
+            node = node[1].get(name)
+            if node is None:
+                break
+            if node[0] is not None:
+                perms = node[0]
+        return perms
+
+    def has_perm(self, perm, path=None):
+        return perm in self.get_perms(path)
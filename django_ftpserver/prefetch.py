@@ -0,0 +1,81 @@
+"""Concurrent metadata prefetch of directory listings.
+
+Storages don't return size and modification time with a listing, so
+formatting LIST and MLSD needs calls per entry. Entries are stat'ed
+by batches in a thread pool shared by sessions, and the formatter takes
+the results from the cache of the listing.
+"""
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from .utils import get_settings_value
+
+DEFAULT_OPTIONS = {
+    # threads of the pool, maximum concurrent calls of all listings
+    'workers': 8,
+    # entries stat'ed at once
+    'batch': 100,
+    # seconds to wait for each batch, which blocks the IOLoop; entries
+    # not fetched in time are stat'ed by the formatter
+    'deadline': 0.5,
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_options():
+    """return FTPSERVER_LIST_PREFETCH setting with defaults,
+    None if prefetch is disabled.
+    """
+    value = get_settings_value('FTPSERVER_LIST_PREFETCH')
+    if not value:
+        return None
+    options = dict(DEFAULT_OPTIONS)
+    if value is not True:
+        options.update(value)
+    return options
+
+
+def get_executor(workers):
+    """return thread pool shared by sessions.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            options = {}
+            if sys.version_info >= (3, 6):
+                options['thread_name_prefix'] = 'ftpserver-prefetch'
+            _executor = ThreadPoolExecutor(max_workers=workers, **options)
+        return _executor
+
+
+def fetch(func, paths, executor, deadline):
+    """call func(path) for paths concurrently until deadline
+    (time.monotonic()).
+
+    return {path: result or raised exception} of the finished calls.
+    Unfinished calls are cancelled, the running ones finish but their
+    results are dropped.
+    """
+    stopped = threading.Event()
+
+    def call(path):
+        # pending calls may start before they are cancelled
+        if not stopped.is_set():
+            return func(path)
+
+    futures = dict((executor.submit(call, path), path) for path in paths)
+    done, not_done = wait(futures, max(0, deadline - time.monotonic()))
+    stopped.set()
+    for future in not_done:
+        future.cancel()
+    results = {}
+    for future in done:
+        try:
+            results[futures[future]] = future.result()
+        except Exception as e:
+            results[futures[future]] = e
+    return results
@@ -0,0 +1,180 @@
+"""Profiling of the ftpserver command broken down by FTP command.
+"""
+import cProfile
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# label of the work on the IOLoop outside of FTP commands
+# (data transfers, polling, scheduled calls)
+LOOP_LABEL = 'IOLoop'
+
+
+class CommandProfiler(object):
+    """Profile the IOLoop thread per FTP command for a time window.
+
+    * output: directory to write profiles
+    * mode: 'cprofile' writes a pstats file per FTP command,
+      'sample' samples the stack of the IOLoop thread every `interval`
+      seconds and writes collapsed stacks (for flamegraph.pl, speedscope)
+      with the FTP command as the root frame
+    * duration: seconds to profile after start, until stop if None
+    """
+    modes = ('cprofile', 'sample')
+
+    def __init__(self, output, mode='cprofile', duration=None,
+                 interval=0.005):
+        if mode not in self.modes:
+            raise ValueError('Unknown profile mode: {}'.format(mode))
+        self.output = output
+        self.mode = mode
+        self.duration = duration
+        self.interval = interval
+        self.active = False
+        self.thread_id = None
+        self._started = None
+        self.ioloop = None
+        self._timer = None
+        # cprofile mode
+        self._profiles = {}
+        self._current = None
+        # sample mode
+        self._samples = {}
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def start(self, ioloop=None):
+        """start profiling, must be called on the IOLoop thread.
+        """
+        if self.active:
+            return
+        self.active = True
+        self.thread_id = threading.get_ident()
+        self._started = time.time()
+        self.ioloop = ioloop or self.ioloop
+        if self.mode == 'cprofile':
+            self._profiles = {LOOP_LABEL: cProfile.Profile()}
+            self._current = self._profiles[LOOP_LABEL]
+            self._current.enable()
+        else:
+            self._samples = {}
+            self._stopped.clear()
+            self._thread = threading.Thread(
+                target=self.run, name='ftpserver-profiler')
+            self._thread.daemon = True
+            self._thread.start()
+        if self.duration and self.ioloop is not None:
+            self._timer = self.ioloop.call_later(self.duration, self.stop)
+        logger.info('Profiling started (%s).', self.mode)
+
+    def stop(self):
+        """stop profiling and write profiles, return written paths.
+        """
+        if not self.active:
+            return []
+        self.active = False
+        if self._timer is not None:
+            if not self._timer.cancelled:
+                self._timer.cancel()
+            self._timer = None
+        if self.mode == 'cprofile':
+            self._current.disable()
+            self._current = None
+        else:
+            self._stopped.set()
+            self._thread.join()
+            self._thread = None
+        paths = self.write()
+        logger.info('Profiling stopped, wrote %s.', ', '.join(paths))
+        return paths
+
+    def toggle(self):
+        if self.active:
+            self.stop()
+        else:
+            self.start()
+
+    def enter(self, command):
+        """switch to the profile of FTP command.
+        """
+        if self.active and self.mode == 'cprofile':
+            self._switch(command)
+
+    def exit(self):
+        """switch back to the profile of the IOLoop.
+        """
+        if self.active and self.mode == 'cprofile':
+            self._switch(LOOP_LABEL)
+
+    def _switch(self, label):
+        profile = self._profiles.get(label)
+        if profile is None:
+            profile = self._profiles[label] = cProfile.Profile()
+        self._current.disable()
+        self._current = profile
+        profile.enable()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        """count the current stack of the IOLoop thread.
+        """
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append('{0}:{1}'.format(
+                frame.f_globals.get('__name__', code.co_filename),
+                code.co_name))
+            frame = frame.f_back
+        names.append(metrics.command_context.command or LOOP_LABEL)
+        key = ';'.join(reversed(names))
+        self._samples[key] = self._samples.get(key, 0) + 1
+
+    def write(self):
+        os.makedirs(self.output, exist_ok=True)
+        prefix = os.path.join(
+            self.output,
+            time.strftime('%Y%m%d-%H%M%S', time.localtime(self._started)))
+        if self.mode == 'sample':
+            path = prefix + '.collapsed'
+            with open(path, 'w') as f:
+                for key, count in sorted(self._samples.items()):
+                    f.write('{0} {1}\n'.format(key, count))
+            return [path]
+        paths = []
+        for label, profile in sorted(self._profiles.items()):
+            path = '{0}-{1}.pstats'.format(prefix, label)
+            profile.dump_stats(path)
+            paths.append(path)
+        return paths
+
+
+def install_signal_handler(profiler, ioloop, signum=None):
+    """toggle profiler with signal (SIGUSR2 by default).
+
+    The profiler is toggled on the IOLoop, outside of FTP commands.
+    Return False if the signal is not supported on the platform.
+    """
+    if signum is None:
+        signum = getattr(signal, 'SIGUSR2', None)
+        if signum is None:
+            return False
+    profiler.ioloop = ioloop
+
+    def handler(signum, frame):
+        ioloop.call_later(0, profiler.toggle)
+
+    signal.signal(signum, handler)
+    return True
@@ -0,0 +1,137 @@
+"""Storage quotas of FTP accounts.
+
+Usage (bytes and files) of each account is kept in FTPQuotaUsage and is
+updated incrementally by StorageFS when files are stored, deleted or
+renamed, so uploads don't walk the home directory.
+`reconcile` recomputes usage from the filesystem.
+"""
+import errno
+import os
+from types import SimpleNamespace
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+
+def quota_error():
+    return OSError(errno.EDQUOT, os.strerror(errno.EDQUOT))
+
+
+def get_usage(account_id):
+    """return bytes stored by account.
+    """
+    from .models import FTPQuotaUsage
+    usage = FTPQuotaUsage.objects.filter(
+        account_id=account_id).values_list('bytes', flat=True).first()
+    return usage or 0
+
+
+def add_usage(account_id, size, files=0):
+    """add size bytes and number of files to usage of account.
+    """
+    from .models import FTPQuotaUsage
+    if not size and not files:
+        return
+    queryset = FTPQuotaUsage.objects.filter(account_id=account_id)
+    values = dict(
+        bytes=F('bytes') + size, files=F('files') + files,
+        updated_at=timezone.now())
+    if queryset.update(**values):
+        return
+    try:
+        with transaction.atomic():
+            FTPQuotaUsage.objects.create(
+                account_id=account_id, bytes=max(size, 0),
+                files=max(files, 0))
+    except IntegrityError:
+        # created by another session
+        queryset.update(**values)
+
+
+class QuotaFile(object):
+    """Proxy of file opened for writing, which raises OSError (EDQUOT)
+    when the file would exceed the quota.
+
+    size is the size of the file before opening, None if it didn't exist.
+    Usage is updated on close.
+    """
+
+    def __init__(self, file, account_id, quota, usage, size, mode):
+        self._file = file
+        self._account_id = account_id
+        self._quota = quota
+        self._usage = usage
+        self._created = size is None
+        self._size = size or 0
+        self._position = self._size if 'a' in mode else 0
+        self._end = 0 if 'w' in mode else self._size
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, data):
+        position = self._position + len(data)
+        end = max(self._end, position)
+        if self._quota and self._usage + end - self._size > self._quota:
+            raise quota_error()
+        result = self._file.write(data)
+        self._position = position
+        self._end = end
+        return result
+
+    def seek(self, *args):
+        result = self._file.seek(*args)
+        self._position = self._file.tell()
+        return result
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._file.close()
+        add_usage(
+            self._account_id, self._end - self._size,
+            1 if self._created else 0)
+
+
+def walk_usage(fs, path):
+    """return (bytes, files) under path of fs.
+    """
+    size = files = 0
+    for name in fs.listdir(path):
+        child = os.path.join(path, name)
+        if fs.isdir(child):
+            child_size, child_files = walk_usage(fs, child)
+            size += child_size
+            files += child_files
+        else:
+            size += fs.getsize(child)
+            files += 1
+    return size, files
+
+
+def reconcile(accounts, filesystem_class):
+    """recompute usage of accounts from their home directories.
+
+    return list of FTPQuotaUsage.
+    """
+    from .models import FTPQuotaUsage
+    usages = []
+    for account in accounts:
+        # StorageFS uses the storage of the account of the channel
+        channel = SimpleNamespace(account=account)
+        fs = filesystem_class(account.get_home_dir(), channel)
+        size, files = walk_usage(fs, fs.ftp2fs('/'))
+        usages.append(FTPQuotaUsage(
+            account=account, bytes=size, files=files))
+    with transaction.atomic():
+        FTPQuotaUsage.objects.filter(
+            account_id__in=[usage.account_id for usage in usages]).delete()
+        FTPQuotaUsage.objects.bulk_create(usages, batch_size=1000)
+    return usages
@@ -0,0 +1,116 @@
+import time
+from collections import OrderedDict
+
+
+class TokenBucket(object):
+    """Token bucket refilled with `rate` tokens per second up to `capacity`.
+    """
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def consume(self, now, tokens=1):
+        """take tokens from bucket, return False if bucket is empty.
+        """
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(
+                self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+        if self.tokens < tokens:
+            return False
+        self.tokens -= tokens
+        return True
+
+
+class _Entry(object):
+    __slots__ = ('bucket', 'failures', 'blocked_until')
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.failures = 0
+        self.blocked_until = 0
+
+
+class LoginRateLimiter(object):
+    """Rate limiter for login attempts keyed by source IP and by username.
+
+    * ip_rate, ip_burst: attempts per second and burst size per IP address
+    * user_rate, user_burst: attempts per second and burst size per username
+    * backoff: seconds to block a key after a failed login, doubled on each
+      consecutive failure up to max_backoff (0 disables backoff)
+    * max_entries: maximum number of keys kept in memory, the least recently
+      used keys are evicted
+    """
+    clock = staticmethod(time.monotonic)
+
+    def __init__(self, ip_rate=1.0, ip_burst=10, user_rate=0.2, user_burst=5,
+                 backoff=0, max_backoff=300, max_entries=10000):
+        self.limits = {
+            'ip': (ip_rate, ip_burst),
+            'user': (user_rate, user_burst),
+        }
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.rejected = {'ip': 0, 'user': 0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _get_entry(self, kind, value, now):
+        key = (kind, value)
+        entry = self._entries.get(key)
+        if entry is None:
+            rate, burst = self.limits[kind]
+            entry = self._entries[key] = _Entry(TokenBucket(rate, burst, now))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        else:
+            self._entries.move_to_end(key)
+        return entry
+
+    def _keys(self, remote_ip, username):
+        if remote_ip:
+            yield 'ip', remote_ip
+        if username:
+            yield 'user', username
+
+    def allow(self, remote_ip, username):
+        """return True if login attempt is allowed.
+        """
+        now = self.clock()
+        for kind, value in self._keys(remote_ip, username):
+            entry = self._get_entry(kind, value, now)
+            if entry.blocked_until > now or not entry.bucket.consume(now):
+                self.rejected[kind] += 1
+                return False
+        return True
+
+    def failure(self, remote_ip, username):
+        """record failed login, block the keys for backoff seconds.
+        """
+        if not self.backoff:
+            return
+        now = self.clock()
+        for kind, value in self._keys(remote_ip, username):
+            entry = self._get_entry(kind, value, now)
+            entry.failures += 1
+            delay = min(
+                self.backoff * 2 ** min(entry.failures - 1, 32),
+                self.max_backoff)
+            entry.blocked_until = now + delay
+
+    def success(self, remote_ip, username):
+        """record successful login, reset backoff of the keys.
+        """
+        for key in (('ip', remote_ip), ('user', username)):
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.failures = 0
+                entry.blocked_until = 0
@@ -0,0 +1,382 @@
+import io
+import math
+import posixpath
+import random
+import threading
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.files.base import File
+from django.core.files.storage import Storage
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+from django.utils.translation import ugettext_lazy as _
+
+from .utils import get_settings_value, import_class
+
+# alias of FTPSERVER_STORAGES: storage instance shared by sessions
+_storages = {}
+_storages_lock = threading.Lock()
+
+
+def get_storage_aliases():
+    """return FTPSERVER_STORAGES setting.
+
+    {alias: {'BACKEND': class or dotted path, 'OPTIONS': {...}}}
+    """
+    return get_settings_value('FTPSERVER_STORAGES') or {}
+
+
+def get_storage(alias):
+    """return storage of alias, created once and shared by sessions.
+    """
+    storage = _storages.get(alias)
+    if storage is not None:
+        return storage
+    with _storages_lock:
+        storage = _storages.get(alias)
+        if storage is None:
+            config = get_storage_aliases().get(alias)
+            if config is None:
+                raise ValueError('Unknown storage: {}'.format(alias))
+            storage_class = config['BACKEND']
+            if isinstance(storage_class, str):
+                storage_class = import_class(storage_class)
+            storage = _storages[alias] = storage_class(
+                **config.get('OPTIONS', {}))
+    return storage
+
+
+def reset_storages():
+    with _storages_lock:
+        _storages.clear()
+
+
+@receiver(setting_changed)
+def _reset_storages(setting, **kwargs):
+    if setting == 'FTPSERVER_STORAGES':
+        reset_storages()
+
+
+def validate_storage_alias(value):
+    if value and value not in get_storage_aliases():
+        raise ValidationError(
+            _("Unknown storage: %(alias)s"), params={'alias': value})
+
+
+def _normalize(name):
+    name = posixpath.normpath('/' + (name or '')).lstrip('/')
+    return '' if name == '.' else name
+
+
+class InMemoryFile(io.BytesIO):
+    """File opened for writing, stored to InMemoryStorage on close.
+    """
+
+    def __init__(self, storage, name, initial=b'', append=False):
+        super(InMemoryFile, self).__init__(initial)
+        self.name = name
+        self._storage = storage
+        if append:
+            self.seek(0, io.SEEK_END)
+
+    def close(self):
+        if not self.closed:
+            self._storage._store(self.name, self.getvalue())
+        super(InMemoryFile, self).close()
+
+
+@deconstructible
+class InMemoryStorage(Storage):
+    """Storage which keeps files in memory, for tests and benchmarks.
+
+    Directories exist as parents of files or are created by `makedirs`.
+    """
+
+    def __init__(self, files=None):
+        # path: (content, modified time)
+        self._files = {}
+        # directory path: (set of directory names, set of file names)
+        self._dirs = {'': (set(), set())}
+        self._created = timezone.now()
+        for name, content in (files or {}).items():
+            self._store(name, content)
+
+    def _get_dir(self, name):
+        """return entries of directory, create it and its parents.
+        """
+        entries = self._dirs.get(name)
+        if entries is None:
+            parent, basename = posixpath.split(name)
+            self._get_dir(parent)[0].add(basename)
+            entries = self._dirs[name] = (set(), set())
+        return entries
+
+    def _store(self, name, content):
+        name = _normalize(name)
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        parent, basename = posixpath.split(name)
+        self._get_dir(parent)[1].add(basename)
+        self._files[name] = (content, timezone.now())
+
+    def _open(self, name, mode='rb'):
+        name = _normalize(name)
+        if 'w' in mode or 'a' in mode:
+            initial = b''
+            if 'a' in mode and name in self._files:
+                initial = self._files[name][0]
+            return InMemoryFile(self, name, initial, append='a' in mode)
+        try:
+            content = self._files[name][0]
+        except KeyError:
+            raise FileNotFoundError(name)
+        return File(io.BytesIO(content), name=name)
+
+    def _save(self, name, content):
+        if hasattr(content, 'chunks'):
+            data = b''.join(content.chunks())
+        else:
+            data = content.read()
+        self._store(name, data)
+        return _normalize(name)
+
+    def makedirs(self, name):
+        self._get_dir(_normalize(name))
+
+    def removedir(self, name):
+        name = _normalize(name)
+        directories, files = self._dirs[name]
+        if directories or files:
+            raise OSError('Directory not empty: {}'.format(name))
+        parent, basename = posixpath.split(name)
+        self._dirs[parent][0].discard(basename)
+        del self._dirs[name]
+
+    def delete(self, name):
+        name = _normalize(name)
+        if self._files.pop(name, None) is not None:
+            parent, basename = posixpath.split(name)
+            self._dirs[parent][1].discard(basename)
+
+    def exists(self, name):
+        if name.endswith('/'):
+            return _normalize(name) in self._dirs
+        name = _normalize(name)
+        return name in self._files or name in self._dirs
+
+    def listdir(self, path):
+        try:
+            directories, files = self._dirs[_normalize(path)]
+        except KeyError:
+            raise FileNotFoundError(path)
+        return sorted(directories), sorted(files)
+
+    def size(self, name):
+        return len(self._files[_normalize(name)][0])
+
+    def get_modified_time(self, name):
+        name = _normalize(name)
+        if name in self._files:
+            return self._files[name][1]
+        if name in self._dirs:
+            return self._created
+        raise FileNotFoundError(name)
+
+    get_created_time = get_accessed_time = get_modified_time
+
+
+class ThrottledFile(File):
+    """File which sleeps to limit bandwidth of read and write.
+    """
+
+    def __init__(self, file, bandwidth, sleep=time.sleep):
+        super(ThrottledFile, self).__init__(file, getattr(file, 'name', None))
+        self.bandwidth = bandwidth
+        self._sleep = sleep
+
+    def read(self, *args):
+        data = self.file.read(*args)
+        self._sleep(len(data) / self.bandwidth)
+        return data
+
+    def write(self, data):
+        self._sleep(len(data) / self.bandwidth)
+        return self.file.write(data)
+
+
+@deconstructible
+class LatencyStorage(Storage):
+    """Wrapper of storage which injects latency, bandwidth limits and errors.
+
+    Options (default: FTPSERVER_LATENCY_STORAGE setting):
+
+    * storage: wrapped storage, class or dotted path of class
+      (default: InMemoryStorage)
+    * latency: seconds per call, or {method name: seconds} with
+      '*' as the default
+    * bandwidth: bytes per second of file content (0 is unlimited)
+    * error_rate: ratio of calls which raise OSError, or {method name: ratio}
+    * object_store: mimic an object store, directories don't exist and
+      listing is paginated
+    * page_size: number of entries per page of listing,
+      each page costs the latency of 'listdir'
+    * seed: random seed of errors
+
+    Number of calls by method is counted in `calls`.
+    """
+    sleep = staticmethod(time.sleep)
+
+    def __init__(self, storage=None, latency=0, bandwidth=0, error_rate=0,
+                 object_store=False, page_size=None, seed=None):
+        options = get_settings_value('FTPSERVER_LATENCY_STORAGE') or {}
+        storage = storage or options.get('storage') or InMemoryStorage
+        if isinstance(storage, str):
+            storage = import_class(storage)
+        if isinstance(storage, type):
+            storage = storage()
+        self.storage = storage
+        self.latency = latency or options.get('latency', 0)
+        self.bandwidth = bandwidth or options.get('bandwidth', 0)
+        self.error_rate = error_rate or options.get('error_rate', 0)
+        self.object_store = object_store or options.get('object_store', False)
+        self.page_size = page_size or options.get('page_size') or 1000
+        self.random = random.Random(
+            seed if seed is not None else options.get('seed'))
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _get_option(value, method):
+        if isinstance(value, dict):
+            return value.get(method, value.get('*', 0))
+        return value
+
+    def _inject(self, method):
+        """count call, sleep the latency and raise injected error.
+        """
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            rate = self._get_option(self.error_rate, method)
+            failed = rate and self.random.random() < rate
+        delay = self._get_option(self.latency, method)
+        if delay:
+            self.sleep(delay)
+        if failed:
+            raise OSError('Injected error of {}.'.format(method))
+
+    def _throttle(self, size):
+        if self.bandwidth and size:
+            self.sleep(size / self.bandwidth)
+
+    def _isdir(self, name):
+        try:
+            self.storage.listdir(name)
+        except (OSError, NotImplementedError):
+            return False
+        return True
+
+    def _check_file(self, name):
+        if self.object_store and (name.endswith('/') or self._isdir(name)):
+            raise FileNotFoundError(name)
+
+    def _open(self, name, mode='rb'):
+        self._inject('open')
+        self._check_file(name)
+        f = self.storage.open(name, mode)
+        if self.bandwidth:
+            return ThrottledFile(f, self.bandwidth, self.sleep)
+        return f
+
+    def _save(self, name, content):
+        self._inject('save')
+        self._throttle(content.size)
+        return self.storage.save(name, content)
+
+    def delete(self, name):
+        self._inject('delete')
+        self.storage.delete(name)
+
+    def exists(self, name):
+        self._inject('exists')
+        if self.object_store:
+            return not name.endswith('/') and self.storage.exists(name) \
+                and not self._isdir(name)
+        return self.storage.exists(name)
+
+    def listdir_pages(self, path):
+        """yield (directories, files) of listing by page.
+
+        Each page costs a listdir call.
+        """
+        self._inject('listdir')
+        try:
+            directories, files = self.storage.listdir(path)
+        except FileNotFoundError:
+            if not self.object_store:
+                raise
+            # prefix without objects
+            directories, files = [], []
+        entries = [(True, name) for name in directories] + \
+            [(False, name) for name in files]
+        page_size = self.page_size if self.object_store else len(entries)
+        page_size = max(1, page_size)
+        pages = max(1, int(math.ceil(len(entries) / float(page_size))))
+        for page in range(pages):
+            if page:
+                self._inject('listdir')
+            chunk = entries[page * page_size:(page + 1) * page_size]
+            yield ([name for is_dir, name in chunk if is_dir],
+                   [name for is_dir, name in chunk if not is_dir])
+
+    def listdir(self, path):
+        directories, files = [], []
+        for page_directories, page_files in self.listdir_pages(path):
+            directories.extend(page_directories)
+            files.extend(page_files)
+        return directories, files
+
+    def size(self, name):
+        self._inject('size')
+        self._check_file(name)
+        return self.storage.size(name)
+
+    def get_modified_time(self, name):
+        self._inject('get_modified_time')
+        self._check_file(name)
+        return self.storage.get_modified_time(name)
+
+    def get_created_time(self, name):
+        self._inject('get_created_time')
+        self._check_file(name)
+        return self.storage.get_created_time(name)
+
+    def get_accessed_time(self, name):
+        self._inject('get_accessed_time')
+        self._check_file(name)
+        return self.storage.get_accessed_time(name)
+
+    def url(self, name):
+        return self.storage.url(name)
+
+    def path(self, name):
+        if self.object_store:
+            raise NotImplementedError(
+                "Object stores don't support absolute paths.")
+        return self.storage.path(name)
+
+    def _get_directory_method(self, method):
+        func = getattr(self.storage, method, None)
+        if self.object_store or func is None:
+            raise NotImplementedError(
+                "{0} is not supported.".format(method))
+        self._inject(method)
+        return func
+
+    def makedirs(self, name):
+        self._get_directory_method('makedirs')(name)
+
+    def removedir(self, name):
+        self._get_directory_method('removedir')(name)
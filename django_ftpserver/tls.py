@@ -0,0 +1,93 @@
+"""Shared SSL context of FTPS with TLS session resumption.
+
+One context is built at startup and used by all control and data
+channels, so a data channel can resume the TLS session of its control
+channel (or of a previous data channel) instead of a full handshake.
+"""
+import os
+
+from . import metrics
+from .utils import get_settings_value
+
+# session id context of the server, sessions are resumed within it
+SESSION_ID = b'django-ftpserver'
+DEFAULT_SESSION_TIMEOUT = 300
+
+
+def get_options():
+    """return FTPSERVER_TLS setting with defaults.
+    """
+    options = {
+        'session_timeout': DEFAULT_SESSION_TIMEOUT,
+        'session_tickets': True,
+    }
+    options.update(get_settings_value('FTPSERVER_TLS') or {})
+    return options
+
+
+def configure_session_resumption(
+        context, session_timeout=DEFAULT_SESSION_TIMEOUT,
+        session_tickets=True):
+    """enable session id cache (and session tickets) of context.
+    """
+    from OpenSSL import SSL
+    context.set_session_id(SESSION_ID)
+    context.set_session_cache_mode(SSL.SESS_CACHE_SERVER)
+    context.set_timeout(session_timeout)
+    if not session_tickets:
+        context.set_options(SSL.OP_NO_TICKET)
+    return context
+
+
+def make_ssl_context(certfile, keyfile=None, protocol=None, options=None,
+                     session_timeout=DEFAULT_SESSION_TIMEOUT,
+                     session_tickets=True):
+    """return pyOpenSSL context with the certificate and session resumption.
+    """
+    from OpenSSL import SSL
+    keyfile = keyfile or certfile
+    for path in (certfile, keyfile):
+        if not os.path.isfile(path):
+            raise FileNotFoundError('{!r} does not exist'.format(path))
+    context = SSL.Context(
+        protocol if protocol is not None else SSL.TLS_SERVER_METHOD)
+    context.use_certificate_chain_file(certfile)
+    context.use_privatekey_file(keyfile)
+    if options:
+        context.set_options(options)
+    return configure_session_resumption(
+        context, session_timeout, session_tickets)
+
+
+def session_reused(connection):
+    """return True if the handshake of connection resumed a session,
+    None if it is unknown.
+    """
+    reused = getattr(connection, 'session_reused', None)
+    if reused is not None:
+        return bool(reused())
+    # pyOpenSSL has no public API for it, the private binding may be
+    # missing in other versions
+    try:
+        from OpenSSL import SSL
+    except ImportError:
+        return None
+    func = getattr(getattr(SSL, '_lib', None), 'SSL_session_reused', None)
+    ssl = getattr(connection, '_ssl', None)
+    if func is None or ssl is None:
+        return None
+    try:
+        return bool(func(ssl))
+    except (TypeError, ValueError):
+        return None
+
+
+def observe_handshake(connection, channel):
+    """count completed handshake of channel ('control' or 'data').
+    """
+    if not metrics.registry.enabled:
+        return
+    reused = session_reused(connection)
+    metrics.tls_handshakes.inc(
+        channel=channel,
+        resumed='unknown' if reused is None else str(reused).lower())
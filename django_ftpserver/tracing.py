@@ -0,0 +1,199 @@
+import json
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CommandTrace(object):
+    """Storage calls made while processing one FTP command.
+    """
+    __slots__ = (
+        'command', 'arg', 'session', 'started', 'calls', 'duration',
+        'methods', 'records', 'ended')
+
+    def __init__(self, command, arg, session):
+        self.command = command
+        self.arg = arg
+        self.session = session
+        self.started = time.perf_counter()
+        self.calls = 0
+        self.duration = 0.0
+        # method name: [count, duration]
+        self.methods = {}
+        # (method name, path, duration)
+        self.records = []
+        self.ended = False
+
+    def add(self, method, path, duration, max_records):
+        self.calls += 1
+        self.duration += duration
+        summary = self.methods.get(method)
+        if summary is None:
+            summary = self.methods[method] = [0, 0.0]
+        summary[0] += 1
+        summary[1] += duration
+        if len(self.records) < max_records:
+            self.records.append((method, path, duration))
+
+    def as_dict(self):
+        return {
+            'command': self.command,
+            'arg': self.arg,
+            'session': self.session,
+            'elapsed': time.perf_counter() - self.started,
+            'calls': self.calls,
+            'duration': self.duration,
+            'methods': self.methods,
+            'records': self.records,
+        }
+
+
+class StorageTracer(object):
+    """Trace storage calls of StorageFS per FTP command.
+
+    * output: JSON lines file to write traces, log with the
+      django_ftpserver.tracing logger if None
+    * sample_rate: ratio of FTP commands to trace
+    * max_records: maximum number of calls recorded in detail per command
+    """
+
+    def __init__(self, output=None, sample_rate=1.0, max_records=1000):
+        self.output = output
+        self.sample_rate = sample_rate
+        self.max_records = max_records
+        # the trace is per thread, calls of other threads (e.g. prefetch
+        # of listings) aren't charged to the command on the IOLoop
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._file = None
+
+    @property
+    def current(self):
+        return getattr(self._local, 'trace', None)
+
+    @current.setter
+    def current(self, trace):
+        self._local.trace = trace
+
+    def begin(self, command, arg, session=''):
+        """start tracing of FTP command, return CommandTrace or None.
+        """
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            self.current = None
+            return None
+        self.current = CommandTrace(command, arg, str(session))
+        return self.current
+
+    def end(self, trace):
+        """finish tracing of FTP command and emit the trace.
+        """
+        if self.current is trace:
+            self.current = None
+        trace.ended = True
+        if trace.calls:
+            self.emit(trace)
+
+    def iterate(self, trace, iterable):
+        """yield items of iterable, each produced in trace.
+
+        Producers of data channels (e.g. LIST) call the storage after
+        their command is processed.
+        """
+        iterator = iter(iterable)
+        while True:
+            previous = self.current
+            self.current = trace
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.current = previous
+            yield item
+
+    def bind(self, func):
+        """return func which runs in the current trace, e.g. in threads.
+
+        Calls finished after the trace ended are not recorded.
+        """
+        trace = self.current
+
+        def call(*args, **kwargs):
+            previous = self.current
+            self.current = trace
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.current = previous
+        return call
+
+    def record(self, method, path, duration):
+        trace = self.current
+        if trace is not None:
+            with self._lock:
+                if not trace.ended:
+                    trace.add(method, path, duration, self.max_records)
+
+    def emit(self, trace):
+        if self.output is None:
+            logger.info(
+                '%s %s: %d storage calls in %.6f seconds %s',
+                trace.command, trace.arg, trace.calls, trace.duration,
+                ' '.join(
+                    '{0}={1}'.format(method, summary[0])
+                    for method, summary in sorted(trace.methods.items())))
+            return
+        if self._file is None:
+            self._file = open(self.output, 'a', buffering=1)
+        self._file.write(json.dumps(trace.as_dict()) + '\n')
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class TracedStorage(object):
+    """Proxy of storage which records calls to StorageTracer.
+    """
+
+    __slots__ = ('_storage', '_tracer')
+
+    def __init__(self, storage, tracer):
+        object.__setattr__(self, '_storage', storage)
+        object.__setattr__(self, '_tracer', tracer)
+
+    def __getattr__(self, name):
+        attr = getattr(self._storage, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+        return self._wrap(name, attr)
+
+    def _wrap(self, name, func):
+        tracer = self._tracer
+
+        def wrapper(*args, **kwargs):
+            if tracer.current is None:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                path = args[0] if args and isinstance(args[0], str) else None
+                tracer.record(name, path, time.perf_counter() - start)
+        return wrapper
+
+    def wrap_call(self, name, func):
+        """return func recorded as storage method name, e.g. a request
+        of the client of the storage.
+        """
+        inner = getattr(self._storage, 'wrap_call', None)
+        if inner is not None:
+            func = inner(name, func)
+        return self._wrap(name, func)
+
+    def __setattr__(self, name, value):
+        setattr(self._storage, name, value)
@@ -0,0 +1,125 @@
+"""Transfer log written to FTPTransferLog in the background.
+
+The handler appends entries to an in-memory buffer on the IOLoop, and a
+thread inserts them with bulk_create at an interval.
+"""
+import logging
+import threading
+from collections import deque
+
+from django import db
+from django.utils import timezone
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ('drop', 'drop_oldest', 'block')
+
+
+class TransferLogWriter(object):
+    """Buffer of transfer log entries flushed by a background thread.
+
+    * interval: seconds between flushes
+    * max_entries: maximum number of entries kept in memory
+    * batch_size: number of rows per INSERT
+    * overflow: policy when the buffer is full,
+      'drop' (drop new entries), 'drop_oldest' or
+      'block' (wait for the flusher up to block_timeout seconds, then drop)
+    * block_timeout: seconds to wait with 'block' policy
+
+    The number of dropped entries is counted in `dropped`.
+    """
+
+    def __init__(self, interval=1.0, max_entries=10000, batch_size=500,
+                 overflow='drop', block_timeout=1.0):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError('Unknown overflow policy: {}'.format(overflow))
+        self.interval = interval
+        self.max_entries = max_entries
+        self.batch_size = batch_size
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.dropped = 0
+        self._entries = deque()
+        self._lock = threading.Lock()
+        self._not_full = threading.Condition(self._lock)
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def _drop(self, count=1):
+        self.dropped += count
+        if metrics.registry.enabled:
+            metrics.transfer_log_dropped.inc(count)
+
+    def append(self, account_id, command, path, bytes, duration, completed):
+        """add entry of a transfer, called on the IOLoop.
+        """
+        from .models import FTPTransferLog
+        entry = FTPTransferLog(
+            account_id=account_id, command=command, path=path, bytes=bytes,
+            duration=duration, created_at=timezone.now(),
+            result=FTPTransferLog.RESULT_COMPLETED if completed
+            else FTPTransferLog.RESULT_INCOMPLETE)
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                if self.overflow == 'drop_oldest':
+                    self._entries.popleft()
+                    self._drop()
+                elif self.overflow == 'block' and self._thread is not None:
+                    self._not_full.wait_for(
+                        lambda: len(self._entries) < self.max_entries,
+                        self.block_timeout)
+                if len(self._entries) >= self.max_entries:
+                    self._drop()
+                    return False
+            self._entries.append(entry)
+        return True
+
+    def __len__(self):
+        return len(self._entries)
+
+    def flush(self):
+        """insert buffered entries, return number of inserted entries.
+        """
+        from .models import FTPTransferLog
+        inserted = 0
+        while True:
+            with self._lock:
+                batch = [
+                    self._entries.popleft() for _ in range(
+                        min(self.batch_size, len(self._entries)))]
+                self._not_full.notify_all()
+            if not batch:
+                return inserted
+            try:
+                FTPTransferLog.objects.bulk_create(batch)
+            except db.Error:
+                logger.exception(
+                    'Failed to insert %d transfer log entries.', len(batch))
+                self._drop(len(batch))
+            else:
+                inserted += len(batch)
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            db.close_old_connections()
+            self.flush()
+        # final flush
+        self.flush()
+        db.connection.close()
+
+    def start(self):
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self.run, name='ftpserver-transfer-log', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """stop the flusher after the final flush.
+        """
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._thread.join(timeout)
+        self._thread = None
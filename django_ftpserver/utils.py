@@ -1,3 +1,5 @@
+import os
+
 from django.conf import settings
 
 
@@ -7,6 +9,19 @@ def get_settings_value(name):
     return getattr(settings, name, None)
 
 
+def setup_django(settings_module):
+    """set up Django in a new process, e.g. initializer of process pools.
+
+    Processes started by spawn (the default on Windows and macOS) don't
+    inherit the configured settings. This module doesn't import models,
+    so it can be imported before Django is set up.
+    """
+    import django
+    if settings_module:
+        os.environ['DJANGO_SETTINGS_MODULE'] = settings_module
+    django.setup()
+
+
 def parse_ports(ports_text):
     """Parse ports text
 
@@ -46,6 +61,12 @@ def make_server(
       * masquerade_address
       * certfile
       * keyfile
+      * sendfile
+      * max_connections_per_ip
+      * storage_tracer
+      * profiler
+      * transfer_log
+      * event_dispatcher
     """
     from . import compat
     if isinstance(handler_class, str):
@@ -62,6 +83,39 @@ def make_server(
     for key, value in handler_options.items():
         setattr(handler, key, value)
     handler.authorizer = authorizer
+    if handler_options.get('certfile') \
+            and hasattr(handler, 'get_ssl_context'):
+        # build the SSL context shared by all connections at startup,
+        # an ssl_context configured on the handler class is kept
+        handler.get_ssl_context()
     if filesystem_class is not None:
         handler.abstracted_fs = filesystem_class
     return server_class(host_port, handler)
+
+
+def read_records(path, format=None):
+    """Read records from CSV (with header line) or JSON lines file.
+
+    Yield (line number, dict) pairs.
+    format is 'csv' or 'jsonl', guessed from extension of path if None.
+    """
+    import csv
+    import json
+    if format is None:
+        format = 'jsonl' if path.endswith(('.jsonl', '.json')) else 'csv'
+    with open(path, newline='') as f:
+        if format == 'csv':
+            reader = csv.DictReader(f)
+            for record in reader:
+                yield reader.line_num, record
+        elif format == 'jsonl':
+            for line_num, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    raise ValueError("line {}: {}".format(line_num, e))
+                yield line_num, record
+        else:
+            raise ValueError("Unknown format: {}".format(format))
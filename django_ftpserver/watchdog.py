@@ -0,0 +1,96 @@
+"""Watchdog which detects blocking calls on the IOLoop.
+
+All sessions of the ftpserver command share one IOLoop, so a blocking
+call (database query, storage call, password hashing) stalls every session.
+"""
+import logging
+import sys
+import threading
+import time
+import traceback
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class LoopWatchdog(object):
+    """Report IOLoop iterations which take longer than `threshold` seconds.
+
+    A heartbeat scheduled on the IOLoop every `interval` seconds records
+    the loop lag, and a helper thread checks the heartbeat every
+    `interval` seconds. When the heartbeat is older than `threshold`,
+    the stack of the IOLoop thread is logged with the session and
+    the FTP command being processed (once per blocking call).
+    """
+    clock = staticmethod(time.monotonic)
+
+    def __init__(self, threshold=1.0, interval=None):
+        self.threshold = threshold
+        self.interval = interval or threshold / 4.0
+        self.last_beat = None
+        self.thread_id = None
+        self._reported = None
+        self._task = None
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def start(self, ioloop):
+        """schedule heartbeat on ioloop and start the helper thread.
+        """
+        self.beat()
+        self._task = ioloop.call_every(self.interval, self.beat)
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self.run, name='ftpserver-watchdog')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def beat(self):
+        """heartbeat, called on the IOLoop thread.
+        """
+        now = self.clock()
+        if self.last_beat is None:
+            self.thread_id = threading.get_ident()
+        elif metrics.registry.enabled:
+            metrics.ioloop_lag.observe(
+                max(0.0, now - self.last_beat - self.interval))
+        self.last_beat = now
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.check()
+
+    def check(self):
+        """log the stack of the IOLoop thread if it is blocked.
+
+        Return True if a blocking call was reported.
+        """
+        beat = self.last_beat
+        if beat is None or beat == self._reported:
+            return False
+        blocked = self.clock() - beat
+        if blocked < self.threshold:
+            return False
+        self._reported = beat
+        frame = sys._current_frames().get(self.thread_id)
+        stack = ''.join(traceback.format_stack(frame)) if frame else ''
+        context = metrics.command_context
+        session = context.session
+        if metrics.registry.enabled:
+            metrics.ioloop_blocked.inc()
+        logger.warning(
+            'IOLoop blocked for %.3f seconds (session: %s, command: %s)\n%s',
+            blocked,
+            getattr(session, 'session_label', session) or '-',
+            context.command or '-', stack)
+        return True
@@ -0,0 +1,84 @@
+import pytest
+
+
+@pytest.fixture
+def accounts(db):
+    from django.contrib.auth.models import User
+    from django_ftpserver import models
+    groups = [
+        models.FTPUserGroup.objects.create(name='group{}'.format(i))
+        for i in range(3)]
+    return [
+        models.FTPUserAccount.objects.create(
+            user=User.objects.create(username='user{}'.format(i)),
+            group=groups[i % 2])
+        for i in range(10)]
+
+
+URL = '/admin/django_ftpserver/ftpuseraccount/'
+
+
+class TestFTPUserAccountAdmin:
+    def _count_queries(self, client, url):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        assert response.status_code == 200
+        return len(queries.captured_queries)
+
+    def test_changelist_queries(self, admin_client, accounts):
+        from django.contrib.auth.models import User
+        from django_ftpserver import models
+        count = self._count_queries(admin_client, URL)
+        group = models.FTPUserGroup.objects.get(name='group2')
+        for i in range(10, 30):
+            models.FTPUserAccount.objects.create(
+                user=User.objects.create(username='user{}'.format(i)),
+                group=group)
+        assert self._count_queries(admin_client, URL) == count
+
+    def test_search(self, admin_client, accounts):
+        response = admin_client.get(URL, {'q': 'user1'})
+        assert [account.user.username for account in
+                response.context['cl'].result_list] == ['user1']
+        response = admin_client.get(URL, {'q': 'group1'})
+        assert len(response.context['cl'].result_list) == 5
+        response = admin_client.get(URL, {'q': 'USER1'})
+        assert [account.user.username for account in
+                response.context['cl'].result_list] == ['user1']
+
+    def test_move_to_group(self, admin_client, accounts):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from django_ftpserver import models
+        group = models.FTPUserGroup.objects.get(name='group2')
+        with CaptureQueriesContext(connection) as queries:
+            response = admin_client.post(URL, {
+                'action': 'move_to_group',
+                '_selected_action': [account.pk for account in accounts[:4]],
+                'group': group.pk,
+            })
+        assert response.status_code == 302
+        assert len([
+            query for query in queries.captured_queries
+            if query['sql'].startswith('UPDATE')
+            and 'ftpuseraccount' in query['sql']]) == 1
+        assert sorted(group.ftpuseraccount_set.values_list(
+            'pk', flat=True)) == [account.pk for account in accounts[:4]]
+
+    def test_move_to_group_without_group(self, admin_client, accounts):
+        from django_ftpserver import models
+        admin_client.post(URL, {
+            'action': 'move_to_group',
+            '_selected_action': [accounts[0].pk],
+            'group': '',
+        })
+        assert models.FTPUserAccount.objects.filter(
+            group__name='group2').count() == 0
+
+    def test_change_form(self, admin_client, accounts):
+        response = admin_client.get(
+            '{0}{1}/change/'.format(URL, accounts[0].pk))
+        assert response.status_code == 200
+        assert 'vForeignKeyRawIdAdminField' in response.content.decode()
@@ -63,6 +63,16 @@ class FTPAccountAuthorizerGetAccountTest(FTPAccountAuthorizerTestBase):
         target = authorizer.get_account('user1')
         self.assertEqual(target.user.username, 'user1')
 
+    def test_get_account_single_query(self):
+        authorizer = self._getOne()
+        with self.assertNumQueries(1):
+            target = authorizer.get_account('user1')
+            self.assertEqual(target.group.name, 'group1')
+
+    def test_get_account_not_exists(self):
+        authorizer = self._getOne()
+        self.assertIsNone(authorizer.get_account('user2'))
+
 
 class FTPAccountAuthorizerValidateAuthenticationTest(
         FTPAccountAuthorizerTestBase):
@@ -89,6 +99,67 @@ class FTPAccountAuthorizerValidateAuthenticationTest(
             authorizer.validate_authentication('user1', 'password1', None),
             None)
 
+    def test_validate_authentication_failed(self):
+        from pyftpdlib.authorizers import AuthenticationFailed
+        authorizer = self._getOne()
+        with self.assertRaises(AuthenticationFailed):
+            authorizer.validate_authentication('user1', 'invalid', None)
+
+    def test_validate_authentication_rate_limited(self):
+        from unittest import mock
+        from django.test import override_settings
+        from pyftpdlib.authorizers import AuthenticationFailed
+        with override_settings(FTPSERVER_LOGIN_RATE_LIMIT={'user_burst': 1}):
+            authorizer = self._getOne()
+        authorizer.validate_authentication('user1', 'password1', None)
+        with mock.patch('django_ftpserver.authorizers.authenticate') as m:
+            with self.assertRaises(AuthenticationFailed):
+                authorizer.validate_authentication(
+                    'user1', 'password1', None)
+        self.assertFalse(m.called)
+        self.assertEqual(authorizer.login_rate_limiter.rejected['user'], 1)
+
+
+class FTPAccountAuthorizerCaseInsensitiveLoginTest(
+        FTPAccountAuthorizerTestBase):
+    """Test for FTPAccountAuthorizer with FTPSERVER_CASE_INSENSITIVE_LOGIN
+    """
+
+    def setUp(self):
+        from django.test import override_settings
+        self.settings_override = override_settings(
+            FTPSERVER_CASE_INSENSITIVE_LOGIN=True)
+        self.settings_override.enable()
+        self.user = self._getUser(username='Alice')
+        self.user.set_password('password1')
+        self.user.save()
+        self.group = self._getGroup(name='group1')
+        self.group.save()
+        self.account = self._getAccount(user=self.user, group=self.group)
+        self.account.save()
+
+    def tearDown(self):
+        self.settings_override.disable()
+
+    def test_validate_authentication(self):
+        authorizer = self._getOne()
+        for username in ('alice', 'ALICE', 'Alice'):
+            authorizer.validate_authentication(username, 'password1', None)
+        self.assertEqual(list(authorizer._permission_rules), ['alice'])
+        with self.assertNumQueries(0):
+            self.assertTrue(authorizer.has_perm('ALICE', 'e', '/'))
+
+    def test_validate_authentication_rate_limited(self):
+        from django.test import override_settings
+        from pyftpdlib.authorizers import AuthenticationFailed
+        with override_settings(FTPSERVER_LOGIN_RATE_LIMIT={'user_burst': 1}):
+            authorizer = self._getOne()
+        with self.assertRaises(AuthenticationFailed):
+            authorizer.validate_authentication('alice', 'invalid', None)
+        with self.assertRaises(AuthenticationFailed):
+            authorizer.validate_authentication('ALICE', 'password1', None)
+        self.assertEqual(authorizer.login_rate_limiter.rejected['user'], 1)
+
 
 class FTPAccountAuthorizerGetHomeDirTest(FTPAccountAuthorizerTestBase):
     """Test for FTPAccountAuthorizer.get_home_dir
@@ -111,3 +182,53 @@ class FTPAccountAuthorizerGetHomeDirTest(FTPAccountAuthorizerTestBase):
     def test_get_home_dir(self):
         authorizer = self._getOne()
         self.assertEqual(authorizer.get_home_dir('user1'), '/tmp/user1/')
+
+
+class FTPAccountAuthorizerHasPermTest(FTPAccountAuthorizerTestBase):
+    """Test for FTPAccountAuthorizer.has_perm
+    """
+
+    def setUp(self):
+        from django_ftpserver import models
+        self.user = self._getUser(username='user1')
+        self.user.set_password('password1')
+        self.user.save()
+        self.group = self._getGroup(name='group1', home_dir='/tmp/{username}')
+        self.group.save()
+        self.account = self._getAccount(user=self.user, group=self.group)
+        self.account.save()
+        models.FTPPathPermission.objects.create(
+            group=self.group, path='/archive', permission='elr')
+
+    def test_has_perm(self):
+        authorizer = self._getOne()
+        authorizer.validate_authentication('user1', 'password1', None)
+        with self.assertNumQueries(0):
+            self.assertTrue(
+                authorizer.has_perm('user1', 'w', '/tmp/user1/incoming'))
+            self.assertFalse(
+                authorizer.has_perm('user1', 'w', '/tmp/user1/archive/a'))
+            self.assertEqual(authorizer.get_perms('user1'), 'elradfmw')
+
+    def test_has_perm_no_user(self):
+        authorizer = self._getOne()
+        self.assertFalse(authorizer.has_perm('user2', 'e', '/'))
+
+    def test_permission_rules_evicted(self):
+        from django_ftpserver.permissions import PermissionTrie
+        authorizer = self._getOne()
+        authorizer.max_permission_rules = 1
+        authorizer.validate_authentication('user1', 'password1', None)
+        self.assertIsNone(authorizer.get_permission_rules('user2'))
+        authorizer.cache_permission_rules('user2', PermissionTrie('elr'))
+        self.assertEqual(list(authorizer._permission_rules), ['user2'])
+        self.assertTrue(
+            authorizer.has_perm('user1', 'w', '/tmp/user1/incoming'))
+        self.assertEqual(list(authorizer._permission_rules), ['user1'])
+
+    def test_same_rules_as_account(self):
+        authorizer = self._getOne()
+        path = '/tmp/user1/archive/a'
+        self.assertEqual(
+            authorizer.has_perm('user1', 'w', path),
+            self.account.has_perm('w', path))
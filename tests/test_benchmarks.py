@@ -0,0 +1,40 @@
+import pytest
+
+
+@pytest.mark.django_db
+class TestHotPathBenchmarks:
+    def test_queries_not_regressed(self):
+        from benchmarks import bench_hotpaths
+        results = bench_hotpaths.run(number=1, repeat=1)
+        baseline = bench_hotpaths.load_baseline()
+        assert sorted(results) == sorted(baseline)
+        assert bench_hotpaths.compare(
+            results, baseline, check_time=False) == []
+
+    def test_compare(self):
+        from benchmarks import bench_hotpaths
+        baseline = {'op': {'seconds': 1.0, 'queries': 1}}
+        assert bench_hotpaths.compare(
+            {'op': {'seconds': 1.4, 'queries': 1}}, baseline) == []
+        assert bench_hotpaths.compare(
+            {'op': {'seconds': 2.0, 'queries': 2}}, baseline) == [
+            'op: 2 queries (baseline: 1)',
+            'op: 2000000.00 us (baseline: 1000000.00 us)']
+
+
+@pytest.mark.django_db
+class TestSessionBenchmarks:
+    def test_run(self):
+        from benchmarks import bench_sessions
+        results = bench_sessions.run(sessions=20)
+        assert sorted(results) == sorted(bench_sessions.load_baseline())
+        assert results['idle_session']['traced'] > 0
+
+    def test_compare(self):
+        from benchmarks import bench_sessions
+        baseline = {'idle_session': {'rss': 1000, 'traced': 1000}}
+        assert bench_sessions.compare(
+            {'idle_session': {'rss': None, 'traced': 1100}}, baseline) == []
+        assert bench_sessions.compare(
+            {'idle_session': {'rss': 2000, 'traced': 1100}}, baseline) == [
+            'idle_session: rss 2000 bytes (baseline: 1000 bytes)']
@@ -0,0 +1,150 @@
+import hashlib
+import zlib
+
+import pytest
+
+
+@pytest.fixture
+def storage():
+    from django_ftpserver.storages import InMemoryStorage, LatencyStorage
+    return LatencyStorage(InMemoryStorage())
+
+
+@pytest.fixture
+def fs(storage, settings):
+    from django_ftpserver.filesystems import StorageFS
+    settings.FTPSERVER_CHECKSUMS = ['crc32', 'md5', 'sha256']
+
+    class FS(StorageFS):
+        storage_class = staticmethod(lambda: storage)
+    return FS('/', None)
+
+
+def _write(fs, path, data, mode='wb'):
+    f = fs.open(path, mode)
+    f.write(data)
+    f.close()
+
+
+class TestGetAlgorithms:
+    def _callFUT(self, value):
+        from django_ftpserver.checksums import get_algorithms
+        return get_algorithms(value)
+
+    def test_values(self):
+        from django_ftpserver.checksums import ALGORITHMS
+        assert self._callFUT(None) == ()
+        assert self._callFUT(True) == ALGORITHMS
+        assert self._callFUT(['md5']) == ('md5',)
+        with pytest.raises(ValueError):
+            self._callFUT(['spam'])
+
+
+class TestCRC32:
+    def test_incremental(self):
+        from django_ftpserver.checksums import CRC32
+        crc = CRC32()
+        crc.update(b'spam')
+        crc.update(b'ham')
+        assert crc.hexdigest() == '{0:08x}'.format(zlib.crc32(b'spamham'))
+
+
+@pytest.mark.django_db
+class TestChecksumFile:
+    def test_upload(self, fs, storage):
+        from django_ftpserver import checksums, models
+        _write(fs, '/a.txt', b'spam')
+        record = models.FTPFileChecksum.objects.get(path='/a.txt')
+        assert record.size == 4
+        assert record.md5 == hashlib.md5(b'spam').hexdigest()
+        assert record.sha1 == ''
+        storage.calls.clear()
+        assert checksums.get_checksum(fs, '/a.txt', 'sha256') == \
+            hashlib.sha256(b'spam').hexdigest()
+        # answered without reading the file
+        assert 'open' not in storage.calls
+
+    def test_download(self, fs, storage):
+        from django_ftpserver import models
+        storage.storage._store('b.txt', b'ham' * 100000)
+        with fs.open('/b.txt', 'rb') as f:
+            while f.read(65536):
+                pass
+        record = models.FTPFileChecksum.objects.get(path='/b.txt')
+        assert record.md5 == hashlib.md5(b'ham' * 100000).hexdigest()
+
+    def test_partial_download(self, fs, storage):
+        from django_ftpserver import models
+        storage.storage._store('b.txt', b'ham')
+        with fs.open('/b.txt', 'rb') as f:
+            f.seek(1)
+            f.read()
+        assert not models.FTPFileChecksum.objects.exists()
+
+    def test_append_invalidates(self, fs):
+        from django_ftpserver import models
+        _write(fs, '/a.txt', b'spam')
+        _write(fs, '/a.txt', b'ham', mode='ab')
+        assert not models.FTPFileChecksum.objects.exists()
+
+    def test_remove(self, fs):
+        from django_ftpserver import models
+        _write(fs, '/a.txt', b'spam')
+        fs.remove('/a.txt')
+        assert not models.FTPFileChecksum.objects.exists()
+
+    def test_compute_when_missing(self, fs, storage):
+        from django_ftpserver import checksums, models
+        storage.storage._store('c.txt', b'eggs')
+        assert checksums.get_checksum(fs, '/c.txt', 'crc32') == \
+            '{0:08x}'.format(zlib.crc32(b'eggs'))
+        assert models.FTPFileChecksum.objects.get(path='/c.txt').md5 == \
+            hashlib.md5(b'eggs').hexdigest()
+
+    def test_stale_size(self, fs, storage):
+        from django_ftpserver import checksums
+        _write(fs, '/a.txt', b'spam')
+        # replaced without FTP
+        storage.storage._store('a.txt', b'spam and eggs')
+        assert checksums.get_checksum(fs, '/a.txt', 'md5') == \
+            hashlib.md5(b'spam and eggs').hexdigest()
+
+    def test_native_checksum(self, fs, storage):
+        from django_ftpserver import checksums
+        storage.storage._store('d.txt', b'eggs')
+        fs.get_native_checksum = lambda path, algorithm: 'etag'
+        assert checksums.get_checksum(fs, '/d.txt', 'md5') == 'etag'
+
+    def test_per_storage(self, fs, storage):
+        from django_ftpserver import checksums, models
+        from django_ftpserver.filesystems import StorageFS
+        from django_ftpserver.storages import InMemoryStorage
+        other_storage = InMemoryStorage({'a.txt': b'eggs'})
+
+        class FS(StorageFS):
+            storage_class = staticmethod(lambda: other_storage)
+        other = FS('/', None)
+        other.storage_alias = 'archive'
+        _write(fs, '/a.txt', b'spam')
+        # same path and size on another storage
+        assert checksums.get_checksum(other, '/a.txt', 'md5') == \
+            hashlib.md5(b'eggs').hexdigest()
+        assert checksums.get_checksum(fs, '/a.txt', 'md5') == \
+            hashlib.md5(b'spam').hexdigest()
+        other.rename('/a.txt', '/b.txt')
+        assert sorted(models.FTPFileChecksum.objects.values_list(
+            'storage', 'path')) == [('', '/a.txt'), ('archive', '/b.txt')]
+        assert models.FTPFileChecksum.objects.get(
+            storage='archive').path_hash == \
+            hashlib.sha256(b'/b.txt').hexdigest()
+        other.remove('/b.txt')
+        assert models.FTPFileChecksum.objects.count() == 1
+
+    def test_unique(self):
+        from django.db import IntegrityError, transaction
+        from django_ftpserver import models
+        models.FTPFileChecksum.objects.create(path='/a.txt', size=1)
+        with pytest.raises(IntegrityError), transaction.atomic():
+            models.FTPFileChecksum.objects.create(path='/a.txt', size=2)
+        models.FTPFileChecksum.objects.create(
+            storage='archive', path='/a.txt', size=2)
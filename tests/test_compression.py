@@ -0,0 +1,105 @@
+import io
+import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+
+class ChunkProducer(object):
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+        self.file = 'file'
+
+    def more(self):
+        return self.chunks.pop(0) if self.chunks else b''
+
+
+def _consume(producer):
+    chunks = []
+    while True:
+        chunk = producer.more()
+        if not chunk:
+            return chunks
+        chunks.append(chunk)
+
+
+class TestDeflateProducer:
+    def _getOne(self, *args, **kwargs):
+        from django_ftpserver.compression import DeflateProducer
+        return DeflateProducer(*args, **kwargs)
+
+    def test_compress(self):
+        data = [b'spam,ham,eggs\n' * 1000 for _ in range(10)]
+        producer = self._getOne(ChunkProducer(data), level=9)
+        assert producer.file == 'file'
+        compressed = b''.join(_consume(producer))
+        assert zlib.decompress(compressed) == b''.join(data)
+        assert len(compressed) < len(b''.join(data)) / 10
+
+    def test_empty(self):
+        producer = self._getOne(ChunkProducer([]))
+        assert zlib.decompress(b''.join(_consume(producer))) == b''
+
+    def test_executor(self):
+        data = [os.urandom(1000) for _ in range(20)]
+        with ThreadPoolExecutor(2) as executor:
+            producer = self._getOne(ChunkProducer(data), executor=executor)
+            compressed = b''.join(_consume(producer))
+        assert zlib.decompress(compressed) == b''.join(data)
+
+
+class TestInflateFile:
+    def _getOne(self, *args, **kwargs):
+        from django_ftpserver.compression import InflateFile
+        return InflateFile(*args, **kwargs)
+
+    def test_write(self):
+        from django_ftpserver.compression import compress
+        data = b'spam\r\n' * 10000
+        compressed = compress(data)
+        f = io.BytesIO()
+        f.close = lambda: None
+        inflate = self._getOne(f, chunk_size=1024)
+        written = []
+        f.write = lambda chunk: written.append(chunk)
+        for i in range(0, len(compressed), 100):
+            inflate.write(compressed[i:i + 100])
+        inflate.close()
+        assert b''.join(written) == data
+        assert max(len(chunk) for chunk in written) <= 1024
+
+    def test_data_wrapper(self):
+        from django_ftpserver.compression import compress
+        f = io.BytesIO()
+        inflate = self._getOne(
+            f, lambda data: data.replace(b'\r\n', b'\n'))
+        inflate.write(compress(b'spam\r\nham\r\n'))
+        assert f.getvalue() == b'spam\nham\n'
+        inflate.close()
+        assert f.closed
+
+    def test_invalid_data(self):
+        inflate = self._getOne(io.BytesIO())
+        with pytest.raises(OSError):
+            inflate.write(b'spam' * 10)
+
+
+def test_get_executor():
+    from django_ftpserver import compression
+    assert compression.get_executor(0) is None
+    assert compression.get_executor(None) is None
+    executor = compression.get_executor(2)
+    assert compression.get_executor(2) is executor
+
+
+def test_get_executor_py35(monkeypatch):
+    import sys
+    from unittest import mock
+    from django_ftpserver import compression
+    monkeypatch.setattr(compression, '_executor', None)
+    monkeypatch.setattr(sys, 'version_info', (3, 5, 0))
+    # thread_name_prefix needs Python 3.6
+    monkeypatch.setattr(compression, 'ThreadPoolExecutor', mock.Mock())
+    compression.get_executor(2)
+    compression.ThreadPoolExecutor.assert_called_once_with(max_workers=2)
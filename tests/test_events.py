@@ -0,0 +1,105 @@
+import threading
+
+import pytest
+
+
+def record_handler(events):
+    record_handler.calls.append([event.path for event in events])
+
+
+record_handler.calls = []
+
+
+class TestLocalDispatcher:
+    def _getOne(self, *args, **kwargs):
+        from django_ftpserver.events import LocalDispatcher
+        return LocalDispatcher(*args, **kwargs)
+
+    def test_dispatch(self):
+        record_handler.calls = []
+        dispatcher = self._getOne({
+            'file_received': ['tests.test_events.record_handler']})
+        dispatcher.dispatch('file_received', username='user1', path='/a')
+        dispatcher.dispatch('file_sent', username='user1', path='/b')
+        assert record_handler.calls == [['/a']]
+        assert [event.name for event in dispatcher.events] == [
+            'file_received', 'file_sent']
+        assert dispatcher.events[0].as_dict()['username'] == 'user1'
+
+    def test_unknown_event(self):
+        with pytest.raises(ValueError):
+            self._getOne({'spam': [record_handler]})
+
+
+class TestEventDispatcher:
+    def _getOne(self, **kwargs):
+        from django_ftpserver.events import EventDispatcher
+        return EventDispatcher(**kwargs)
+
+    def test_workers(self):
+        received = []
+        lock = threading.Lock()
+
+        def handler(events):
+            with lock:
+                received.extend(event.path for event in events)
+        dispatcher = self._getOne(
+            handlers={'file_received': [handler]}, workers=3)
+        dispatcher.start()
+        for i in range(20):
+            assert dispatcher.dispatch('file_received', path=str(i))
+        dispatcher.stop(timeout=10)
+        assert sorted(received, key=int) == [str(i) for i in range(20)]
+
+    def test_batch(self):
+        batches = []
+        dispatcher = self._getOne(
+            handlers={'file_deleted': [batches.append]}, batch_size=3)
+        for i in range(5):
+            dispatcher.dispatch('file_deleted', path=str(i))
+        dispatcher.start()
+        dispatcher.stop(timeout=10)
+        assert [len(batch) for batch in batches] == [3, 2]
+
+    def test_retry(self):
+        calls = []
+
+        def handler(events):
+            calls.append(len(events))
+            if len(calls) < 3:
+                raise RuntimeError('spam')
+        dispatcher = self._getOne(retries=2, backoff=0.01)
+        assert dispatcher.call(handler, [None])
+        assert calls == [1, 1, 1]
+        assert dispatcher.failed == 0
+        assert not dispatcher.call(lambda events: 1 / 0, [None])
+        assert dispatcher.failed == 1
+
+    def test_overflow(self):
+        dispatcher = self._getOne(
+            handlers={'login': [lambda events: None]}, max_queue=2)
+        assert dispatcher.dispatch('login', username='a')
+        assert dispatcher.dispatch('login', username='b')
+        assert not dispatcher.dispatch('login', username='c')
+        assert dispatcher.dropped == 1
+        dispatcher.overflow = 'drop_oldest'
+        assert dispatcher.dispatch('login', username='d')
+        assert [event.username for event in dispatcher._queue] == ['b', 'd']
+        assert dispatcher.dropped == 2
+
+    def test_without_handlers(self):
+        dispatcher = self._getOne(max_queue=0)
+        assert dispatcher.dispatch('login', username='a')
+        assert len(dispatcher) == 0
+
+
+def test_make_dispatcher():
+    from django_ftpserver import events
+    dispatcher = events.make_dispatcher({'workers': 4, 'batch_size': 10})
+    assert isinstance(dispatcher, events.EventDispatcher)
+    assert (dispatcher.workers, dispatcher.batch_size) == (4, 10)
+    assert isinstance(
+        events.make_dispatcher({'dispatcher': 'local'}),
+        events.LocalDispatcher)
+    with pytest.raises(ValueError):
+        events.make_dispatcher({'dispatcher': 'spam'})
@@ -0,0 +1,679 @@
+import socket
+
+from django.test import TestCase
+
+
+def _socketpair():
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(1)
+    client = socket.create_connection(listener.getsockname())
+    server, _ = listener.accept()
+    listener.close()
+    return server, client
+
+
+class DummyServer(object):
+    def __init__(self):
+        self.ip_map = []
+
+
+class FTPAccountHandlerTestBase(TestCase):
+    def setUp(self):
+        from pyftpdlib.ioloop import IOLoop
+        from django_ftpserver.limits import ConnectionCounter
+        self.ioloop = IOLoop()
+        self.counter = ConnectionCounter()
+        self.sockets = []
+
+    def tearDown(self):
+        self.ioloop.close()
+        for sock in self.sockets:
+            sock.close()
+
+    def _getHandler(self, handler_class=None):
+        from django_ftpserver import authorizers, handlers
+        handler_class = handler_class or handlers.FTPAccountHandler
+        server_sock, client_sock = _socketpair()
+        self.sockets.append(client_sock)
+        handler = handler_class(server_sock, DummyServer(), ioloop=self.ioloop)
+        handler.authorizer = authorizers.FTPAccountAuthorizer()
+        handler.connection_counter = self.counter
+        return handler
+
+    def _getDTPHandler(self, cmd_channel):
+        server_sock, client_sock = _socketpair()
+        self.sockets.append(client_sock)
+        return cmd_channel.dtp_handler(server_sock, cmd_channel)
+
+    def _getGroup(self, **kwargs):
+        from django_ftpserver import models
+        return models.FTPUserGroup.objects.create(name='group1', **kwargs)
+
+    def _getAccount(self, username='user1', group=None, **kwargs):
+        from django.contrib.auth import models as auth_models
+        from django_ftpserver import models
+        user = auth_models.User.objects.create(username=username)
+        group = group or self._getGroup(read_limit=1000, write_limit=2000)
+        return models.FTPUserAccount.objects.create(
+            user=user, group=group, **kwargs)
+
+    def _login(self, handler, username='user1'):
+        handler.username = username
+        handler.handle_auth_success('/', 'password', 'welcome.')
+
+
+class FTPAccountHandlerBandwidthTest(FTPAccountHandlerTestBase):
+    """Test for bandwidth limits of FTPAccountHandler
+    """
+
+    def test_auth_success_sets_limits(self):
+        self._getAccount(write_limit=4000)
+        handler = self._getHandler()
+        self._login(handler)
+        self.assertEqual(handler.bandwidth_limits, (1000, 4000))
+        handler.flush_account()
+        self.assertEqual(handler.bandwidth_limits, (0, 0))
+        handler.close()
+
+    def test_dtp_handler_uses_limits(self):
+        handler = self._getHandler()
+        handler.bandwidth_limits = (1024, 2048)
+        dtp = self._getDTPHandler(handler)
+        self.assertEqual(dtp.read_limit, 1024)
+        self.assertEqual(dtp.write_limit, 2048)
+        self.assertFalse(dtp.use_sendfile())
+        dtp.close()
+        handler.close()
+
+    def test_dtp_handler_unlimited(self):
+        handler = self._getHandler()
+        dtp = self._getDTPHandler(handler)
+        self.assertEqual(dtp.read_limit, 0)
+        self.assertEqual(dtp.write_limit, 0)
+        dtp.close()
+        handler.close()
+
+
+class FTPAccountHandlerConnectionLimitTest(FTPAccountHandlerTestBase):
+    """Test for connection limits of FTPAccountHandler
+    """
+
+    def test_max_connections_per_ip(self):
+        first = self._getHandler()
+        first.max_connections_per_ip = 1
+        first.handle()
+        self.assertTrue(first.connected)
+        second = self._getHandler()
+        second.max_connections_per_ip = 1
+        second.handle()
+        self.assertEqual(self.counter.count(('ip', '127.0.0.1')), 1)
+        first.close()
+        second.close()
+        self.assertEqual(self.counter.count(('ip', '127.0.0.1')), 0)
+
+    def test_max_connections_per_user(self):
+        account = self._getAccount(max_connections=1)
+        first = self._getHandler()
+        self._login(first)
+        self.assertTrue(first.authenticated)
+        second = self._getHandler()
+        self._login(second)
+        self.assertFalse(second.authenticated)
+        first.close()
+        second.close()
+        self.assertEqual(self.counter.count(('user', account.pk)), 0)
+
+    def test_max_connections_per_group(self):
+        group = self._getGroup(max_connections=1)
+        self._getAccount('user1', group=group)
+        self._getAccount('user2', group=group)
+        first = self._getHandler()
+        self._login(first, 'user1')
+        self.assertTrue(first.authenticated)
+        second = self._getHandler()
+        self._login(second, 'user2')
+        self.assertFalse(second.authenticated)
+        first.close()
+        second.close()
+
+    def test_flush_account_releases_connections(self):
+        account = self._getAccount(max_connections=1)
+        handler = self._getHandler()
+        self._login(handler)
+        self.assertEqual(self.counter.count(('user', account.pk)), 1)
+        handler.flush_account()
+        self.assertEqual(self.counter.count(('user', account.pk)), 0)
+        handler.close()
+
+
+def _getTLSHandlerClass():
+    """return TLS handler class of handlers.TLSAccountHandlerMixin with
+    a base which calls FTPHandler directly, as TLS_FTPHandler does.
+    """
+    from pyftpdlib.handlers import FTPHandler
+    from django_ftpserver import handlers
+
+    class DummyTLSHandler(FTPHandler):
+        tls_commands = []
+
+        def process_command(self, cmd, *args, **kwargs):
+            self.tls_commands.append(cmd)
+            FTPHandler.process_command(self, cmd, *args, **kwargs)
+
+        def flush_account(self):
+            FTPHandler.flush_account(self)
+            self._prot = False
+
+        def close(self):
+            FTPHandler.close(self)
+
+    class TLSHandler(
+            handlers.TLSAccountHandlerMixin, DummyTLSHandler,
+            handlers.FTPAccountHandler):
+        pass
+    return TLSHandler
+
+
+class TLSAccountHandlerTest(FTPAccountHandlerTestBase):
+    """Test for TLS versions of FTPAccountHandler
+    """
+
+    def test_close_releases_connections(self):
+        account = self._getAccount()
+        handler = self._getHandler(_getTLSHandlerClass())
+        handler.handle()
+        self._login(handler)
+        self.assertEqual(self.counter.count(('ip', '127.0.0.1')), 1)
+        self.assertEqual(self.counter.count(('user', account.pk)), 1)
+        handler.close()
+        self.assertEqual(self.counter.count(('ip', '127.0.0.1')), 0)
+        self.assertEqual(self.counter.count(('user', account.pk)), 0)
+        self.assertEqual(self.counter.count(('group', account.group_id)), 0)
+
+    def test_flush_account_releases_connections(self):
+        account = self._getAccount(max_connections=1)
+        handler = self._getHandler(_getTLSHandlerClass())
+        self._login(handler)
+        handler._prot = True
+        handler.flush_account()
+        self.assertFalse(handler._prot)
+        self.assertIsNone(handler.account)
+        self.assertEqual(self.counter.count(('user', account.pk)), 0)
+        handler.close()
+
+    def test_tls_handler_class(self):
+        from django_ftpserver import handlers
+        if handlers.TLS_FTPHandler is None:
+            self.skipTest('pyOpenSSL is not installed')
+        handler_class = handlers.TLS_FTPAccountHandler
+        mro = handler_class.__mro__
+        self.assertLess(
+            mro.index(handlers.TLSAccountHandlerMixin),
+            mro.index(handlers.TLS_FTPHandler))
+        self.assertLess(
+            mro.index(handlers.TLS_FTPHandler),
+            mro.index(handlers.FTPAccountHandler))
+        for name in ('process_command', 'flush_account', 'close'):
+            self.assertIs(
+                getattr(handler_class, name),
+                getattr(handlers.TLSAccountHandlerMixin, name))
+
+
+class FTPAccountHandlerMetricsTest(FTPAccountHandlerTestBase):
+    """Test for metrics of FTPAccountHandler
+    """
+
+    def setUp(self):
+        from django_ftpserver import metrics
+        super(FTPAccountHandlerMetricsTest, self).setUp()
+        metrics.registry.clear()
+        metrics.registry.enabled = True
+
+    def tearDown(self):
+        from django_ftpserver import metrics
+        metrics.registry.enabled = False
+        metrics.registry.clear()
+        super(FTPAccountHandlerMetricsTest, self).tearDown()
+
+    def test_command_and_sessions(self):
+        from django_ftpserver import metrics
+        handler = self._getHandler()
+        handler.handle()
+        self.assertEqual(metrics.active_sessions.get(), 1)
+        handler.process_command('NOOP', '')
+        self.assertEqual(metrics.command_duration.get(command='NOOP')[0], 1)
+        handler.close()
+        self.assertEqual(metrics.active_sessions.get(), 0)
+
+    def test_tls_command_and_sessions(self):
+        from django_ftpserver import metrics
+        handler = self._getHandler(_getTLSHandlerClass())
+        handler.handle()
+        self.assertEqual(metrics.active_sessions.get(), 1)
+        handler.process_command('NOOP', '')
+        self.assertEqual(handler.tls_commands, ['NOOP'])
+        self.assertEqual(metrics.command_duration.get(command='NOOP')[0], 1)
+        handler.close()
+        self.assertEqual(metrics.active_sessions.get(), 0)
+
+    def test_log_transfer(self):
+        from django_ftpserver import metrics
+        handler = self._getHandler()
+        handler.log_transfer('RETR', '/file', False, True, 2.0, 1000)
+        self.assertEqual(metrics.transfer_bytes.get(direction='sent'), 1000)
+        self.assertEqual(
+            metrics.transfers.get(direction='sent', result='completed'), 1)
+        self.assertEqual(
+            metrics.transfer_throughput.get(direction='sent'), (1, 500.0))
+        handler.close()
+
+
+class FTPAccountHandlerTracingTest(FTPAccountHandlerTestBase):
+    """Test for storage tracing of FTPAccountHandler
+    """
+
+    def test_trace_command(self):
+        from django_ftpserver.tracing import StorageTracer
+        tracer = StorageTracer()
+        traces = []
+        tracer.emit = traces.append
+        handler = self._getHandler()
+        handler.storage_tracer = tracer
+
+        def ftp_NOOP(line):
+            tracer.record('exists', 'spam', 0.5)
+            handler.respond('200 I successfully done nothin\'.')
+        handler.ftp_NOOP = ftp_NOOP
+        handler.process_command('NOOP', '')
+        self.assertIsNone(tracer.current)
+        self.assertEqual(len(traces), 1)
+        self.assertEqual(traces[0].command, 'NOOP')
+        self.assertEqual(traces[0].duration, 0.5)
+        handler.close()
+
+
+class FTPAccountHandlerChecksumTest(FTPAccountHandlerTestBase):
+    """Test for checksum commands of FTPAccountHandler
+    """
+
+    def setUp(self):
+        super(FTPAccountHandlerChecksumTest, self).setUp()
+        from django.test import override_settings
+        self.settings = override_settings(
+            FTPSERVER_CHECKSUMS=['md5', 'sha256'])
+        self.settings.enable()
+
+    def tearDown(self):
+        self.settings.disable()
+        super(FTPAccountHandlerChecksumTest, self).tearDown()
+
+    def _getHandlerWithFS(self):
+        from django_ftpserver.filesystems import StorageFS
+        from django_ftpserver.storages import InMemoryStorage
+        storage = InMemoryStorage({'a.txt': b'spam'})
+
+        class FS(StorageFS):
+            storage_class = staticmethod(lambda: storage)
+        handler = self._getHandler()
+        handler.fs = FS('/', handler)
+        handler.responses = []
+        handler.respond = handler.responses.append
+        return handler
+
+    def test_feat(self):
+        handler = self._getHandler()
+        handler.handle()
+        self.assertIn('HASH MD5;SHA-256*', handler._extra_feats)
+        self.assertIn('XMD5', handler._extra_feats)
+        self.assertNotIn('XCRC', handler._extra_feats)
+        handler.close()
+
+    def test_xmd5(self):
+        import hashlib
+        handler = self._getHandlerWithFS()
+        handler.ftp_XMD5('/a.txt')
+        handler.ftp_XCRC('/a.txt')
+        handler.ftp_XMD5('/missing.txt')
+        self.assertEqual(handler.responses, [
+            '250 ' + hashlib.md5(b'spam').hexdigest().upper(),
+            '504 Checksum algorithm is not enabled.',
+            '550 /missing.txt is not retrievable.'])
+        handler.close()
+
+    def test_hash(self):
+        import hashlib
+        handler = self._getHandlerWithFS()
+        handler.ftp_HASH('/a.txt')
+        handler.ftp_OPTS('HASH MD5')
+        handler.ftp_OPTS('HASH')
+        handler.ftp_HASH('/a.txt')
+        handler.ftp_OPTS('HASH CRC32')
+        self.assertEqual(handler.responses, [
+            '213 SHA-256 0-4 {0} /a.txt'.format(
+                hashlib.sha256(b'spam').hexdigest()),
+            '200 MD5',
+            '200 MD5',
+            '213 MD5 0-4 {0} /a.txt'.format(hashlib.md5(b'spam').hexdigest()),
+            '501 Unknown algorithm.'])
+        handler.close()
+
+
+class FTPAccountHandlerListingTest(FTPAccountHandlerTestBase):
+    """Test for listings streamed by FTPAccountHandler
+    """
+
+    def _getHandlerWithFS(self, storage):
+        from django_ftpserver.filesystems import StorageFS
+
+        class FS(StorageFS):
+            storage_class = staticmethod(lambda: storage)
+
+            def isdir(self, path):
+                # directories of object stores are prefixes
+                return path.endswith('/')
+        handler = self._getHandler()
+        handler.fs = FS('/', handler)
+        handler.responses = []
+        handler.respond = handler.responses.append
+        return handler
+
+    def _getStorage(self, count=5, page_size=2):
+        from django_ftpserver.storages import InMemoryStorage, LatencyStorage
+        return LatencyStorage(
+            InMemoryStorage(dict(
+                ('dir/{0}.txt'.format(i), b'spam') for i in range(count))),
+            object_store=True, page_size=page_size)
+
+    def _read(self, producer):
+        chunks = []
+        while True:
+            chunk = producer.more()
+            if not chunk:
+                return b''.join(chunks)
+            chunks.append(chunk)
+
+    def test_nlst(self):
+        storage = self._getStorage()
+        handler = self._getHandlerWithFS(storage)
+        self.assertEqual(handler.ftp_NLST('dir/'), 'dir/')
+        producer, isproducer, file, cmd = handler._out_dtp_queue
+        self.assertTrue(isproducer)
+        self.assertEqual(cmd, 'NLST')
+        # the first page is fetched before the transfer
+        self.assertEqual(storage.calls['listdir'], 1)
+        self.assertEqual(self._read(producer), b''.join(
+            '{0}.txt\r\n'.format(i).encode() for i in range(5)))
+        self.assertEqual(storage.calls['listdir'], 3)
+        handler.close()
+
+    def test_list(self):
+        handler = self._getHandlerWithFS(self._getStorage(count=3))
+        self.assertEqual(handler.ftp_LIST('dir/'), 'dir/')
+        producer, isproducer, file, cmd = handler._out_dtp_queue
+        lines = self._read(producer).decode().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[0].startswith('-rwxrwx---'))
+        self.assertTrue(lines[0].endswith(' 0.txt'))
+        handler.close()
+
+    def test_mlsd(self):
+        self._getAccount()
+        handler = self._getHandlerWithFS(self._getStorage(count=3))
+        fs = handler.fs
+        self._login(handler)
+        handler.fs = fs
+        self.assertEqual(handler.ftp_MLSD('dir/'), 'dir/')
+        producer, isproducer, file, cmd = handler._out_dtp_queue
+        lines = self._read(producer).decode().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertIn('size=4;', lines[0])
+        self.assertTrue(lines[0].endswith(' 0.txt'))
+        handler.close()
+
+    def test_list_traced(self):
+        from django_ftpserver.tracing import StorageTracer
+        tracer = StorageTracer()
+        traces = []
+        tracer.emit = traces.append
+        self._getAccount()
+        handler = self._getHandlerWithFS(self._getStorage(count=3))
+        fs = handler.fs
+        self._login(handler)
+        handler.fs = fs
+        handler.storage_tracer = tracer
+        fs.storage = fs.wrap_storage(fs.storage)
+        handler.process_command('LIST', 'dir/')
+        self.assertTrue(handler.responses[-1].startswith('150 '))
+        # the listing is formatted during the transfer
+        self.assertEqual(traces, [])
+        producer, isproducer, file, cmd = handler._out_dtp_queue
+        self.assertEqual(len(self._read(producer).splitlines()), 3)
+        handler._on_dtp_close()
+        self.assertEqual(len(traces), 1)
+        self.assertEqual(traces[0].command, 'LIST')
+        self.assertIn('listdir_pages', traces[0].methods)
+        self.assertEqual(traces[0].methods['size'][0], 3)
+        handler.close()
+
+    def test_error(self):
+        import errno
+        storage = self._getStorage()
+
+        def listdir_pages(path):
+            raise PermissionError(errno.EACCES, 'denied')
+            yield
+        storage.listdir_pages = listdir_pages
+        handler = self._getHandlerWithFS(storage)
+        self.assertIsNone(handler.ftp_NLST('dir/'))
+        self.assertEqual(handler.responses, ['550 Permission denied.'])
+        self.assertIsNone(handler._out_dtp_queue)
+        handler.close()
+
+
+class FTPAccountHandlerStorageTest(FTPAccountHandlerTestBase):
+    """Test for storages of groups and accounts
+    """
+
+    def _getHandler(self):
+        from django_ftpserver.filesystems import StorageFS
+        from django_ftpserver.storages import InMemoryStorage
+        handler = super(FTPAccountHandlerStorageTest, self)._getHandler()
+
+        class FS(StorageFS):
+            storage_class = InMemoryStorage
+        handler.abstracted_fs = FS
+        return handler
+
+    def test_storage_alias(self):
+        from django_ftpserver import models, storages
+        group = self._getGroup(storage='memory')
+        self._getAccount('user1', group=group)
+        self._getAccount('user2', group=group)
+        self._getAccount('user3', group=models.FTPUserGroup.objects.create(
+            name='group2'))
+        with self.settings(FTPSERVER_STORAGES={'memory': {
+                'BACKEND': 'django_ftpserver.storages.InMemoryStorage'}}):
+            handlers = []
+            for username in ('user1', 'user2', 'user3'):
+                handler = self._getHandler()
+                self._login(handler, username)
+                handlers.append(handler)
+            storage = storages.get_storage('memory')
+            self.assertEqual(handlers[0].fs.storage_alias, 'memory')
+            self.assertIs(handlers[0].fs.storage, storage)
+            self.assertIs(handlers[1].fs.storage, storage)
+            self.assertEqual(handlers[2].fs.storage_alias, '')
+            self.assertIsNot(handlers[2].fs.storage, storage)
+            for handler in handlers:
+                handler.close()
+
+    def test_storage_alias_removed(self):
+        group = self._getGroup(storage='removed', max_connections=1)
+        self._getAccount('user1', group=group)
+        with self.settings(FTPSERVER_STORAGES={}):
+            handler = self._getHandler()
+            handler.responses = []
+            handler.respond = \
+                lambda resp, **kwargs: handler.responses.append(resp)
+            with self.assertLogs('django_ftpserver.handlers', 'ERROR'):
+                self._login(handler)
+            self.assertEqual(
+                handler.responses,
+                ['421 Storage of the account is not available.'])
+            self.assertFalse(handler.authenticated)
+            self.assertIsNone(handler.account)
+            self.assertEqual(handler._account_connection_keys, ())
+            handler.close()
+
+    def test_storage_options_invalid(self):
+        group = self._getGroup(storage='memory')
+        self._getAccount('user1', group=group)
+        with self.settings(FTPSERVER_STORAGES={'memory': {
+                'BACKEND': 'django_ftpserver.storages.InMemoryStorage',
+                'OPTIONS': {'spam': 1}}}):
+            handler = self._getHandler()
+            handler.responses = []
+            handler.respond = \
+                lambda resp, **kwargs: handler.responses.append(resp)
+            with self.assertLogs('django_ftpserver.handlers', 'ERROR'):
+                self._login(handler)
+            self.assertFalse(any(
+                resp.startswith('230') for resp in handler.responses))
+            self.assertEqual(
+                handler.responses[-1],
+                '421 Storage of the account is not available.')
+            handler.close()
+
+
+class FTPAccountHandlerModeZTest(FTPAccountHandlerTestBase):
+    """Test for MODE Z of FTPAccountHandler
+    """
+
+    def test_mode(self):
+        handler = self._getHandler()
+        handler.responses = []
+        handler.respond = handler.responses.append
+        handler.handle()
+        self.assertIn('MODE Z', handler._extra_feats)
+        handler.ftp_MODE('z')
+        self.assertEqual(handler.transfer_mode, 'Z')
+        handler.ftp_MODE('B')
+        handler.ftp_MODE('S')
+        self.assertEqual(handler.transfer_mode, 'S')
+        self.assertEqual(handler.responses[1:], [
+            '200 Transfer mode set to: Z',
+            '504 Unimplemented MODE type.',
+            '200 Transfer mode set to: S'])
+        handler.close()
+
+    def test_compression_level(self):
+        self._getAccount(group=self._getGroup(compression_level=9))
+        handler = self._getHandler()
+        self._login(handler)
+        self.assertEqual(handler.compression_level, 9)
+        handler.transfer_mode = 'Z'
+        handler.flush_account()
+        self.assertEqual(handler.compression_level, 6)
+        self.assertEqual(handler.transfer_mode, 'S')
+        handler.close()
+
+    def test_push_dtp_data(self):
+        import zlib
+        from django_ftpserver.compression import DeflateProducer
+        handler = self._getHandler()
+        handler.respond = lambda line: None
+        handler.transfer_mode = 'Z'
+        handler.push_dtp_data(b'spam\r\n', cmd='NLST')
+        data, isproducer, file, cmd = handler._out_dtp_queue
+        self.assertEqual(zlib.decompress(data), b'spam\r\n')
+        handler.push_dtp_data(object(), isproducer=True, cmd='RETR')
+        self.assertIsInstance(handler._out_dtp_queue[0], DeflateProducer)
+        handler.close()
+
+    def test_dtp_handler(self):
+        import io
+        from django_ftpserver.compression import InflateFile, compress
+        handler = self._getHandler()
+        handler.transfer_mode = 'Z'
+        dtp = self._getDTPHandler(handler)
+        self.assertFalse(dtp.use_sendfile())
+        f = io.BytesIO()
+        dtp.file_obj = f
+        dtp.enable_receiving('i', 'STOR')
+        self.assertIsInstance(dtp.file_obj, InflateFile)
+        dtp.file_obj.write(compress(b'spam'))
+        self.assertEqual(f.getvalue(), b'spam')
+        dtp.file_obj = None
+        dtp.close()
+        handler.close()
+
+
+class FTPAccountHandlerQuotaTest(FTPAccountHandlerTestBase):
+    """Test for quotas of FTPAccountHandler
+    """
+
+    def test_allo(self):
+        from django_ftpserver import quotas
+        from django_ftpserver.filesystems import StorageFS
+        from django_ftpserver.storages import InMemoryStorage
+
+        class FS(StorageFS):
+            storage_class = InMemoryStorage
+        account = self._getAccount(quota=100)
+        handler = self._getHandler()
+        handler.abstracted_fs = FS
+        self._login(handler)
+        handler.responses = []
+        handler.respond = handler.responses.append
+        quotas.add_usage(account.pk, 60)
+        handler.ftp_ALLO('40')
+        handler.ftp_ALLO('41')
+        handler.ftp_ALLO('spam')
+        self.assertEqual(handler.responses, [
+            '200 Storage is available.',
+            '552 Disk quota exceeded.',
+            '501 Invalid parameter.'])
+        handler.close()
+
+
+class FTPAccountHandlerTransferLogTest(FTPAccountHandlerTestBase):
+    """Test for transfer log of FTPAccountHandler
+    """
+
+    def test_log_transfer(self):
+        from django_ftpserver.transferlog import TransferLogWriter
+        account = self._getAccount()
+        handler = self._getHandler()
+        handler.transfer_log = TransferLogWriter()
+        self._login(handler)
+        handler.log_transfer('RETR', '/a.txt', False, True, 0.5, 100)
+        entry, = handler.transfer_log._entries
+        self.assertEqual(
+            (entry.account_id, entry.command, entry.path, entry.bytes,
+             entry.result),
+            (account.pk, 'RETR', '/a.txt', 100, 'completed'))
+        handler.close()
+
+
+class FTPAccountHandlerEventTest(FTPAccountHandlerTestBase):
+    """Test for session events of FTPAccountHandler
+    """
+
+    def test_events(self):
+        from django_ftpserver.events import EVENTS, LocalDispatcher
+        account = self._getAccount()
+        handler = self._getHandler()
+        dispatcher = LocalDispatcher(
+            dict((name, [lambda events: None]) for name in EVENTS))
+        handler.event_dispatcher = dispatcher
+        self._login(handler)
+        handler.on_file_received('/a.txt')
+        handler.on_file_sent('/b.txt')
+        self.assertEqual(
+            [(event.name, event.path, event.account_id)
+             for event in dispatcher.events],
+            [('login', None, account.pk),
+             ('file_received', '/a.txt', account.pk),
+             ('file_sent', '/b.txt', account.pk)])
+        handler.close()
@@ -0,0 +1,29 @@
+class TestConnectionCounter:
+    def _getOne(self):
+        from django_ftpserver.limits import ConnectionCounter
+        return ConnectionCounter()
+
+    def test_acquire_unlimited(self):
+        counter = self._getOne()
+        for _ in range(5):
+            assert counter.acquire('key')
+        assert counter.count('key') == 5
+
+    def test_acquire_limit(self):
+        counter = self._getOne()
+        assert counter.acquire('key', 2)
+        assert counter.acquire('key', 2)
+        assert not counter.acquire('key', 2)
+        assert counter.count('key') == 2
+
+    def test_release(self):
+        counter = self._getOne()
+        counter.acquire('key', 1)
+        counter.release('key')
+        assert counter.count('key') == 0
+        assert counter.acquire('key', 1)
+
+    def test_release_unknown_key(self):
+        counter = self._getOne()
+        counter.release('key')
+        assert counter.count('key') == 0
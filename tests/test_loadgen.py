@@ -0,0 +1,137 @@
+import json
+import threading
+import time
+from io import StringIO
+
+import pytest
+
+
+@pytest.fixture
+def ftp_server(tmp_path):
+    from pyftpdlib.authorizers import DummyAuthorizer
+    from pyftpdlib.handlers import FTPHandler
+    from pyftpdlib.ioloop import IOLoop
+    from pyftpdlib.servers import FTPServer
+
+    authorizer = DummyAuthorizer()
+    authorizer.add_user('user1', 'password', str(tmp_path), perm='elradfmw')
+    handler = type('BenchHandler', (FTPHandler,), {'authorizer': authorizer})
+    server = FTPServer(('127.0.0.1', 0), handler, ioloop=IOLoop())
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={'timeout': 0.05})
+    thread.start()
+    yield server
+    server.ioloop.call_later(0, server.close_all)
+    thread.join()
+
+
+class TestParseMix:
+    def _callFUT(self, text):
+        from django_ftpserver.loadgen import parse_mix
+        return parse_mix(text)
+
+    def test_parse(self):
+        assert self._callFUT('list=4, RETR=1,idle') == {
+            'list': 4, 'retr': 1, 'idle': 1}
+
+    def test_unknown(self):
+        with pytest.raises(ValueError):
+            self._callFUT('list=1,spam=1')
+
+    def test_empty(self):
+        with pytest.raises(ValueError):
+            self._callFUT('list=0')
+
+
+class TestPercentile:
+    def _callFUT(self, values, percent):
+        from django_ftpserver.loadgen import percentile
+        return percentile(values, percent)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        assert self._callFUT(values, 50) == 50
+        assert self._callFUT(values, 99) == 99
+        assert self._callFUT([5], 90) == 5
+        assert self._callFUT([], 50) is None
+
+
+class TestRun:
+    def test_run(self, ftp_server, tmp_path):
+        from django_ftpserver import loadgen
+        config = loadgen.LoadConfig(
+            '127.0.0.1', ftp_server.address[1], 'user1', 'password',
+            mix='login=1,list=1,retr=1,stor=1,rest=1,idle=1',
+            file_size=1000, idle=0.01)
+        result, elapsed = loadgen.run(config, clients=2, duration=0.5)
+        summary = result.summary(elapsed)
+        assert result.last_errors == {}
+        assert set(summary) == set(loadgen.OPERATIONS)
+        assert summary['retr']['count'] * 1000 == \
+            summary['retr']['bytes_per_second'] * elapsed
+        assert summary['rest']['count'] * 500 == \
+            summary['rest']['bytes_per_second'] * elapsed
+        # uploaded files are deleted
+        assert list(tmp_path.iterdir()) == []
+
+    def test_login_error(self, ftp_server):
+        from django_ftpserver import loadgen
+        config = loadgen.LoadConfig(
+            '127.0.0.1', ftp_server.address[1], 'user1', 'wrong',
+            mix='login=1')
+        client = loadgen.LoadClient(
+            1, config, loadgen.LoadResult(), time.monotonic() + 0.2)
+        client.run()
+        assert client.result.errors['login'] > 0
+        assert client.result.latencies['login'] == []
+
+
+class TestProcessUsage:
+    def test_usage(self):
+        import os
+        from django_ftpserver.loadgen import ProcessUsage
+        if not ProcessUsage.supported(os.getpid()):
+            pytest.skip('/proc is not available')
+        usage = ProcessUsage(os.getpid())
+        usage.start()
+        sum(range(100000))
+        summary = usage.summary()
+        assert summary['rss'] > 0
+        assert summary['max_rss'] > 0
+        assert summary['cpu_seconds'] >= 0
+
+
+class TestFtpbenchCommand:
+    def test_json(self, ftp_server):
+        from django.core import management
+        stdout = StringIO()
+        management.call_command(
+            'ftpbench', '127.0.0.1:{}'.format(ftp_server.address[1]),
+            '--username=user1', '--password=password', '--clients=2',
+            '--duration=0.3', '--mix=list=1,retr=1', '--file-size=100',
+            '--json', stdout=stdout)
+        result = json.loads(stdout.getvalue())
+        assert result['clients'] == 2
+        assert set(result['operations']) == {'list', 'retr'}
+        assert result['server'] is None
+
+    def test_report(self, ftp_server):
+        import os
+        from django.core import management
+        stdout = StringIO()
+        management.call_command(
+            'ftpbench', '127.0.0.1:{}'.format(ftp_server.address[1]),
+            '--username=user1', '--password=password', '--clients=1',
+            '--duration=0.2', '--mix=list', '--server-pid', str(os.getpid()),
+            stdout=stdout)
+        output = stdout.getvalue()
+        assert '1 clients' in output
+        assert 'list' in output
+
+    def test_invalid_mix(self):
+        from django.core import management
+        from django.core.management.base import CommandError
+        with pytest.raises(CommandError):
+            management.call_command(
+                'ftpbench', '127.0.0.1:1', '--username=user1',
+                '--password=password', '--mix=spam')
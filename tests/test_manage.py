@@ -11,8 +11,135 @@ class TestManage:
         with pytest.raises(CommandError):
             # Test that management commands work - but without actually running one
             management.call_command('ftpserver', '--passive-ports=fake')
+
+    def test_run_ftpserver_invalid_trace_sample_rate(self):
+        with pytest.raises(CommandError):
+            management.call_command(
+                'ftpserver', '--trace-storage=-', '--trace-sample-rate=2')
+
+    def test_make_profiler(self, tmp_path):
+        from django_ftpserver.management.commands import ftpserver
+        command = ftpserver.Command()
+        assert command.make_profiler() is None
+        profiler = command.make_profiler(str(tmp_path), 'sample', 10)
+        assert profiler.mode == 'sample'
+        assert profiler.duration == 10
+
+    def test_make_storage_tracer(self):
+        from django_ftpserver.management.commands import ftpserver
+        command = ftpserver.Command()
+        assert command.make_storage_tracer() is None
+        tracer = command.make_storage_tracer('-', 0.5)
+        assert tracer.output is None
+        assert tracer.sample_rate == 0.5
     
     @pytest.mark.django_db
     def test_createftpusergroup(self):
         random_name = ''.join(random.choice('abcde') for _ in range(10))
         management.call_command('createftpusergroup', random_name)
+
+    @pytest.mark.django_db
+    def test_createftpusergroup_file(self, tmp_path):
+        from django_ftpserver import models
+        path = tmp_path / 'groups.csv'
+        path.write_text(
+            'name,home_dir,permission\n'
+            'group1,/tmp/{username},elr\n'
+            'group2,,\n'
+            'group1,,\n')
+        management.call_command('createftpusergroup', file=str(path))
+        groups = models.FTPUserGroup.objects.order_by('name')
+        assert [(g.name, g.home_dir, g.permission) for g in groups] == [
+            ('group1', '/tmp/{username}', 'elr'),
+            ('group2', None, 'elradfmw'),
+        ]
+
+    @pytest.mark.django_db
+    def test_importftpuseraccounts(self, tmp_path):
+        from django.contrib.auth import authenticate
+        from django.contrib.auth.models import User
+        from django_ftpserver import models
+        models.FTPUserGroup.objects.create(name='group1')
+        User.objects.create(username='existing')
+        path = tmp_path / 'accounts.csv'
+        path.write_text(
+            'username,password,group,home_dir\n'
+            'user1,password1,group1,/tmp/user1\n'
+            'user2,password2,group1,\n'
+            'existing,,group1,\n'
+            'user3,password3,unknown,\n'
+            'user1,password1,group1,\n')
+        management.call_command(
+            'importftpuseraccounts', str(path), jobs=1, batch_size=2)
+        accounts = models.FTPUserAccount.objects.order_by('login_name')
+        assert [(a.login_name, a.home_dir) for a in accounts] == [
+            ('existing', None),
+            ('user1', '/tmp/user1'),
+            ('user2', None),
+        ]
+        assert authenticate(username='user2', password='password2')
+        assert not User.objects.filter(username='user3').exists()
+
+    @pytest.mark.django_db
+    def test_importftpuseraccounts_jsonl(self, tmp_path):
+        from django.contrib.auth import authenticate
+        from django_ftpserver import models
+        models.FTPUserGroup.objects.create(name='group1')
+        path = tmp_path / 'accounts.jsonl'
+        path.write_text(''.join(
+            '{"username": "user%d", "password": "password%d", '
+            '"group": "group1"}\n' % (i, i) for i in range(4)))
+        management.call_command('importftpuseraccounts', str(path), jobs=2)
+        assert models.FTPUserAccount.objects.count() == 4
+        assert authenticate(username='user3', password='password3')
+
+    @pytest.mark.django_db
+    def test_syncftploginnames(self, settings, capsys):
+        from django.contrib.auth.models import User
+        from django_ftpserver import models
+        group = models.FTPUserGroup.objects.create(name='group1')
+        for username in ('Alice', 'Bob', 'bob', 'carol'):
+            models.FTPUserAccount.objects.create(
+                user=User.objects.create(username=username), group=group)
+        settings.FTPSERVER_CASE_INSENSITIVE_LOGIN = True
+        management.call_command('syncftploginnames')
+        accounts = models.FTPUserAccount.objects.order_by('user__username')
+        assert [a.login_name for a in accounts] == [
+            'alice', None, None, 'carol']
+        out, err = capsys.readouterr()
+        assert 'Login names of 3 FTP user accounts were updated.' in out
+        assert 'Bob, bob' in err
+
+    def test_importftpuseraccounts_hash_passwords_spawn(self):
+        import multiprocessing
+        from django.contrib.auth.hashers import check_password
+        from django_ftpserver.management.commands import (
+            importftpuseraccounts)
+        command = importftpuseraccounts.Command()
+        # processes don't inherit the configured Django
+        command.mp_context = multiprocessing.get_context('spawn')
+        passwords = command.hash_passwords(['password1', 'password2'], 2)
+        assert check_password('password1', passwords[0])
+        assert check_password('password2', passwords[1])
+
+    def test_importftpuseraccounts_hash_passwords_py36(self):
+        import multiprocessing
+        import sys
+        from unittest import mock
+        from django.contrib.auth.hashers import check_password
+        from django_ftpserver.management.commands import (
+            importftpuseraccounts)
+        command = importftpuseraccounts.Command()
+        with mock.patch.object(sys, 'version_info', (3, 6, 0)):
+            # ProcessPoolExecutor has no initializer, forked processes
+            # inherit the configured Django
+            passwords = command.hash_passwords(['password1', 'password2'], 2)
+            command.mp_context = multiprocessing.get_context('spawn')
+            with mock.patch.object(
+                    importftpuseraccounts, 'ProcessPoolExecutor') as executor:
+                spawned = command.hash_passwords(['password3', 'password4'], 2)
+        assert check_password('password1', passwords[0])
+        assert check_password('password2', passwords[1])
+        # hashed in this process
+        assert not executor.called
+        assert check_password('password4', spawned[1])
@@ -0,0 +1,110 @@
+import pytest
+
+
+@pytest.fixture
+def registry():
+    from django_ftpserver import metrics
+    metrics.registry.clear()
+    metrics.registry.enabled = True
+    yield metrics.registry
+    metrics.registry.enabled = False
+    metrics.registry.clear()
+
+
+class TestRegistry:
+    def _getOne(self):
+        from django_ftpserver.metrics import Registry
+        return Registry()
+
+    def test_render_counter(self):
+        registry = self._getOne()
+        counter = registry.counter('calls_total', 'Calls.', ('method',))
+        counter.inc(method='open')
+        counter.inc(2, method='open')
+        assert counter.get(method='open') == 3
+        assert registry.render() == (
+            '# HELP calls_total Calls.\n'
+            '# TYPE calls_total counter\n'
+            'calls_total{method="open"} 3\n')
+
+    def test_render_gauge(self):
+        registry = self._getOne()
+        gauge = registry.gauge('sessions', 'Sessions.')
+        gauge.inc()
+        gauge.inc()
+        gauge.dec()
+        assert 'sessions 1\n' in registry.render()
+
+    def test_render_histogram(self):
+        registry = self._getOne()
+        histogram = registry.histogram(
+            'latency_seconds', 'Latency.', buckets=(0.1, 1))
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5)
+        assert histogram.get() == (3, 5.55)
+        assert registry.render().splitlines()[2:] == [
+            'latency_seconds_bucket{le="0.1"} 1',
+            'latency_seconds_bucket{le="1"} 2',
+            'latency_seconds_bucket{le="+Inf"} 3',
+            'latency_seconds_count 3',
+            'latency_seconds_sum 5.55',
+        ]
+
+    def test_escape_label(self):
+        registry = self._getOne()
+        counter = registry.counter('c', 'C.', ('path',))
+        counter.inc(path='a"b')
+        assert 'c{path="a\\"b"} 1' in registry.render()
+
+
+class TestInstrumentedStorage:
+    def test_call(self, registry):
+        from django.core.files.storage import FileSystemStorage
+        from django_ftpserver import metrics
+        storage = metrics.InstrumentedStorage(FileSystemStorage('/tmp'))
+        assert storage.exists('')
+        assert storage.location == '/tmp'
+        assert metrics.storage_calls.get(method='exists') == 1
+        assert metrics.storage_call_duration.get(method='exists')[0] == 1
+
+
+class TestMetricsHTTPServer:
+    def test_serve(self, registry):
+        from urllib.request import urlopen
+        from django_ftpserver import metrics
+        metrics.active_sessions.set(2)
+        server = metrics.start_http_server(0, '127.0.0.1')
+        try:
+            response = urlopen('http://127.0.0.1:{}/metrics'.format(
+                server.server_address[1]))
+            body = response.read().decode('utf-8')
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert 'ftpserver_active_sessions 2\n' in body
+
+
+@pytest.mark.django_db
+class TestAuthenticationMetrics:
+    def test_failure(self, registry):
+        from pyftpdlib.authorizers import AuthenticationFailed
+        from django_ftpserver import authorizers, metrics
+        authorizer = authorizers.FTPAccountAuthorizer()
+        with pytest.raises(AuthenticationFailed):
+            authorizer.validate_authentication('user1', 'password', None)
+        assert metrics.authentication_failures.get(reason='invalid') == 1
+        assert metrics.authentication_duration.get()[0] == 1
+
+    def test_db_queries(self, registry):
+        from django.contrib.auth.models import User
+        from django_ftpserver import metrics
+        metrics.install_db_query_counter()
+        try:
+            metrics.command_context.command = 'LIST'
+            User.objects.count()
+        finally:
+            metrics.command_context.command = None
+            from django.db import connection
+            connection.execute_wrappers.remove(metrics.count_db_queries)
+        assert metrics.db_queries.get(command='LIST') == 1
@@ -70,3 +70,169 @@ class UserAccountWithGroupTest(TestCase):
         account.group = group
         self.assertTrue(account.has_perm('e', 'spam'))
         self.assertFalse(account.has_perm('invalid', 'spam'))
+
+    def test_get_bandwidth_limits_from_group(self):
+        group = self._getGroup()
+        group.read_limit = 100
+        group.write_limit = 200
+        account = self._getOne()
+        account.group = group
+        self.assertEqual(account.get_bandwidth_limits(), (100, 200))
+
+    def test_get_bandwidth_limits_override(self):
+        group = self._getGroup()
+        group.read_limit = 100
+        account = self._getOne()
+        account.group = group
+        account.read_limit = 0
+        account.write_limit = 300
+        self.assertEqual(account.get_bandwidth_limits(), (0, 300))
+
+    def test_get_max_connections(self):
+        group = self._getGroup()
+        group.max_connections_per_user = 3
+        account = self._getOne()
+        account.group = group
+        self.assertEqual(account.get_max_connections(), 3)
+        account.max_connections = 1
+        self.assertEqual(account.get_max_connections(), 1)
+
+    def test_get_storage_alias(self):
+        group = self._getGroup()
+        account = self._getOne()
+        account.group = group
+        self.assertEqual(account.get_storage_alias(), '')
+        group.storage = 'archive'
+        self.assertEqual(account.get_storage_alias(), 'archive')
+        account.storage = 'fast'
+        self.assertEqual(account.get_storage_alias(), 'fast')
+
+    def test_storage_alias_validation(self):
+        from django.core.exceptions import ValidationError
+        group = self._getGroup()
+        group.name = 'group'
+        group.storage = 'archive'
+        with self.settings(FTPSERVER_STORAGES={'archive': {
+                'BACKEND': 'django_ftpserver.storages.InMemoryStorage'}}):
+            group.full_clean()
+            group.storage = 'missing'
+            with self.assertRaises(ValidationError):
+                group.full_clean()
+
+    def test_has_perm_path(self):
+        from django_ftpserver import models
+        group = self._getGroup()
+        account = self._getOne()
+        account.group = group
+        models.FTPPathPermission.objects.create(
+            group=group, path='/archive', permission='elr')
+        self.assertTrue(account.has_perm('w', '/incoming/file'))
+        self.assertFalse(account.has_perm('w', '/archive/file'))
+
+    def test_has_perm_rooted_at_home_dir(self):
+        from django_ftpserver import models
+        group = self._getGroup()
+        group.home_dir = '/home/spam/'
+        account = self._getOne()
+        account.group = group
+        models.FTPPathPermission.objects.create(
+            group=group, path='/archive', permission='elr')
+        with self.assertNumQueries(1):
+            self.assertFalse(account.has_perm('w', '/home/spam/archive/a'))
+            self.assertTrue(account.has_perm('w', '/home/spam/incoming'))
+
+
+class PathPermissionTest(TestCase):
+    def _getAccount(self, username):
+        from django.contrib.auth import models as auth_models
+        from django_ftpserver import models
+        group, _ = models.FTPUserGroup.objects.get_or_create(name='group1')
+        user = auth_models.User.objects.create(username=username)
+        return models.FTPUserAccount.objects.create(user=user, group=group)
+
+    def _getRule(self, **kwargs):
+        from django_ftpserver import models
+        return models.FTPPathPermission.objects.create(**kwargs)
+
+    def test_account_rule_overrides_group_rule(self):
+        account = self._getAccount('user1')
+        other = self._getAccount('user2')
+        self._getRule(group=account.group, path='/incoming', permission='el')
+        self._getRule(account=account, path='/incoming', permission='elw')
+        self._getRule(account=other, path='/archive', permission='')
+        rules = account.get_permission_rules()
+        self.assertEqual(rules.get_perms('/incoming'), 'elw')
+        self.assertEqual(rules.get_perms('/archive'), 'elradfmw')
+        self.assertEqual(
+            other.get_permission_rules().get_perms('/incoming'), 'el')
+
+
+class LoginNameTest(TestCase):
+    def _getAccount(self, username):
+        from django.contrib.auth import models as auth_models
+        from django_ftpserver import models
+        group = models.FTPUserGroup.objects.create(name='group1')
+        user = auth_models.User.objects.create(username=username)
+        return models.FTPUserAccount.objects.create(user=user, group=group)
+
+    def test_login_name_on_create(self):
+        account = self._getAccount('User1')
+        self.assertEqual(account.login_name, 'User1')
+
+    def test_login_name_follows_user(self):
+        from django_ftpserver import models
+        account = self._getAccount('user1')
+        user = account.user
+        user.username = 'user2'
+        user.save()
+        account = models.FTPUserAccount.objects.get(pk=account.pk)
+        self.assertEqual(account.login_name, 'user2')
+
+    def test_login_name_case_insensitive(self):
+        from django.test import override_settings
+        with override_settings(FTPSERVER_CASE_INSENSITIVE_LOGIN=True):
+            account = self._getAccount('User1')
+        self.assertEqual(account.login_name, 'user1')
+
+    def test_save_syncs_case_insensitive(self):
+        from django.test import override_settings
+        from django_ftpserver import models
+        account = self._getAccount('User1')
+        with override_settings(FTPSERVER_CASE_INSENSITIVE_LOGIN=True):
+            for account in models.FTPUserAccount.objects.all():
+                account.save()
+        account = models.FTPUserAccount.objects.get(pk=account.pk)
+        self.assertEqual(account.login_name, 'user1')
+
+    def test_clean_same_login_name(self):
+        from django.contrib.auth import models as auth_models
+        from django.core.exceptions import ValidationError
+        from django.test import override_settings
+        from django_ftpserver import models
+        with override_settings(FTPSERVER_CASE_INSENSITIVE_LOGIN=True):
+            account = self._getAccount('Bob')
+            account.full_clean()
+            other = models.FTPUserAccount(
+                user=auth_models.User.objects.create(username='bob'),
+                group=account.group)
+            with self.assertRaises(ValidationError) as cm:
+                other.full_clean()
+        self.assertIn('user', cm.exception.message_dict)
+
+    def test_user_renamed_to_same_login_name(self):
+        from django.contrib.auth import models as auth_models
+        from django.test import override_settings
+        from django_ftpserver import models
+        with override_settings(FTPSERVER_CASE_INSENSITIVE_LOGIN=True):
+            account = self._getAccount('Bob')
+            other = models.FTPUserAccount.objects.create(
+                user=auth_models.User.objects.create(username='carol'),
+                group=account.group)
+            user = other.user
+            user.username = 'bob'
+            with self.assertLogs('django_ftpserver.models', 'WARNING'):
+                user.save()
+        other = models.FTPUserAccount.objects.get(pk=other.pk)
+        self.assertIsNone(other.login_name)
+        account = models.FTPUserAccount.objects.get(pk=account.pk)
+        self.assertEqual(account.login_name, 'bob')
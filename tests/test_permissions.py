@@ -0,0 +1,51 @@
+class TestSplitPath:
+    def _callFUT(self, path):
+        from django_ftpserver.permissions import split_path
+        return split_path(path)
+
+    def test_root(self):
+        assert self._callFUT('/') == []
+
+    def test_path(self):
+        assert self._callFUT('/spam/./ham/') == ['spam', 'ham']
+
+    def test_relative(self):
+        assert self._callFUT('spam/ham') == ['spam', 'ham']
+
+
+class TestPermissionTrie:
+    def _getOne(self, default='elr', rules=(), root='/'):
+        from django_ftpserver.permissions import PermissionTrie
+        return PermissionTrie(default, rules, root=root)
+
+    def test_default(self):
+        trie = self._getOne()
+        assert trie.get_perms('/spam') == 'elr'
+        assert trie.get_perms(None) == 'elr'
+
+    def test_longest_prefix(self):
+        trie = self._getOne(rules=[
+            ('/incoming', 'elradfmw'),
+            ('/incoming/locked', 'el'),
+        ])
+        assert trie.get_perms('/incoming') == 'elradfmw'
+        assert trie.get_perms('/incoming/file.txt') == 'elradfmw'
+        assert trie.get_perms('/incoming/locked/file.txt') == 'el'
+        assert trie.get_perms('/incomingx') == 'elr'
+
+    def test_root_rule(self):
+        trie = self._getOne(rules=[('/', '')])
+        assert trie.get_perms('/spam') == ''
+        assert not trie.has_perm('e', '/spam')
+
+    def test_root_directory(self):
+        trie = self._getOne(
+            rules=[('/archive', 'elr'), ('/incoming', 'elw')],
+            root='/home/user1/')
+        assert trie.has_perm('w', '/home/user1/incoming/data.csv')
+        assert not trie.has_perm('w', '/home/user1/archive/data.csv')
+        assert trie.has_perm('w', '/incoming/data.csv')
+
+    def test_overwrite_rule(self):
+        trie = self._getOne(rules=[('/spam', 'e'), ('/spam/', 'elr')])
+        assert trie.get_perms('/spam') == 'elr'
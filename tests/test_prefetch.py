@@ -0,0 +1,176 @@
+import threading
+import time
+
+import pytest
+
+
+class TestFetch:
+    def _callFUT(self, func, paths, deadline=10.0):
+        from concurrent.futures import ThreadPoolExecutor
+        from django_ftpserver.prefetch import fetch
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            return fetch(func, paths, executor, time.monotonic() + deadline)
+
+    def test_results(self):
+        def func(path):
+            if path == 'b':
+                raise OSError('missing')
+            return path.upper()
+        results = self._callFUT(func, ['a', 'b', 'c'])
+        assert results['a'] == 'A'
+        assert isinstance(results['b'], OSError)
+        assert results['c'] == 'C'
+
+    def test_concurrent(self):
+        barrier = threading.Barrier(4, timeout=5)
+
+        def func(path):
+            # fails unless 4 calls run at once
+            barrier.wait()
+            return path
+        assert sorted(self._callFUT(func, list('abcd'))) == list('abcd')
+
+    def test_deadline(self):
+        event = threading.Event()
+
+        def func(path):
+            if path == 'slow':
+                event.wait(5)
+            return path
+        # release the slow call before the executor is shut down
+        timer = threading.Timer(0.2, event.set)
+        timer.start()
+        results = self._callFUT(func, ['fast', 'slow'], deadline=0.1)
+        timer.join()
+        assert results == {'fast': 'fast'}
+
+
+class TestGetOptions:
+    def _callFUT(self):
+        from django_ftpserver.prefetch import get_options
+        return get_options()
+
+    def test_disabled(self, settings):
+        settings.FTPSERVER_LIST_PREFETCH = None
+        assert self._callFUT() is None
+
+    def test_defaults(self, settings):
+        from django_ftpserver.prefetch import DEFAULT_OPTIONS
+        settings.FTPSERVER_LIST_PREFETCH = True
+        assert self._callFUT() == DEFAULT_OPTIONS
+
+    def test_options(self, settings):
+        settings.FTPSERVER_LIST_PREFETCH = {'batch': 10, 'deadline': 1}
+        options = self._callFUT()
+        assert options['batch'] == 10
+        assert options['deadline'] == 1
+        assert options['workers'] == 8
+
+
+class TestGetExecutor:
+    def test_shared(self, monkeypatch):
+        from django_ftpserver import prefetch
+        monkeypatch.setattr(prefetch, '_executor', None)
+        executor = prefetch.get_executor(2)
+        assert prefetch.get_executor(2) is executor
+        executor.shutdown()
+
+    def test_py35(self, monkeypatch):
+        import sys
+        from unittest import mock
+        from django_ftpserver import prefetch
+        monkeypatch.setattr(prefetch, '_executor', None)
+        monkeypatch.setattr(sys, 'version_info', (3, 5, 0))
+        # thread_name_prefix needs Python 3.6
+        monkeypatch.setattr(prefetch, 'ThreadPoolExecutor', mock.Mock())
+        prefetch.get_executor(2)
+        prefetch.ThreadPoolExecutor.assert_called_once_with(max_workers=2)
+
+
+class DummyChannel(object):
+    use_gmt_times = True
+    storage_tracer = None
+    encoding = 'utf8'
+    unicode_errors = 'replace'
+
+
+class TestStorageFSPrefetch:
+    @pytest.fixture(autouse=True)
+    def prefetch(self, settings):
+        settings.FTPSERVER_LIST_PREFETCH = {'batch': 2}
+
+    def _getOne(self, storage):
+        from django_ftpserver.filesystems import StorageFS
+
+        class FS(StorageFS):
+            storage_class = staticmethod(lambda: storage)
+        return FS('/', DummyChannel())
+
+    def _getStorage(self):
+        from django_ftpserver.storages import InMemoryStorage
+
+        class Storage(InMemoryStorage):
+            threads = set()
+
+            def size(self, name):
+                self.threads.add(threading.current_thread().name)
+                try:
+                    return super(Storage, self).size(name)
+                except KeyError:
+                    raise FileNotFoundError(name)
+        return Storage(dict(
+            ('{0}.txt'.format(i), b'x' * i) for i in range(5)))
+
+    def test_format_list(self, settings):
+        storage = self._getStorage()
+        fs = self._getOne(storage)
+        names = fs.listdir('/')
+        lines = list(fs.format_list('/', names))
+        assert [line.split()[4] for line in lines] == [
+            b'0', b'1', b'2', b'3', b'4']
+        assert all(
+            name.startswith('ftpserver-prefetch') for name in storage.threads)
+        assert fs._stat_cache is None
+
+        settings.FTPSERVER_LIST_PREFETCH = None
+        storage.threads.clear()
+        assert list(fs.format_list('/', names)) == lines
+        assert storage.threads == {threading.current_thread().name}
+
+    def test_format_mlsx(self):
+        storage = self._getStorage()
+        fs = self._getOne(storage)
+        lines = list(fs.format_mlsx(
+            '/', fs.iter_listdir('/'), 'elr', ['size']))
+        assert lines[2] == b'size=2; 2.txt\r\n'
+        assert all(
+            name.startswith('ftpserver-prefetch') for name in storage.threads)
+
+    def test_errors_ignored(self):
+        storage = self._getStorage()
+        fs = self._getOne(storage)
+        lines = list(fs.format_list('/', ['1.txt', 'missing.txt', '2.txt']))
+        assert len(lines) == 2
+
+    def test_traced(self):
+        from django_ftpserver.tracing import StorageTracer
+        tracer = StorageTracer()
+        channel = DummyChannel()
+        channel.storage_tracer = tracer
+        storage = self._getStorage()
+        fs = self._getOne(storage)
+        fs.cmd_channel = channel
+        fs.storage = fs.wrap_storage(storage)
+        trace = tracer.begin('LIST', '/')
+        lines = list(fs.format_list('/', fs.listdir('/')))
+        assert len(lines) == 5
+        assert trace.methods['size'][0] == 5
+        tracer.end(trace)
+        # calls finished after the trace ended are not recorded
+        tracer.bind(fs.storage.size)('1.txt')
+        assert trace.methods['size'][0] == 5
+
+    def test_patched_stat(self, tmpdir):
+        from django.core.files.storage import FileSystemStorage
+        fs = self._getOne(FileSystemStorage(location=str(tmpdir)))
+        assert not fs.can_prefetch()
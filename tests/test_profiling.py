@@ -0,0 +1,76 @@
+import os
+import pstats
+import time
+
+import pytest
+
+
+def _work():
+    return sum(range(1000))
+
+
+class TestCommandProfiler:
+    def _getOne(self, output, **kwargs):
+        from django_ftpserver.profiling import CommandProfiler
+        return CommandProfiler(str(output), **kwargs)
+
+    def test_unknown_mode(self, tmp_path):
+        with pytest.raises(ValueError):
+            self._getOne(tmp_path, mode='spam')
+
+    def test_cprofile_per_command(self, tmp_path):
+        profiler = self._getOne(tmp_path)
+        profiler.enter('LIST')
+        profiler.start()
+        profiler.enter('LIST')
+        _work()
+        profiler.exit()
+        _work()
+        paths = profiler.stop()
+        assert not profiler.active
+        assert [os.path.basename(path).split('-', 2)[2] for path in paths] \
+            == ['IOLoop.pstats', 'LIST.pstats']
+        functions = [
+            function for _, _, function in pstats.Stats(paths[1]).stats]
+        assert '_work' in functions
+        assert profiler.stop() == []
+
+    def test_sample(self, tmp_path):
+        from django_ftpserver import metrics
+        profiler = self._getOne(tmp_path, mode='sample', interval=0.001)
+        profiler.start()
+        metrics.command_context.command = 'RETR'
+        try:
+            deadline = time.monotonic() + 0.1
+            while time.monotonic() < deadline:
+                _work()
+        finally:
+            metrics.command_context.command = None
+        paths = profiler.stop()
+        assert paths[0].endswith('.collapsed')
+        with open(paths[0]) as f:
+            lines = f.read().splitlines()
+        assert lines
+        assert any(
+            line.startswith('RETR;') and 'test_sample' in line
+            for line in lines)
+        stack, count = lines[0].rsplit(' ', 1)
+        assert int(count) > 0
+
+    def test_duration(self, tmp_path):
+        from pyftpdlib.ioloop import IOLoop
+        ioloop = IOLoop()
+        profiler = self._getOne(tmp_path, duration=0.01)
+        profiler.start(ioloop)
+        assert profiler.active
+        time.sleep(0.02)
+        ioloop.sched.poll()
+        assert not profiler.active
+        ioloop.close()
+
+    def test_toggle(self, tmp_path):
+        profiler = self._getOne(tmp_path)
+        profiler.toggle()
+        assert profiler.active
+        profiler.toggle()
+        assert not profiler.active
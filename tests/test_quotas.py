@@ -0,0 +1,124 @@
+import errno
+
+import pytest
+
+
+class DummyChannel(object):
+    storage_tracer = None
+
+    def __init__(self, account):
+        self.account = account
+
+
+@pytest.fixture
+def account(db):
+    from django.contrib.auth.models import User
+    from django_ftpserver import models
+    group = models.FTPUserGroup.objects.create(name='group1', quota=10)
+    user = User.objects.create(username='user1')
+    return models.FTPUserAccount.objects.create(user=user, group=group)
+
+
+@pytest.fixture
+def storage():
+    from django_ftpserver.storages import InMemoryStorage
+    return InMemoryStorage()
+
+
+@pytest.fixture
+def fs(account, storage):
+    from django_ftpserver.filesystems import StorageFS
+
+    class FS(StorageFS):
+        storage_class = staticmethod(lambda: storage)
+    return FS('/', DummyChannel(account))
+
+
+def _write(fs, path, data, mode='wb'):
+    f = fs.open(path, mode)
+    try:
+        f.write(data)
+    finally:
+        f.close()
+
+
+def _usage(account):
+    from django_ftpserver import models
+    usage = models.FTPQuotaUsage.objects.get(account=account)
+    return usage.bytes, usage.files
+
+
+class TestStorageFSQuota:
+    def test_stor_appe_dele(self, fs, account):
+        _write(fs, 'a.txt', b'spam')
+        assert _usage(account) == (4, 1)
+        _write(fs, 'a.txt', b'ham', mode='ab')
+        assert _usage(account) == (7, 1)
+        _write(fs, 'a.txt', b'eggs')
+        assert _usage(account) == (4, 1)
+        _write(fs, 'b.txt', b'ham')
+        assert _usage(account) == (7, 2)
+        fs.remove('a.txt')
+        assert _usage(account) == (3, 1)
+
+    def test_exceeded_during_upload(self, fs, account, storage):
+        _write(fs, 'a.txt', b'spam')
+        with pytest.raises(OSError) as excinfo:
+            _write(fs, 'b.txt', b'x' * 7)
+        assert excinfo.value.errno == errno.EDQUOT
+        assert _usage(account) == (4, 2)
+        # replacing a file frees its size
+        _write(fs, 'a.txt', b'x' * 10)
+        assert _usage(account) == (10, 2)
+
+    def test_exceeded_before_upload(self, fs, account):
+        from django_ftpserver import quotas
+        quotas.add_usage(account.pk, 10, 1)
+        with pytest.raises(OSError) as excinfo:
+            fs.open('a.txt', 'wb')
+        assert excinfo.value.errno == errno.EDQUOT
+        # reading is not limited
+        with pytest.raises(FileNotFoundError):
+            fs.open('a.txt', 'rb')
+
+    def test_rename(self, fs, account, storage):
+        _write(fs, 'a.txt', b'spam')
+        _write(fs, 'b.txt', b'ham')
+        fs.rename('a.txt', 'c.txt')
+        assert storage.listdir('') == ([], ['b.txt', 'c.txt'])
+        assert _usage(account) == (7, 2)
+        fs.rename('c.txt', 'b.txt')
+        assert storage.open('b.txt').read() == b'spam'
+        assert _usage(account) == (4, 1)
+
+    def test_unlimited(self, account, storage):
+        from django_ftpserver import models
+        from django_ftpserver.filesystems import StorageFS
+        account.quota = 0
+        account.save()
+
+        class FS(StorageFS):
+            storage_class = staticmethod(lambda: storage)
+        fs = FS('/', DummyChannel(account))
+        _write(fs, 'a.txt', b'x' * 100)
+        assert not models.FTPQuotaUsage.objects.exists()
+
+
+class TestReconcile:
+    def test_command(self, account, tmp_path):
+        from django.core import management
+        (tmp_path / 'dir').mkdir()
+        (tmp_path / 'dir' / 'a.txt').write_bytes(b'spam')
+        (tmp_path / 'b.txt').write_bytes(b'ham')
+        account.home_dir = str(tmp_path)
+        account.save()
+        from django_ftpserver import quotas
+        quotas.add_usage(account.pk, 100, 10)
+        management.call_command('reconcileftpquotas', 'user1')
+        assert _usage(account) == (7, 2)
+
+    def test_command_unknown_account(self, account):
+        from django.core import management
+        from django.core.management.base import CommandError
+        with pytest.raises(CommandError):
+            management.call_command('reconcileftpquotas', 'spam')
@@ -0,0 +1,73 @@
+class TestTokenBucket:
+    def _getOne(self, rate, capacity):
+        from django_ftpserver.ratelimit import TokenBucket
+        return TokenBucket(rate, capacity, 0)
+
+    def test_consume_burst(self):
+        bucket = self._getOne(1, 2)
+        assert bucket.consume(0)
+        assert bucket.consume(0)
+        assert not bucket.consume(0)
+
+    def test_refill(self):
+        bucket = self._getOne(1, 2)
+        bucket.consume(0)
+        bucket.consume(0)
+        assert bucket.consume(1)
+        assert not bucket.consume(1)
+
+    def test_refill_capacity(self):
+        bucket = self._getOne(1, 2)
+        bucket.consume(0)
+        bucket.consume(100)
+        bucket.consume(100)
+        assert not bucket.consume(100)
+
+
+class TestLoginRateLimiter:
+    def _getOne(self, **kwargs):
+        from django_ftpserver.ratelimit import LoginRateLimiter
+        limiter = LoginRateLimiter(**kwargs)
+        self.now = 0
+        limiter.clock = lambda: self.now
+        return limiter
+
+    def test_ip_limit(self):
+        limiter = self._getOne(ip_rate=1, ip_burst=2, user_burst=100)
+        assert limiter.allow('10.0.0.1', 'user1')
+        assert limiter.allow('10.0.0.1', 'user2')
+        assert not limiter.allow('10.0.0.1', 'user3')
+        assert limiter.allow('10.0.0.2', 'user3')
+        assert limiter.rejected == {'ip': 1, 'user': 0}
+
+    def test_user_limit(self):
+        limiter = self._getOne(user_rate=1, user_burst=1)
+        assert limiter.allow('10.0.0.1', 'user1')
+        assert not limiter.allow('10.0.0.2', 'user1')
+        assert limiter.rejected == {'ip': 0, 'user': 1}
+        self.now = 1
+        assert limiter.allow('10.0.0.3', 'user1')
+
+    def test_backoff(self):
+        limiter = self._getOne(backoff=2, max_backoff=3)
+        limiter.failure('10.0.0.1', 'user1')
+        assert not limiter.allow('10.0.0.1', 'user2')
+        self.now = 2
+        assert limiter.allow('10.0.0.1', 'user2')
+        limiter.failure('10.0.0.1', 'user2')
+        self.now = 4.5
+        assert not limiter.allow('10.0.0.1', 'user3')
+        self.now = 5
+        assert limiter.allow('10.0.0.1', 'user3')
+
+    def test_success_resets_backoff(self):
+        limiter = self._getOne(backoff=10)
+        limiter.failure('10.0.0.1', 'user1')
+        limiter.success('10.0.0.1', 'user1')
+        assert limiter.allow('10.0.0.1', 'user1')
+
+    def test_max_entries(self):
+        limiter = self._getOne(max_entries=4)
+        for i in range(10):
+            limiter.allow('10.0.0.%d' % i, 'user%d' % i)
+        assert len(limiter) == 4
@@ -0,0 +1,441 @@
+import pytest
+
+
+class TestInMemoryStorage:
+    def _getOne(self, files=None):
+        from django_ftpserver.storages import InMemoryStorage
+        return InMemoryStorage(files)
+
+    def test_files(self):
+        storage = self._getOne({'spam/ham.txt': b'ham', 'eggs.txt': 'eggs'})
+        assert storage.listdir('') == (['spam'], ['eggs.txt'])
+        assert storage.listdir('spam') == ([], ['ham.txt'])
+        assert storage.exists('spam')
+        assert storage.exists('spam/')
+        assert not storage.exists('eggs.txt/')
+        assert storage.size('eggs.txt') == 4
+        with storage.open('spam/ham.txt') as f:
+            assert f.read() == b'ham'
+        storage.delete('spam/ham.txt')
+        assert not storage.exists('spam/ham.txt')
+        assert storage.listdir('spam') == ([], [])
+
+    def test_write(self):
+        storage = self._getOne()
+        f = storage.open('/a/b.txt', 'wb')
+        f.write(b'spam')
+        assert not storage.exists('a/b.txt')
+        f.close()
+        f = storage.open('a/b.txt', 'ab')
+        f.write(b'ham')
+        f.close()
+        with storage.open('a/b.txt') as f:
+            assert f.read() == b'spamham'
+
+    def test_save(self):
+        from django.core.files.base import ContentFile
+        storage = self._getOne()
+        assert storage.save('c.txt', ContentFile(b'spam')) == 'c.txt'
+        assert storage.size('c.txt') == 4
+        assert storage.get_modified_time('c.txt')
+
+    def test_directories(self):
+        import pytest
+        storage = self._getOne({'a/b.txt': b''})
+        storage.makedirs('x/y')
+        assert storage.listdir('x') == (['y'], [])
+        assert storage.get_modified_time('x')
+        with pytest.raises(OSError):
+            storage.removedir('a')
+        storage.removedir('x/y')
+        assert not storage.exists('x/y/')
+
+
+class TestGetStorage:
+    @pytest.fixture(autouse=True)
+    def storages(self, settings):
+        settings.FTPSERVER_STORAGES = {
+            'memory': {
+                'BACKEND': 'django_ftpserver.storages.InMemoryStorage',
+                'OPTIONS': {'files': {'a.txt': b'spam'}},
+            },
+            'latency': {
+                'BACKEND': 'django_ftpserver.storages.LatencyStorage',
+            },
+        }
+
+    def _callFUT(self, alias):
+        from django_ftpserver.storages import get_storage
+        return get_storage(alias)
+
+    def test_cached(self):
+        from django_ftpserver.storages import InMemoryStorage, LatencyStorage
+        storage = self._callFUT('memory')
+        assert isinstance(storage, InMemoryStorage)
+        assert storage.exists('a.txt')
+        assert self._callFUT('memory') is storage
+        assert isinstance(self._callFUT('latency'), LatencyStorage)
+
+    def test_unknown(self):
+        with pytest.raises(ValueError):
+            self._callFUT('missing')
+
+    def test_reset_on_setting_changed(self, settings):
+        storage = self._callFUT('memory')
+        settings.FTPSERVER_STORAGES = {
+            'memory': {'BACKEND': 'django_ftpserver.storages.InMemoryStorage'}}
+        assert self._callFUT('memory') is not storage
+        assert not self._callFUT('memory').exists('a.txt')
+
+
+class TestStorageFSInMemory:
+    def _getOne(self, storage):
+        from django_ftpserver.filesystems import StorageFS
+
+        class FS(StorageFS):
+            storage_class = staticmethod(lambda: storage)
+        return FS('/', None)
+
+    def test_listdir_stat(self):
+        import stat
+        from django_ftpserver.storages import InMemoryStorage
+        fs = self._getOne(InMemoryStorage({'a/b.txt': b'spam', 'c.txt': b''}))
+        assert fs.listdir('/') == ['a/', 'c.txt']
+        assert stat.S_ISDIR(fs.stat('a/').st_mode)
+        assert fs.stat('a/b.txt').st_size == 4
+        fs.mkdir('d')
+        assert fs.isdir('d')
+        fs.rmdir('d')
+        assert not fs.isdir('d')
+
+
+class TestStorageFSLazyStorage:
+    def _getOne(self, storage_class):
+        from django_ftpserver.filesystems import StorageFS
+
+        class FS(StorageFS):
+            pass
+        FS.storage_class = storage_class
+        return FS('/', None)
+
+    def _getStorageClass(self, created):
+        from django_ftpserver.storages import InMemoryStorage
+
+        class InMemoryStorage(InMemoryStorage):
+            def __init__(self):
+                super(InMemoryStorage, self).__init__({'a.txt': b'spam'})
+                created.append(self)
+        return InMemoryStorage
+
+    def test_storage_created_on_first_use(self):
+        from django_ftpserver.filesystems import InMemoryStoragePatch
+        created = []
+        fs = self._getOne(self._getStorageClass(created))
+        assert created == []
+        # patch is selected by the storage class
+        assert fs._patch is InMemoryStoragePatch
+        fs.mkdir('d')
+        assert len(created) == 1
+        assert fs.listdir('/') == ['d/', 'a.txt']
+        assert len(created) == 1
+
+    def test_storage_factory(self):
+        from django_ftpserver.filesystems import InMemoryStoragePatch
+        created = []
+        storage_class = self._getStorageClass(created)
+        fs = self._getOne(staticmethod(lambda: storage_class()))
+        assert len(created) == 1
+        assert fs._patch is InMemoryStoragePatch
+        assert fs.storage is created[0]
+
+    def test_wrapped_storage(self):
+        from django_ftpserver import metrics
+        created = []
+        metrics.registry.enabled = True
+        try:
+            fs = self._getOne(self._getStorageClass(created))
+            assert isinstance(fs.storage, metrics.InstrumentedStorage)
+        finally:
+            metrics.registry.enabled = False
+        assert fs.storage._storage is created[0]
+
+
+class TestLatencyStorage:
+    def _getOne(self, files=None, **kwargs):
+        from django_ftpserver.storages import InMemoryStorage, LatencyStorage
+        storage = LatencyStorage(InMemoryStorage(files), **kwargs)
+        storage.slept = []
+        storage.sleep = storage.slept.append
+        return storage
+
+    def test_latency(self):
+        storage = self._getOne(
+            {'a.txt': b'spam'}, latency={'exists': 0.1, '*': 0.01})
+        assert storage.exists('a.txt')
+        assert storage.size('a.txt') == 4
+        assert storage.slept == [0.1, 0.01]
+        assert storage.calls == {'exists': 1, 'size': 1}
+
+    def test_bandwidth(self):
+        storage = self._getOne({'a.txt': b'x' * 1000}, bandwidth=10000)
+        with storage.open('a.txt') as f:
+            assert len(f.read()) == 1000
+        assert storage.slept == [0.1]
+        f = storage.open('b.txt', 'wb')
+        f.write(b'x' * 500)
+        f.close()
+        assert storage.slept == [0.1, 0.05]
+        assert storage.size('b.txt') == 500
+
+    def test_error_rate(self):
+        import pytest
+        storage = self._getOne({'a.txt': b''}, error_rate={'size': 1})
+        assert storage.exists('a.txt')
+        with pytest.raises(OSError):
+            storage.size('a.txt')
+
+    def test_error_rate_reproducible(self):
+        def errors(storage):
+            result = []
+            for _ in range(20):
+                try:
+                    storage.exists('a')
+                except OSError:
+                    result.append(True)
+                else:
+                    result.append(False)
+            return result
+        first = errors(self._getOne(error_rate=0.5, seed=1))
+        assert first == errors(self._getOne(error_rate=0.5, seed=1))
+        assert any(first) and not all(first)
+
+    def test_object_store(self):
+        import pytest
+        storage = self._getOne(
+            {'dir/a.txt': b'', 'b.txt': b''}, object_store=True)
+        assert storage.exists('b.txt')
+        assert not storage.exists('dir')
+        assert not storage.exists('dir/')
+        assert storage.listdir('') == (['dir'], ['b.txt'])
+        assert storage.listdir('missing') == ([], [])
+        with pytest.raises(FileNotFoundError):
+            storage.get_modified_time('dir')
+        with pytest.raises(NotImplementedError):
+            storage.makedirs('x')
+
+    def test_paginated_listing(self):
+        files = dict(('f{0:02}'.format(i), b'') for i in range(25))
+        storage = self._getOne(
+            files, object_store=True, page_size=10, latency=0.01)
+        pages = list(storage.listdir_pages(''))
+        assert [len(page[1]) for page in pages] == [10, 10, 5]
+        assert storage.calls == {'listdir': 3}
+        assert storage.listdir('')[1] == sorted(files)
+        assert storage.calls == {'listdir': 6}
+
+    def test_settings(self, settings):
+        from django_ftpserver.storages import InMemoryStorage, LatencyStorage
+        settings.FTPSERVER_LATENCY_STORAGE = {
+            'storage': 'django_ftpserver.storages.InMemoryStorage',
+            'latency': 0.5, 'page_size': 2}
+        storage = LatencyStorage()
+        assert isinstance(storage.storage, InMemoryStorage)
+        assert storage.latency == 0.5
+        assert storage.page_size == 2
+
+
+class TestStoragePatch:
+    def _getFSClass(self, **attrs):
+        from django_ftpserver.filesystems import StorageFS
+        from django_ftpserver.storages import InMemoryStorage
+        attrs.setdefault('storage_class', InMemoryStorage)
+        return type('FS', (StorageFS,), attrs)
+
+    def test_patched_class_cached(self):
+        from django_ftpserver.filesystems import InMemoryStoragePatch
+        fs_class = self._getFSClass()
+        fs1 = fs_class('/', None)
+        fs2 = fs_class('/', None)
+        assert type(fs1) is type(fs2)
+        assert issubclass(type(fs1), fs_class)
+        assert type(fs1)._patch is InMemoryStoragePatch
+        assert type(fs1)._origin_mkdir is fs_class.mkdir
+        # methods are looked up from the class
+        assert 'mkdir' not in vars(fs1)
+        fs1.mkdir('d')
+        assert fs1.isdir('d')
+
+    def test_patches_of_subclass(self):
+        from django_ftpserver.filesystems import (
+            InMemoryStoragePatch, S3Boto3StoragePatch)
+        fs_class = self._getFSClass(
+            patches={'InMemoryStorage': S3Boto3StoragePatch})
+        fs = fs_class('/', None)
+        assert fs._patch is S3Boto3StoragePatch
+        assert type(self._getFSClass()('/', None))._patch \
+            is InMemoryStoragePatch
+
+    def test_apply_twice(self):
+        from django_ftpserver.filesystems import InMemoryStoragePatch
+        fs = self._getFSClass()('/', None)
+        patched = type(fs)
+        InMemoryStoragePatch.apply(fs)
+        assert type(fs) is patched
+
+    def test_no_patch(self):
+        from django.core.files.storage import Storage
+        fs_class = self._getFSClass(storage_class=Storage)
+        fs = fs_class('/', None)
+        assert type(fs) is fs_class
+        assert fs._patch is None
+
+
+class TestStorageFSLatencyStorage:
+    def test_s3_patch(self):
+        import stat
+        from django_ftpserver.filesystems import (
+            StorageFS, S3Boto3StoragePatch)
+        from django_ftpserver.storages import InMemoryStorage, LatencyStorage
+        storage = LatencyStorage(
+            InMemoryStorage({'dir/a.txt': b'spam'}), object_store=True)
+
+        class FS(StorageFS):
+            storage_class = staticmethod(lambda: storage)
+            patches = {'LatencyStorage': S3Boto3StoragePatch}
+        fs = FS('/', None)
+        assert fs.listdir('/') == ['dir/']
+        assert stat.S_ISDIR(fs.stat('dir/').st_mode)
+        assert fs.stat('dir/').st_mtime == 0
+        assert fs.stat('dir/a.txt').st_size == 4
+
+    def test_iter_listdir(self):
+        from django_ftpserver.filesystems import StorageFS
+        from django_ftpserver.storages import InMemoryStorage, LatencyStorage
+        storage = LatencyStorage(
+            InMemoryStorage(dict(
+                ('dir/{0}.txt'.format(i), b'') for i in range(5))),
+            object_store=True, page_size=2)
+
+        class FS(StorageFS):
+            storage_class = staticmethod(lambda: storage)
+        fs = FS('/', None)
+        iterator = fs.iter_listdir('dir/')
+        assert storage.calls == {}
+        assert [next(iterator), next(iterator)] == ['0.txt', '1.txt']
+        assert storage.calls == {'listdir': 1}
+        assert next(iterator) == '2.txt'
+        assert storage.calls == {'listdir': 2}
+        assert list(iterator) == ['3.txt', '4.txt']
+        assert storage.calls == {'listdir': 3}
+
+    def test_iter_listdir_single_page(self):
+        from django_ftpserver.filesystems import StorageFS
+        from django_ftpserver.storages import InMemoryStorage
+        storage = InMemoryStorage({'b/c.txt': b'', 'a.txt': b'', 'c.txt': b''})
+
+        class FS(StorageFS):
+            storage_class = staticmethod(lambda: storage)
+        fs = FS('/', None)
+        assert list(fs.iter_listdir('/')) == ['a.txt', 'b/', 'c.txt']
+
+
+class TestS3Boto3StoragePatch:
+    def _getStorage(self, pages):
+        from types import SimpleNamespace
+
+        class Client(object):
+            requests = []
+
+            def list_objects_v2(self, **kwargs):
+                self.requests.append(kwargs)
+                index = int(kwargs.get('ContinuationToken', 0))
+                page = dict(pages[index])
+                if index + 1 < len(pages):
+                    page.update(
+                        IsTruncated=True,
+                        NextContinuationToken=str(index + 1))
+                return page
+
+        class S3Boto3Storage(object):
+            bucket_name = 'bucket'
+            connection = SimpleNamespace(meta=SimpleNamespace(
+                client=Client()))
+
+            def __init__(self):
+                self.bucket = SimpleNamespace(copies=[])
+                self.bucket.copy = lambda source, key: \
+                    self.bucket.copies.append((source, key))
+                self.deleted = []
+
+            def _clean_name(self, name):
+                return name
+
+            def _normalize_name(self, name):
+                return name
+
+            def exists(self, name):
+                return name == 'dir/a.txt'
+
+            def delete(self, name):
+                self.deleted.append(name)
+        return S3Boto3Storage(), Client.requests
+
+    def test_listdir_pages(self):
+        from django_ftpserver.filesystems import StorageFS
+        storage, requests = self._getStorage([
+            {'CommonPrefixes': [{'Prefix': 'dir/sub/'}],
+             'Contents': [{'Key': 'dir/'}, {'Key': 'dir/a.txt'}]},
+            {'Contents': [{'Key': 'dir/b.txt'}]},
+        ])
+
+        class FS(StorageFS):
+            storage_class = staticmethod(lambda: storage)
+        fs = FS('/', None)
+        assert list(fs.iter_listdir('dir')) == ['a.txt', 'sub/', 'b.txt']
+        assert requests == [
+            {'Bucket': 'bucket', 'Delimiter': '/', 'Prefix': 'dir/'},
+            {'Bucket': 'bucket', 'Delimiter': '/', 'Prefix': 'dir/',
+             'ContinuationToken': '1'}]
+
+    def test_listdir_pages_recorded(self):
+        from types import SimpleNamespace
+        from django_ftpserver import metrics
+        from django_ftpserver.filesystems import StorageFS
+        from django_ftpserver.tracing import StorageTracer
+        storage, requests = self._getStorage([
+            {'Contents': [{'Key': 'dir/a.txt'}]},
+            {'Contents': [{'Key': 'dir/b.txt'}]},
+        ])
+        tracer = StorageTracer()
+
+        class FS(StorageFS):
+            storage_class = staticmethod(lambda: storage)
+        metrics.registry.clear()
+        metrics.registry.enabled = True
+        try:
+            fs = FS('/', SimpleNamespace(storage_tracer=tracer))
+            trace = tracer.begin('NLST', 'dir')
+            assert list(fs.iter_listdir('dir')) == ['a.txt', 'b.txt']
+            assert metrics.storage_calls.get(method='list_objects_v2') == 2
+        finally:
+            metrics.registry.enabled = False
+            metrics.registry.clear()
+        assert trace.methods['list_objects_v2'][0] == 2
+        assert trace.records[0][:2] == ('list_objects_v2', 'dir/')
+
+    def test_move(self):
+        import errno
+        import pytest
+        from django_ftpserver.filesystems import StorageFS
+        storage, requests = self._getStorage([])
+
+        class FS(StorageFS):
+            storage_class = staticmethod(lambda: storage)
+        fs = FS('/', None)
+        fs.rename('dir/a.txt', 'dir/b.txt')
+        assert storage.bucket.copies == [
+            ({'Bucket': 'bucket', 'Key': 'dir/a.txt'}, 'dir/b.txt')]
+        assert storage.deleted == ['dir/a.txt']
+        with pytest.raises(OSError) as excinfo:
+            fs.rename('dir/', 'other/')
+        assert excinfo.value.errno == errno.EOPNOTSUPP
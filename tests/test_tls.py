@@ -0,0 +1,117 @@
+import pytest
+
+
+@pytest.fixture
+def registry():
+    from django_ftpserver import metrics
+    metrics.registry.clear()
+    metrics.registry.enabled = True
+    yield metrics.registry
+    metrics.registry.enabled = False
+    metrics.registry.clear()
+
+
+class DummyConnection(object):
+    def __init__(self, reused):
+        self.reused = reused
+
+    def session_reused(self):
+        return self.reused
+
+
+class TestGetOptions:
+    def _callFUT(self):
+        from django_ftpserver.tls import get_options
+        return get_options()
+
+    def test_default(self):
+        assert self._callFUT() == {
+            'session_timeout': 300, 'session_tickets': True}
+
+    def test_settings(self, settings):
+        settings.FTPSERVER_TLS = {'session_tickets': False}
+        assert self._callFUT() == {
+            'session_timeout': 300, 'session_tickets': False}
+
+
+class TestObserveHandshake:
+    def _callFUT(self, connection, channel):
+        from django_ftpserver.tls import observe_handshake
+        observe_handshake(connection, channel)
+
+    def test_count(self, registry):
+        from django_ftpserver import metrics
+        self._callFUT(DummyConnection(False), 'control')
+        self._callFUT(DummyConnection(True), 'data')
+        self._callFUT(DummyConnection(True), 'data')
+        self._callFUT(object(), 'data')
+        counter = metrics.tls_handshakes
+        assert counter.get(channel='control', resumed='false') == 1
+        assert counter.get(channel='data', resumed='true') == 2
+        assert counter.get(channel='data', resumed='unknown') == 1
+
+    def test_private_binding_missing(self, registry, monkeypatch):
+        from django_ftpserver import metrics
+        SSL = pytest.importorskip('OpenSSL.SSL')
+        monkeypatch.setattr(SSL, '_lib', object())
+        connection = DummyConnection(None)
+        connection.session_reused = None
+        connection._ssl = object()
+        self._callFUT(connection, 'data')
+        assert metrics.tls_handshakes.get(
+            channel='data', resumed='unknown') == 1
+
+    def test_disabled(self):
+        from django_ftpserver import metrics
+        self._callFUT(DummyConnection(True), 'data')
+        assert metrics.tls_handshakes.get(
+            channel='data', resumed='true') == 0
+
+
+class TestConfigureSessionResumption:
+    def _callFUT(self, *args, **kwargs):
+        from django_ftpserver.tls import configure_session_resumption
+        return configure_session_resumption(*args, **kwargs)
+
+    def test_configure(self):
+        SSL = pytest.importorskip('OpenSSL.SSL')
+        context = SSL.Context(SSL.TLS_SERVER_METHOD)
+        assert self._callFUT(context, 60, session_tickets=False) is context
+        assert context.get_timeout() == 60
+        assert context.get_options() & SSL.OP_NO_TICKET
+
+
+class DummyHandler(object):
+    certfile = None
+    ssl_context = None
+    built = 0
+
+    @classmethod
+    def get_ssl_context(cls):
+        if cls.ssl_context is None:
+            cls.built += 1
+            cls.ssl_context = object()
+        return cls.ssl_context
+
+
+def test_make_server_builds_ssl_context():
+    from django_ftpserver.utils import make_server
+    DummyHandler.ssl_context = None
+    DummyHandler.built = 0
+    make_server(
+        lambda host_port, handler: handler, DummyHandler,
+        lambda user: None, None, ('127.0.0.1', 21), certfile='cert.pem')
+    assert DummyHandler.built == 1
+    assert DummyHandler.ssl_context is not None
+
+
+def test_make_server_keeps_ssl_context():
+    from django_ftpserver.utils import make_server
+    context = object()
+    DummyHandler.ssl_context = context
+    DummyHandler.built = 0
+    make_server(
+        lambda host_port, handler: handler, DummyHandler,
+        lambda user: None, None, ('127.0.0.1', 21), certfile='cert.pem')
+    assert DummyHandler.built == 0
+    assert DummyHandler.ssl_context is context
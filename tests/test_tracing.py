@@ -0,0 +1,90 @@
+import json
+
+
+class TestStorageTracer:
+    def _getOne(self, **kwargs):
+        from django_ftpserver.tracing import StorageTracer
+        return StorageTracer(**kwargs)
+
+    def _getStorage(self, tracer, location='/tmp'):
+        from django.core.files.storage import FileSystemStorage
+        from django_ftpserver.tracing import TracedStorage
+        return TracedStorage(FileSystemStorage(location), tracer)
+
+    def test_record_per_command(self, tmp_path):
+        output = tmp_path / 'trace.jsonl'
+        tracer = self._getOne(output=str(output))
+        storage = self._getStorage(tracer, str(tmp_path))
+        trace = tracer.begin('LIST', '/', '127.0.0.1:2121 user1')
+        storage.exists('spam')
+        storage.listdir('')
+        tracer.end(trace)
+        tracer.close()
+
+        records = [json.loads(line) for line in output.open()]
+        assert len(records) == 1
+        record = records[0]
+        assert record['command'] == 'LIST'
+        assert record['session'] == '127.0.0.1:2121 user1'
+        assert record['calls'] == 2
+        assert sorted(record['methods']) == ['exists', 'listdir']
+        assert [r[:2] for r in record['records']] == [
+            ['exists', 'spam'], ['listdir', '']]
+
+    def test_not_traced_outside_command(self, tmp_path):
+        output = tmp_path / 'trace.jsonl'
+        tracer = self._getOne(output=str(output))
+        storage = self._getStorage(tracer, str(tmp_path))
+        assert storage.exists('')
+        assert storage.location == str(tmp_path)
+        trace = tracer.begin('NOOP', '')
+        tracer.end(trace)
+        assert not output.exists()
+
+    def test_sample_rate(self):
+        tracer = self._getOne(sample_rate=0)
+        assert tracer.begin('LIST', '/') is None
+        assert tracer.current is None
+
+    def test_max_records(self):
+        tracer = self._getOne(max_records=1)
+        storage = self._getStorage(tracer)
+        trace = tracer.begin('LIST', '/')
+        storage.exists('a')
+        storage.exists('b')
+        assert trace.calls == 2
+        assert trace.methods['exists'][0] == 2
+        assert len(trace.records) == 1
+
+    def test_log(self, caplog):
+        import logging
+        tracer = self._getOne()
+        storage = self._getStorage(tracer)
+        trace = tracer.begin('SIZE', 'spam')
+        storage.exists('spam')
+        with caplog.at_level(logging.INFO, logger='django_ftpserver.tracing'):
+            tracer.end(trace)
+        assert 'SIZE spam: 1 storage calls' in caplog.text
+
+    def test_current_per_thread(self):
+        import threading
+        tracer = self._getOne()
+        storage = self._getStorage(tracer)
+        trace = tracer.begin('LIST', '/')
+        thread = threading.Thread(target=storage.exists, args=('spam',))
+        thread.start()
+        thread.join()
+        assert tracer.current is trace
+        assert trace.calls == 0
+
+    def test_iterate(self):
+        tracer = self._getOne()
+        storage = self._getStorage(tracer)
+        trace = tracer.begin('LIST', '/')
+        iterator = tracer.iterate(
+            trace, (storage.exists(name) for name in ('a', 'b')))
+        # the command is processed before the listing is sent
+        tracer.current = None
+        assert list(iterator) == [False, False]
+        assert tracer.current is None
+        assert trace.methods['exists'][0] == 2
@@ -0,0 +1,86 @@
+import pytest
+
+
+@pytest.fixture
+def account(db):
+    from django.contrib.auth.models import User
+    from django_ftpserver import models
+    group = models.FTPUserGroup.objects.create(name='group1')
+    user = User.objects.create(username='user1')
+    return models.FTPUserAccount.objects.create(user=user, group=group)
+
+
+class TestTransferLogWriter:
+    def _getOne(self, **kwargs):
+        from django_ftpserver.transferlog import TransferLogWriter
+        return TransferLogWriter(**kwargs)
+
+    def _append(self, writer, path, account=None):
+        return writer.append(
+            account and account.pk, 'STOR', path, 100, 0.5, True)
+
+    def test_flush(self, account):
+        from django_ftpserver import models
+        writer = self._getOne(batch_size=2)
+        for i in range(5):
+            self._append(writer, '/file{}'.format(i), account)
+        writer.append(None, 'RETR', '/spam', 10, 0.1, False)
+        assert writer.flush() == 6
+        assert len(writer) == 0
+        logs = models.FTPTransferLog.objects.order_by('pk')
+        assert [log.path for log in logs][:2] == ['/file0', '/file1']
+        assert logs[0].account == account
+        assert logs[0].result == 'completed'
+        assert logs[5].account is None
+        assert logs[5].result == 'incomplete'
+
+    def test_overflow_drop(self, db):
+        writer = self._getOne(max_entries=2)
+        assert self._append(writer, '/a')
+        assert self._append(writer, '/b')
+        assert not self._append(writer, '/c')
+        assert writer.dropped == 1
+        assert [entry.path for entry in writer._entries] == ['/a', '/b']
+
+    def test_overflow_drop_oldest(self, db):
+        writer = self._getOne(max_entries=2, overflow='drop_oldest')
+        for path in ('/a', '/b', '/c'):
+            assert self._append(writer, path)
+        assert writer.dropped == 1
+        assert [entry.path for entry in writer._entries] == ['/b', '/c']
+
+    def test_overflow_block_without_flusher(self, db):
+        writer = self._getOne(max_entries=1, overflow='block')
+        self._append(writer, '/a')
+        assert not self._append(writer, '/b')
+        assert writer.dropped == 1
+
+    def test_invalid_overflow(self):
+        with pytest.raises(ValueError):
+            self._getOne(overflow='spam')
+
+    @pytest.mark.django_db(transaction=True)
+    def test_final_flush(self):
+        from django_ftpserver import models
+        writer = self._getOne(interval=60)
+        writer.start()
+        self._append(writer, '/a')
+        writer.stop(timeout=10)
+        assert models.FTPTransferLog.objects.filter(path='/a').exists()
+
+
+class TestMakeTransferLog:
+    def test_setting(self, settings):
+        from django.core.management.base import CommandError
+        from django_ftpserver.management.commands import ftpserver
+        command = ftpserver.Command()
+        assert command.make_transfer_log() is None
+        settings.FTPSERVER_TRANSFER_LOG = True
+        assert command.make_transfer_log().interval == 1.0
+        settings.FTPSERVER_TRANSFER_LOG = {
+            'interval': 5, 'overflow': 'drop_oldest'}
+        writer = command.make_transfer_log()
+        assert (writer.interval, writer.overflow) == (5, 'drop_oldest')
+        settings.FTPSERVER_TRANSFER_LOG = {'overflow': 'spam'}
+        with pytest.raises(CommandError):
+            command.make_transfer_log()
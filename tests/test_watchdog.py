@@ -0,0 +1,66 @@
+import logging
+import threading
+import time
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLoopWatchdog:
+    def _getOne(self, **kwargs):
+        from django_ftpserver.watchdog import LoopWatchdog
+        watchdog = LoopWatchdog(**kwargs)
+        watchdog.clock = FakeClock()
+        return watchdog
+
+    def test_check_reports_once(self, caplog):
+        from django_ftpserver import metrics
+        watchdog = self._getOne(threshold=1.0)
+        watchdog.beat()
+        assert watchdog.thread_id == threading.get_ident()
+        assert not watchdog.check()
+        watchdog.clock.now += 2
+        metrics.command_context.command = 'LIST'
+        try:
+            with caplog.at_level(logging.WARNING,
+                                 logger='django_ftpserver.watchdog'):
+                assert watchdog.check()
+                assert not watchdog.check()
+        finally:
+            metrics.command_context.command = None
+        assert 'IOLoop blocked for 2.000 seconds' in caplog.text
+        assert 'command: LIST' in caplog.text
+        assert 'test_check_reports_once' in caplog.text
+
+    def test_beat_observes_lag(self):
+        from django_ftpserver import metrics
+        watchdog = self._getOne(threshold=1.0, interval=0.25)
+        metrics.registry.enabled = True
+        try:
+            watchdog.beat()
+            watchdog.clock.now += 0.75
+            watchdog.beat()
+            assert metrics.ioloop_lag.get() == (1, 0.5)
+        finally:
+            metrics.registry.enabled = False
+            metrics.registry.clear()
+
+    def test_blocked_ioloop(self, caplog):
+        from pyftpdlib.ioloop import IOLoop
+        from django_ftpserver.watchdog import LoopWatchdog
+        ioloop = IOLoop()
+        watchdog = LoopWatchdog(threshold=0.1, interval=0.02)
+        with caplog.at_level(logging.WARNING,
+                             logger='django_ftpserver.watchdog'):
+            watchdog.start(ioloop)
+            # block the IOLoop thread, the heartbeat is never called.
+            time.sleep(0.3)
+            watchdog.stop()
+        ioloop.close()
+        assert 'IOLoop blocked' in caplog.text
+        assert 'in test_blocked_ioloop' in caplog.text